@@ -1,309 +1,270 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import wraps
 import os
 import csv
+import hashlib
+import zlib
 from io import StringIO
+import sqlite3
+import threading
+import db_pool
+from db_pool import get_connection, pool_stats
+from migrations import LATEST_VERSION, get_version, migrate
+import billing
+import metrics
+import repository
+import slow_queries
+from pagination import InvalidCursor, clamp_limit
+from result_cache import ResultCache
+import static_assets
+
+# Every route lives on this blueprint; create_app() below builds the app
+api = Blueprint('api', __name__)
 
-app = Flask(__name__, static_folder='.')
-CORS(app)
+# Computed dashboard / overview responses, see cached() below
+results = ResultCache()
 
-DATABASE = 'data.db'
+# Per-route latency and SQL counters, served at /api/metrics
+request_metrics = metrics.Registry()
+
+# Set when the server starts shutting down, see /api/ready
+draining = threading.Event()
+
+# Frontend files, fingerprinted and gzipped once at startup (see static_assets.py)
+ASSET_ROOT = os.path.dirname(os.path.abspath(__file__))
+assets = static_assets.build(ASSET_ROOT)
 
 # Database initialization
 def init_db():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    # Profiles table
-    c.execute('''CREATE TABLE IF NOT EXISTS profiles (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE,
-        display_name TEXT NOT NULL
-    )''')
-    
-    # Categories table
-    c.execute('''CREATE TABLE IF NOT EXISTS categories (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE,
-        name_te TEXT NOT NULL,
-        icon TEXT
-    )''')
-    
-    # Credit Cards table
-    c.execute('''CREATE TABLE IF NOT EXISTS credit_cards (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        profile_id INTEGER NOT NULL,
-        card_name TEXT NOT NULL,
-        card_last_four TEXT,
-        credit_limit REAL NOT NULL,
-        billing_day INTEGER NOT NULL,
-        card_color TEXT DEFAULT '#4A90E2',
-        created_at TEXT NOT NULL,
-        FOREIGN KEY (profile_id) REFERENCES profiles (id)
-    )''')
-    
-    # Expenses table
-    c.execute('''CREATE TABLE IF NOT EXISTS expenses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        profile_id INTEGER NOT NULL,
-        category_id INTEGER NOT NULL,
-        amount REAL NOT NULL,
-        date TEXT NOT NULL,
-        note TEXT,
-        card_id INTEGER,
-        created_at TEXT NOT NULL,
-        FOREIGN KEY (profile_id) REFERENCES profiles (id),
-        FOREIGN KEY (category_id) REFERENCES categories (id),
-        FOREIGN KEY (card_id) REFERENCES credit_cards (id)
-    )''')
-    
-    # Budgets table
-    c.execute('''CREATE TABLE IF NOT EXISTS budgets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        profile_id INTEGER,
-        category_id INTEGER,
-        amount REAL NOT NULL,
-        period TEXT NOT NULL,
-        FOREIGN KEY (profile_id) REFERENCES profiles (id),
-        FOREIGN KEY (category_id) REFERENCES categories (id)
-    )''')
-    
-    conn.commit()
-    conn.close()
+    # Schema lives in migrations.py; this is a no-op once the database is current
+    with get_connection() as conn:
+        migrate(conn)
 
 # Seed initial data
 def seed_data():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    # Check if data already exists
-    c.execute('SELECT COUNT(*) FROM profiles')
-    if c.fetchone()[0] > 0:
-        conn.close()
-        return
-    
-    # Insert profiles
-    profiles = [
-        ('dad', 'Dad'),
-        ('mom', 'Mom'),
-        ('chaithu', 'Chaithu'),
-        ('harshith', 'Harshith'),
-        ('common', 'Common')
-    ]
-    c.executemany('INSERT INTO profiles (name, display_name) VALUES (?, ?)', profiles)
-    
-    # Insert categories with Telugu translations
-    categories = [
-        ('Rice', 'బియ్యం', '🍚'),
-        ('Dal', 'పప్పు', '🫘'),
-        ('Oil', 'నూనె', '🛢️'),
-        ('Vegetables', 'కూరగాయలు', '🥬'),
-        ('Fruits', 'పండ్లు', '🍎'),
-        ('Dairy', 'పాల ఉత్పత్తులు', '🥛'),
-        ('Snacks', 'స్నాక్స్', '🍿'),
-        ('Cleaning', 'శుభ్రపరచడం', '🧹'),
-        ('Toiletries', 'సౌందర్య వస్తువులు', '🧴'),
-        ('Electricity', 'విద్యుత్', '⚡'),
-        ('Water', 'నీరు', '💧'),
-        ('Gas', 'గ్యాస్', '🔥'),
-        ('Rent/EMI', 'అద్దె/EMI', '🏠'),
-        ('Fuel', 'ఇంధనం', '⛽'),
-        ('Auto', 'ఆటో', '🛺'),
-        ('Bus', 'బస్సు', '🚌'),
-        ('Medical', 'వైద్యం', '💊'),
-        ('Education', 'విద్య', '📚'),
-        ('Movies', 'సినిమాలు', '🎬'),
-        ('Dining Out', 'బయట భోజనం', '🍽️'),
-        ('Clothing', 'బట్టలు', '👕'),
-        ('Electronics', 'ఎలక్ట్రానిక్స్', '📱'),
-        ('Gifts', 'బహుమతులు', '🎁'),
-        ('Maintenance', 'నిర్వహణ', '🔧'),
-        ('Subscriptions', 'చందాలు', '📺'),
-        ('Office', 'కార్యాలయం', '💼'),
-        ('Travel', 'ప్రయాణం', '✈️'),
-        ('Pets', 'పెంపుడు జంతువులు', '🐕'),
-        ('Repairs', 'మరమ్మతులు', '🔨'),
-        ('Savings', 'పొదుపు', '💰'),
-        ('Miscellaneous', 'ఇతరములు', '📦'),
-        ('Personal Care', 'వ్యక్తిగత సంరక్షణ', '💅')
-    ]
-    c.executemany('INSERT INTO categories (name, name_te, icon) VALUES (?, ?, ?)', categories)
-    
-    # No sample expenses - start with clean database
-    
-    conn.commit()
-    conn.close()
+    # Default profiles and categories (repository.SEED_*); skipped once profiles exist
+    with get_connection() as conn:
+        repository.seed(conn)
+
+def current_versions():
+    # Table change counters, read once per request
+    if 'table_versions' not in g:
+        with get_connection() as conn:
+            g.table_versions = repository.table_versions(conn)
+    return g.table_versions
+
+def conditional(*tables, daily=False):
+    # Weak ETag built from the change counters of the tables a view reads
+    # (bumped by triggers, see migrations.py). A matching If-None-Match gets
+    # a 304 before the view runs. daily=True folds in today's date for views
+    # whose windows move with the calendar.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = current_versions()
+            key = [request.full_path, str('gzip' in request.headers.get('Accept-Encoding', ''))]
+            key += [f'{table}:{versions.get(table, 0)}' for table in tables]
+            if daily:
+                key.append(datetime.now().strftime('%Y-%m-%d'))
+            etag = hashlib.sha1('|'.join(key).encode()).hexdigest()[:20]
+            
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Let browsers keep the body but revalidate on every fetch
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def cached(*tables):
+    # Keep the computed response in the in-process LRU. The key includes the
+    # request path/query, today's date and the change counters of the tables
+    # read, so another process's writes can never be served stale; local
+    # writes also clear the cache eagerly.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = current_versions()
+            key = (request.full_path, datetime.now().strftime('%Y-%m-%d'),
+                   tuple(versions.get(table, 0) for table in tables))
+            hit = results.get(key)
+            if hit is not None:
+                body, status = hit
+                return current_app.response_class(body, status, mimetype='application/json')
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                results.put(key, (response.get_data(), response.status_code))
+            return response
+        return wrapper
+    return decorator
 
 # API Routes
-@app.route('/')
+@api.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return static_assets.respond(current_app.response_class, assets['index.html'], request)
 
-@app.route('/<path:path>')
+@api.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory('.', path)
+    # Only the allowlisted frontend files; everything else is a 404
+    asset = assets.get(path)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return static_assets.respond(current_app.response_class, asset, request)
 
-@app.route('/api/profiles', methods=['GET'])
+@api.route('/api/profiles', methods=['GET'])
+@conditional('profiles')
 def get_profiles():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute('SELECT id, name, display_name FROM profiles')
-    profiles = [{'id': row[0], 'name': row[1], 'display_name': row[2]} for row in c.fetchall()]
-    conn.close()
+    with get_connection() as conn:
+        rows = repository.profiles(conn)
+    profiles = [{'id': profile_id, 'name': name, 'display_name': display_name}
+                for profile_id, name, display_name in rows]
     return jsonify(profiles)
 
-@app.route('/api/categories', methods=['GET'])
+@api.route('/api/categories', methods=['GET'])
+@conditional('categories')
 def get_categories():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute('SELECT id, name, name_te, icon FROM categories')
-    categories = [{'id': row[0], 'name': row[1], 'name_te': row[2], 'icon': row[3]} for row in c.fetchall()]
-    conn.close()
+    with get_connection() as conn:
+        rows = repository.categories(conn)
+    categories = [{'id': category_id, 'name': name, 'name_te': name_te, 'icon': icon}
+                  for category_id, name, name_te, icon in rows]
     return jsonify(categories)
 
-@app.route('/api/expenses', methods=['GET'])
+@api.route('/api/expenses', methods=['GET'])
+@conditional('expenses', 'profiles', 'categories', 'credit_cards')
 def get_expenses():
     profile_id = request.args.get('profile_id')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    cursor = request.args.get('cursor')
+    limit = clamp_limit(request.args.get('limit'))
+    
+    try:
+        with get_connection() as conn:
+            rows, next_cursor = repository.expenses_page(
+                conn, profile_id, start_date, end_date, limit, cursor)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    query = '''SELECT e.id, e.profile_id, p.display_name, e.category_id, c.name, c.name_te, c.icon,
-                      e.amount, e.date, e.note, e.created_at
-               FROM expenses e
-               JOIN profiles p ON e.profile_id = p.id
-               JOIN categories c ON e.category_id = c.id
-               WHERE 1=1'''
-    params = []
-    
-    if profile_id:
-        query += ' AND e.profile_id = ?'
-        params.append(profile_id)
-    if start_date:
-        query += ' AND e.date >= ?'
-        params.append(start_date)
-    if end_date:
-        query += ' AND e.date <= ?'
-        params.append(end_date)
-    
-    query += ' ORDER BY e.date DESC, e.created_at DESC'
-    
-    c.execute(query, params)
     expenses = [{
-        'id': row[0],
-        'profile_id': row[1],
-        'profile_name': row[2],
-        'category_id': row[3],
-        'category_name': row[4],
-        'category_name_te': row[5],
-        'category_icon': row[6],
-        'amount': row[7],
-        'date': row[8],
-        'note': row[9],
-        'created_at': row[10]
-    } for row in c.fetchall()]
-    
-    conn.close()
-    return jsonify(expenses)
-
-@app.route('/api/expenses', methods=['POST'])
+        'id': expense_id,
+        'profile_id': owner_id,
+        'profile_name': profile_name,
+        'category_id': category_id,
+        'category_name': category_name,
+        'category_name_te': category_name_te,
+        'category_icon': category_icon,
+        'amount': amount,
+        'date': date,
+        'note': note,
+        'card_id': card_id,
+        'card_name': card_name,
+        'created_at': created_at
+    } for (expense_id, owner_id, profile_name, category_id, category_name, category_name_te,
+           category_icon, amount, date, note, card_id, card_name, created_at) in rows]
+    
+    return jsonify({'expenses': expenses, 'next_cursor': next_cursor})
+
+@api.route('/api/expenses', methods=['POST'])
 def add_expense():
     try:
         data = request.json
-        print(f"Received expense data: {data}")
-        conn = sqlite3.connect(DATABASE)
-        c = conn.cursor()
-        
         # Validate required fields
         if 'profile_id' not in data or 'category_id' not in data or 'amount' not in data or 'date' not in data:
             return jsonify({'error': 'Missing required fields'}), 400
         
-        c.execute('''INSERT INTO expenses (profile_id, category_id, amount, date, note, card_id, created_at)
-                     VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                  (data['profile_id'], data['category_id'], data['amount'], 
-                   data['date'], data.get('note', ''), data.get('card_id'), datetime.now().isoformat()))
-        
-        expense_id = c.lastrowid
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            expense_id = repository.add_expense(conn, data['profile_id'], data['category_id'], data['amount'],
+                                                data['date'], data.get('note', ''), data.get('card_id'))
+            billing.ensure_synced(conn)
+            results.clear()
         
         return jsonify({'id': expense_id, 'message': 'Expense added successfully'}), 201
+    except sqlite3.IntegrityError as e:
+        # A profile, category or card that doesn't exist: the client's mistake
+        with get_connection() as conn:
+            message = repository.unknown_reference(conn, data['profile_id'], data['category_id'], data.get('card_id'))
+        return jsonify({'error': message or str(e)}), 400
     except Exception as e:
         print(f"Error adding expense: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/expenses/<int:expense_id>', methods=['DELETE'])
+@api.route('/api/expenses/bulk', methods=['POST'])
+def add_expenses_bulk():
+    # Accepts a JSON array of expense objects, or a CSV with a header row of
+    # profile_id,category_id,amount,date,note,card_id (uploaded as the "file"
+    # form field or sent as a text/csv body). ?partial=1 keeps the valid rows
+    # when others are rejected; by default nothing is written on any error.
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8-sig')
+        records = list(csv.DictReader(StringIO(text)))
+    elif request.mimetype == 'text/csv':
+        records = list(csv.DictReader(StringIO(request.get_data(as_text=True))))
+    else:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a JSON array or a CSV upload'}), 400
+    
+    partial = request.args.get('partial') in ('1', 'true')
+    try:
+        with get_connection() as conn:
+            result = repository.add_expenses_bulk(conn, records, partial)
+            billing.ensure_synced(conn)
+    except Exception as e:
+        print(f"Error adding expenses in bulk: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    if result['inserted']:
+        results.clear()
+    status = 201 if result['inserted'] or not result['errors'] else 400
+    return jsonify({'received': len(records), **result}), status
+
+@api.route('/api/expenses/<int:expense_id>', methods=['DELETE'])
 def delete_expense(expense_id):
     try:
-        conn = sqlite3.connect(DATABASE)
-        c = conn.cursor()
-        c.execute('DELETE FROM expenses WHERE id = ?', (expense_id,))
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            repository.delete_expense(conn, expense_id)
+            billing.ensure_synced(conn)
+            results.clear()
         
         return jsonify({'message': 'Expense deleted successfully'}), 200
     except Exception as e:
         print(f"Error deleting expense: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/dashboard/<int:profile_id>', methods=['GET'])
+@api.route('/api/dashboard/<int:profile_id>', methods=['GET'])
+@conditional('expenses', 'categories', daily=True)
+@cached('expenses', 'categories')
 def get_dashboard(profile_id):
     period = request.args.get('period', 'month')  # week, month, year
     
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
     # Calculate date range
     today = datetime.now()
-    start_date = today.strftime('%Y-%m-%d') # Default fallback
-    
-    if period == 'week':
-        start_date = (today - timedelta(days=7)).strftime('%Y-%m-%d')
-    elif period == 'month':
-        start_date = today.replace(day=1).strftime('%Y-%m-%d')
-    elif period == 'year':
-        start_date = today.replace(month=1, day=1).strftime('%Y-%m-%d')
-    else:
-        start_date = (today - timedelta(days=30)).strftime('%Y-%m-%d')
-        
-    # Total spent
-    c.execute('''SELECT COALESCE(SUM(amount), 0) FROM expenses 
-                 WHERE profile_id = ? AND date >= ?''', (profile_id, start_date))
-    total_spent = c.fetchone()[0]
-    
-    # Category breakdown
-    c.execute('''SELECT c.name, c.name_te, c.icon, COALESCE(SUM(e.amount), 0) as total
-                 FROM categories c
-                 LEFT JOIN expenses e ON c.id = e.category_id 
-                    AND e.profile_id = ? AND e.date >= ?
-                 GROUP BY c.id, c.name, c.name_te, c.icon
-                 HAVING total > 0
-                 ORDER BY total DESC''', (profile_id, start_date))
+    start_date = repository.period_start(period, today)
+    
+    # Total, category breakdown and weekly trend in one statement
+    with get_connection() as conn:
+        total_spent, categories, trend = repository.dashboard(
+            conn, profile_id, start_date, today.strftime('%Y-%m-%d'))
     
     category_breakdown = [{
-        'category': row[0],
-        'category_te': row[1],
-        'icon': row[2],
-        'amount': row[3]
-    } for row in c.fetchall()]
+        'category': name,
+        'category_te': name_te,
+        'icon': icon,
+        'amount': amount
+    } for name, name_te, icon, amount in categories]
     
     # Top 3 categories
     top_categories = category_breakdown[:3]
     
-    # Weekly trend (last 7 days)
-    weekly_data = []
-    for i in range(6, -1, -1):
-        date = (today - timedelta(days=i)).strftime('%Y-%m-%d')
-        c.execute('''SELECT COALESCE(SUM(amount), 0) FROM expenses 
-                     WHERE profile_id = ? AND date = ?''', (profile_id, date))
-        amount = c.fetchone()[0]
-        weekly_data.append({'date': date, 'amount': amount})
-    
-    conn.close()
+    # Weekly trend (last 7 days, zero-filled)
+    weekly_data = [{'date': date, 'amount': amount} for date, amount in trend]
     
     return jsonify({
         'total_spent': total_spent,
@@ -312,46 +273,21 @@ def get_dashboard(profile_id):
         'weekly_trend': weekly_data
     })
 
-@app.route('/api/family-overview', methods=['GET'])
+@api.route('/api/family-overview', methods=['GET'])
+@conditional('expenses', 'profiles', 'categories', daily=True)
+@cached('expenses', 'profiles', 'categories')
 def get_family_overview():
     period = request.args.get('period', 'month')
     
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    today = datetime.now()
-    if period == 'week':
-        start_date = (today - timedelta(days=7)).strftime('%Y-%m-%d')
-    elif period == 'month':
-        start_date = (today - timedelta(days=30)).strftime('%Y-%m-%d')
-    else:
-        start_date = (today - timedelta(days=365)).strftime('%Y-%m-%d')
-    
-    # Total family spending
-    c.execute('SELECT COALESCE(SUM(amount), 0) FROM expenses WHERE date >= ?', (start_date,))
-    total_family = c.fetchone()[0]
-    
-    # Spending by profile
-    c.execute('''SELECT p.display_name, COALESCE(SUM(e.amount), 0) as total
-                 FROM profiles p
-                 LEFT JOIN expenses e ON p.id = e.profile_id AND e.date >= ?
-                 GROUP BY p.id, p.display_name
-                 ORDER BY total DESC''', (start_date,))
-    
-    profile_spending = [{'profile': row[0], 'amount': row[1]} for row in c.fetchall()]
+    start_date = repository.period_start(period, datetime.now())
     
-    # Category breakdown for entire family
-    c.execute('''SELECT c.name, c.name_te, COALESCE(SUM(e.amount), 0) as total
-                 FROM categories c
-                 LEFT JOIN expenses e ON c.id = e.category_id AND e.date >= ?
-                 GROUP BY c.id, c.name, c.name_te
-                 HAVING total > 0
-                 ORDER BY total DESC
-                 LIMIT 10''', (start_date,))
+    # Total, spending by profile and top categories from the daily rollup
+    with get_connection() as conn:
+        total_family, profiles, categories = repository.family_overview(conn, start_date)
     
-    top_categories = [{'category': row[0], 'category_te': row[1], 'amount': row[2]} for row in c.fetchall()]
-    
-    conn.close()
+    profile_spending = [{'profile': name, 'amount': amount} for name, amount in profiles]
+    top_categories = [{'category': name, 'category_te': name_te, 'amount': amount}
+                      for name, name_te, amount in categories]
     
     return jsonify({
         'total_family': total_family,
@@ -359,310 +295,409 @@ def get_family_overview():
         'top_categories': top_categories
     })
 
-@app.route('/api/export/csv', methods=['GET'])
+@api.route('/api/export/csv', methods=['GET'])
+@conditional('expenses', 'profiles', 'categories', 'credit_cards')
 def export_csv():
     profile_id = request.args.get('profile_id')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    query = '''SELECT e.date, p.display_name, c.name, e.amount, e.note
-               FROM expenses e
-               JOIN profiles p ON e.profile_id = p.id
-               JOIN categories c ON e.category_id = c.id
-               WHERE 1=1'''
-    params = []
-    
-    if profile_id:
-        query += ' AND e.profile_id = ?'
-        params.append(profile_id)
-    if start_date:
-        query += ' AND e.date >= ?'
-        params.append(start_date)
-    if end_date:
-        query += ' AND e.date <= ?'
-        params.append(end_date)
-    
-    query += ' ORDER BY e.date DESC'
-    
-    c.execute(query, params)
-    rows = c.fetchall()
-    conn.close()
-    
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Date', 'Profile', 'Category', 'Amount', 'Note'])
-    writer.writerows(rows)
-    
-    return output.getvalue(), 200, {
-        'Content-Type': 'text/csv',
-        'Content-Disposition': f'attachment; filename=expenses_{datetime.now().strftime("%Y%m%d")}.csv'
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+    
+    def generate():
+        # CSV is written batch by batch into a small reusable buffer, so the
+        # first bytes go out immediately and memory doesn't grow with history
+        output = StringIO()
+        writer = csv.writer(output)
+        gzipper = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        
+        def flush():
+            chunk = output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate(0)
+            return gzipper.compress(chunk) if gzipper else chunk
+        
+        writer.writerow(repository.EXPORT_HEADER)
+        yield flush()
+        with get_connection() as conn:
+            for rows in repository.export_rows(conn, profile_id, start_date, end_date):
+                writer.writerows(rows)
+                chunk = flush()
+                if chunk:
+                    yield chunk
+        if gzipper:
+            yield gzipper.flush()
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename=expenses_{datetime.now().strftime("%Y%m%d")}.csv',
+        'Vary': 'Accept-Encoding'
     }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(generate()), 200, headers, mimetype='text/csv')
 
 # Credit Card API Routes
-@app.route('/api/credit-cards', methods=['GET'])
+@api.route('/api/credit-cards', methods=['GET'])
+@conditional('credit_cards', 'profiles')
 def get_all_credit_cards():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute('''SELECT cc.id, cc.profile_id, p.display_name, cc.card_name, cc.card_last_four, 
-                        cc.credit_limit, cc.billing_day, cc.card_color, cc.created_at
-                 FROM credit_cards cc
-                 JOIN profiles p ON cc.profile_id = p.id
-                 ORDER BY cc.created_at DESC''')
+    with get_connection() as conn:
+        rows = repository.credit_cards(conn)
     
     cards = [{
-        'id': row[0],
-        'profile_id': row[1],
-        'profile_name': row[2],
-        'card_name': row[3],
-        'card_last_four': row[4],
-        'credit_limit': row[5],
-        'billing_day': row[6],
-        'card_color': row[7],
-        'created_at': row[8]
-    } for row in c.fetchall()]
-    
-    conn.close()
+        'id': card_id,
+        'profile_id': owner_id,
+        'profile_name': profile_name,
+        'card_name': card_name,
+        'card_last_four': card_last_four,
+        'credit_limit': credit_limit,
+        'billing_day': billing_day,
+        'card_color': card_color,
+        'created_at': created_at
+    } for (card_id, owner_id, profile_name, card_name, card_last_four, credit_limit,
+           billing_day, card_color, created_at) in rows]
+    
     return jsonify(cards)
 
-@app.route('/api/credit-cards/<int:profile_id>', methods=['GET'])
+@api.route('/api/credit-cards/summary', methods=['GET'])
+@conditional('credit_cards', 'profiles', 'expenses', daily=True)
+def get_credit_cards_summary():
+    # Every card with its current cycle, spend and utilization in one query
+    profile_id = request.args.get('profile_id', type=int)
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    
+    with get_connection() as conn:
+        rows = repository.card_summary(conn, today, profile_id)
+        for i, row in enumerate(rows):
+            if row[9] is None:
+                # The calendar doesn't reach today yet (no write since the
+                # cycle rolled over): work out the open cycle without writing
+                cycle_start, cycle_end = billing.current_cycle(conn, row[0], today)
+                total_spent, _ = repository.card_cycle(conn, row[0], cycle_start, cycle_end)
+                rows[i] = row[:9] + (cycle_start, cycle_end, total_spent)
+
+    cards = []
+    for (card_id, owner_id, profile_name, card_name, card_last_four, credit_limit, billing_day,
+         card_color, created_at, cycle_start, cycle_end, total_spent) in rows:
+        utilization = (total_spent / credit_limit * 100) if credit_limit > 0 else 0
+        cards.append({
+            'id': card_id,
+            'profile_id': owner_id,
+            'profile_name': profile_name,
+            'card_name': card_name,
+            'card_last_four': card_last_four,
+            'credit_limit': credit_limit,
+            'billing_day': billing_day,
+            'card_color': card_color,
+            'created_at': created_at,
+            'cycle_start': cycle_start,
+            'cycle_end': cycle_end,
+            'total_spent': total_spent,
+            'available_balance': credit_limit - total_spent,
+            'utilization': round(utilization, 1)
+        })
+    
+    return jsonify(cards)
+
+@api.route('/api/credit-cards/<int:profile_id>', methods=['GET'])
+@conditional('credit_cards')
 def get_profile_credit_cards(profile_id):
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute('''SELECT id, profile_id, card_name, card_last_four, credit_limit, 
-                        billing_day, card_color, created_at
-                 FROM credit_cards
-                 WHERE profile_id = ?
-                 ORDER BY created_at DESC''', (profile_id,))
+    with get_connection() as conn:
+        rows = repository.credit_cards(conn, profile_id)
     
     cards = [{
-        'id': row[0],
-        'profile_id': row[1],
-        'card_name': row[2],
-        'card_last_four': row[3],
-        'credit_limit': row[4],
-        'billing_day': row[5],
-        'card_color': row[6],
-        'created_at': row[7]
-    } for row in c.fetchall()]
-    
-    conn.close()
+        'id': card_id,
+        'profile_id': owner_id,
+        'card_name': card_name,
+        'card_last_four': card_last_four,
+        'credit_limit': credit_limit,
+        'billing_day': billing_day,
+        'card_color': card_color,
+        'created_at': created_at
+    } for (card_id, owner_id, _, card_name, card_last_four, credit_limit,
+           billing_day, card_color, created_at) in rows]
+    
     return jsonify(cards)
 
-@app.route('/api/credit-cards', methods=['POST'])
+@api.route('/api/credit-cards', methods=['POST'])
 def add_credit_card():
     data = request.json
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    c.execute('''INSERT INTO credit_cards (profile_id, card_name, card_last_four, credit_limit, 
-                                           billing_day, card_color, created_at)
-                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
-              (data['profile_id'], data['card_name'], data.get('card_last_four', ''), 
-               data['credit_limit'], data['billing_day'], data.get('card_color', '#4A90E2'),
-               datetime.now().isoformat()))
-    
-    card_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        card_id = repository.add_credit_card(conn, data['profile_id'], data['card_name'], data['credit_limit'],
+                                             data['billing_day'], data.get('card_last_four', ''),
+                                             data.get('card_color', '#4A90E2'))
+        billing.ensure_synced(conn)
+        results.clear()
     
     return jsonify({'id': card_id, 'message': 'Credit card added successfully'}), 201
 
-@app.route('/api/credit-cards/<int:card_id>', methods=['PUT'])
+@api.route('/api/credit-cards/<int:card_id>', methods=['PUT'])
 def update_credit_card(card_id):
     data = request.json
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    c.execute('''UPDATE credit_cards 
-                 SET card_name = ?, card_last_four = ?, credit_limit = ?, 
-                     billing_day = ?, card_color = ?
-                 WHERE id = ?''',
-              (data['card_name'], data.get('card_last_four', ''), data['credit_limit'],
-               data['billing_day'], data.get('card_color', '#4A90E2'), card_id))
-    
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        repository.update_credit_card(conn, card_id, data['card_name'], data['credit_limit'],
+                                      data['billing_day'], data.get('card_last_four', ''),
+                                      data.get('card_color', '#4A90E2'))
+        billing.ensure_synced(conn)
+        results.clear()
     
     return jsonify({'message': 'Credit card updated successfully'}), 200
 
-@app.route('/api/credit-cards/<int:card_id>', methods=['DELETE'])
+@api.route('/api/credit-cards/<int:card_id>', methods=['DELETE'])
 def delete_credit_card(card_id):
     try:
-        conn = sqlite3.connect(DATABASE)
-        c = conn.cursor()
-        
-        # Remove card_id from expenses (set to NULL)
-        c.execute('UPDATE expenses SET card_id = NULL WHERE card_id = ?', (card_id,))
-        
-        # Delete the card
-        c.execute('DELETE FROM credit_cards WHERE id = ?', (card_id,))
-        
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            # Expenses on the card are kept with card_id set to NULL
+            repository.delete_credit_card(conn, card_id)
+            results.clear()
         
         return jsonify({'message': 'Credit card deleted successfully'}), 200
     except Exception as e:
         print(f"Error deleting credit card: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/credit-cards/<int:card_id>/dashboard', methods=['GET'])
+@api.route('/api/credit-cards/<int:card_id>/dashboard', methods=['GET'])
+@conditional('credit_cards', 'expenses', 'categories', daily=True)
+@cached('credit_cards', 'expenses', 'categories')
 def get_card_dashboard(card_id):
     period = request.args.get('period', 'month')
     
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    # Get card details
-    c.execute('''SELECT card_name, card_last_four, credit_limit, billing_day, card_color
-                 FROM credit_cards WHERE id = ?''', (card_id,))
-    card_row = c.fetchone()
-    
-    if not card_row:
-        conn.close()
-        return jsonify({'error': 'Card not found'}), 404
-    
-    card_info = {
-        'card_name': card_row[0],
-        'card_last_four': card_row[1],
-        'credit_limit': card_row[2],
-        'billing_day': card_row[3],
-        'card_color': card_row[4]
-    }
-    
-    # Calculate date range based on billing cycle
-    today = datetime.now()
-    current_month = today.month
-    current_year = today.year
-    billing_day = card_info['billing_day']
-    
-    if today.day >= billing_day:
-        # Current billing cycle
-        cycle_start = datetime(current_year, current_month, billing_day)
-        if current_month == 12:
-            cycle_end = datetime(current_year + 1, 1, billing_day) - timedelta(days=1)
-        else:
-            cycle_end = datetime(current_year, current_month + 1, billing_day) - timedelta(days=1)
-    else:
-        # Previous billing cycle
-        if current_month == 1:
-            cycle_start = datetime(current_year - 1, 12, billing_day)
-        else:
-            cycle_start = datetime(current_year, current_month - 1, billing_day)
-        cycle_end = datetime(current_year, current_month, billing_day) - timedelta(days=1)
-    
-    # Total spent in current billing cycle
-    c.execute('''SELECT COALESCE(SUM(amount), 0) FROM expenses 
-                 WHERE card_id = ? AND date >= ? AND date <= ?''',
-              (card_id, cycle_start.strftime('%Y-%m-%d'), cycle_end.strftime('%Y-%m-%d')))
-    total_spent = c.fetchone()[0]
-    
-    # Available balance
-    available_balance = card_info['credit_limit'] - total_spent
-    utilization = (total_spent / card_info['credit_limit'] * 100) if card_info['credit_limit'] > 0 else 0
-    
-    # Category breakdown for this card
-    c.execute('''SELECT c.name, c.name_te, c.icon, COALESCE(SUM(e.amount), 0) as total
-                 FROM categories c
-                 LEFT JOIN expenses e ON c.id = e.category_id 
-                    AND e.card_id = ? AND e.date >= ? AND e.date <= ?
-                 GROUP BY c.id, c.name, c.name_te, c.icon
-                 HAVING total > 0
-                 ORDER BY total DESC
-                 LIMIT 5''', (card_id, cycle_start.strftime('%Y-%m-%d'), cycle_end.strftime('%Y-%m-%d')))
-    
-    category_breakdown = [{
-        'category': row[0],
-        'category_te': row[1],
-        'icon': row[2],
-        'amount': row[3]
-    } for row in c.fetchall()]
-    
-    # Recent transactions
-    c.execute('''SELECT e.id, e.amount, e.date, e.note, c.name, c.icon
-                 FROM expenses e
-                 JOIN categories c ON e.category_id = c.id
-                 WHERE e.card_id = ?
-                 ORDER BY e.date DESC, e.created_at DESC
-                 LIMIT 10''', (card_id,))
-    
-    recent_transactions = [{
-        'id': row[0],
-        'amount': row[1],
-        'date': row[2],
-        'note': row[3],
-        'category': row[4],
-        'icon': row[5]
-    } for row in c.fetchall()]
-    
-    conn.close()
+    with get_connection() as conn:
+        # Get card details
+        card_row = repository.credit_card(conn, card_id)
+    
+        if not card_row:
+            return jsonify({'error': 'Card not found'}), 404
+    
+        card_name, card_last_four, credit_limit, billing_day, card_color = card_row
+        card_info = {
+            'card_name': card_name,
+            'card_last_four': card_last_four,
+            'credit_limit': credit_limit,
+            'billing_day': billing_day,
+            'card_color': card_color
+        }
+    
+        # Current billing cycle from the materialized calendar
+        today = datetime.now().strftime('%Y-%m-%d')
+        cycle_start, cycle_end = billing.current_cycle(conn, card_id, today)
+    
+        # Total spent and top categories in current billing cycle
+        total_spent, categories = repository.card_cycle(conn, card_id, cycle_start, cycle_end)
+    
+        # Available balance
+        available_balance = card_info['credit_limit'] - total_spent
+        utilization = (total_spent / card_info['credit_limit'] * 100) if card_info['credit_limit'] > 0 else 0
+    
+        category_breakdown = [{
+            'category': name,
+            'category_te': name_te,
+            'icon': icon,
+            'amount': amount
+        } for name, name_te, icon, amount in categories]
+    
+        # Recent transactions
+        recent_transactions = [{
+            'id': expense_id,
+            'amount': amount,
+            'date': date,
+            'note': note,
+            'category': category,
+            'icon': icon
+        } for expense_id, amount, date, note, category, icon in repository.card_transactions(conn, card_id)]
     
     return jsonify({
         'card_info': card_info,
         'total_spent': total_spent,
         'available_balance': available_balance,
         'utilization': round(utilization, 1),
-        'cycle_start': cycle_start.strftime('%Y-%m-%d'),
-        'cycle_end': cycle_end.strftime('%Y-%m-%d'),
+        'cycle_start': cycle_start,
+        'cycle_end': cycle_end,
         'category_breakdown': category_breakdown,
         'recent_transactions': recent_transactions
     })
 
-@app.route('/api/budgets', methods=['GET'])
+@api.route('/api/credit-cards/<int:card_id>/statements', methods=['GET'])
+@conditional('credit_cards', 'expenses', daily=True)
+def get_card_statements(card_id):
+    # Ended cycles: frozen by the first write after they ended, live until then
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    with get_connection() as conn:
+        rows = billing.statements(conn, card_id, today)
+
+    return jsonify([{
+        'cycle_start': cycle_start,
+        'cycle_end': cycle_end,
+        'total': total,
+        'closed_at': closed_at
+    } for cycle_start, cycle_end, total, closed_at in rows])
+
+@api.route('/api/credit-cards/<int:card_id>/statements/<cycle_start>', methods=['GET'])
+@conditional('credit_cards', 'expenses', 'categories', daily=True)
+def get_card_statement(card_id, cycle_start):
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    with get_connection() as conn:
+        found = billing.statement(conn, card_id, cycle_start, today)
+
+    if not found:
+        return jsonify({'error': 'Statement not found'}), 404
+
+    (cycle_start, cycle_end, total, closed_at), categories = found
+    return jsonify({
+        'cycle_start': cycle_start,
+        'cycle_end': cycle_end,
+        'total': total,
+        'closed_at': closed_at,
+        'category_breakdown': [{
+            'category': name,
+            'category_te': name_te,
+            'icon': icon,
+            'amount': amount
+        } for name, name_te, icon, amount in categories]
+    })
+
+@api.route('/api/budgets', methods=['GET'])
+@conditional('budgets', 'profiles', 'categories')
 def get_budgets():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute('''SELECT b.id, b.profile_id, p.display_name, b.category_id, c.name, b.amount, b.period
-                 FROM budgets b
-                 LEFT JOIN profiles p ON b.profile_id = p.id
-                 LEFT JOIN categories c ON b.category_id = c.id''')
+    with get_connection() as conn:
+        rows = repository.budgets(conn)
     
     budgets = [{
-        'id': row[0],
-        'profile_id': row[1],
-        'profile_name': row[2],
-        'category_id': row[3],
-        'category_name': row[4],
-        'amount': row[5],
-        'period': row[6]
-    } for row in c.fetchall()]
-    
-    conn.close()
+        'id': budget_id,
+        'profile_id': profile_id,
+        'profile_name': profile_name,
+        'category_id': category_id,
+        'category_name': category_name,
+        'amount': amount,
+        'period': period
+    } for budget_id, profile_id, profile_name, category_id, category_name, amount, period in rows]
+    
     return jsonify(budgets)
 
-@app.route('/api/budgets', methods=['POST'])
+@api.route('/api/budgets', methods=['POST'])
 def set_budget():
     data = request.json
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
+    if data.get('period') not in repository.BUDGET_PERIODS:
+        return jsonify({'error': f"period must be one of {', '.join(repository.BUDGET_PERIODS)}"}), 400
     
-    # Check if budget exists
-    c.execute('''SELECT id FROM budgets 
-                 WHERE profile_id = ? AND category_id = ? AND period = ?''',
-              (data.get('profile_id'), data.get('category_id'), data['period']))
-    
-    existing = c.fetchone()
-    
-    if existing:
-        c.execute('''UPDATE budgets SET amount = ? 
-                     WHERE id = ?''', (data['amount'], existing[0]))
-    else:
-        c.execute('''INSERT INTO budgets (profile_id, category_id, amount, period)
-                     VALUES (?, ?, ?, ?)''',
-                  (data.get('profile_id'), data.get('category_id'), 
-                   data['amount'], data['period']))
-    
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        # One budget per (profile, category, period); setting it again updates the amount
+        repository.set_budget(conn, data.get('profile_id'), data.get('category_id'),
+                              data['amount'], data['period'])
+        results.clear()
     
     return jsonify({'message': 'Budget set successfully'}), 201
 
+@api.route('/api/budgets/status', methods=['GET'])
+@conditional('budgets', 'expenses', 'profiles', 'categories', daily=True)
+@cached('budgets', 'expenses', 'profiles', 'categories')
+def get_budget_status():
+    # Budget vs actual for every budget, with a straight-line projection to period end
+    with get_connection() as conn:
+        rows = repository.budget_status(conn, datetime.now().strftime('%Y-%m-%d'))
+    
+    budgets = []
+    for (budget_id, profile_id, profile_name, category_id, category_name, category_te, icon,
+         amount, period, period_start, period_end, spent, days_elapsed, period_days) in rows:
+        projected = spent / days_elapsed * period_days
+        budgets.append({
+            'id': budget_id,
+            'profile_id': profile_id,
+            'profile_name': profile_name,
+            'category_id': category_id,
+            'category_name': category_name,
+            'category_te': category_te,
+            'icon': icon,
+            'amount': amount,
+            'period': period,
+            'period_start': period_start,
+            'period_end': period_end,
+            'spent': spent,
+            'remaining': amount - spent,
+            'percent_used': round(spent / amount * 100, 1) if amount > 0 else 0,
+            'projected_spend': round(projected, 2),
+            'projected_overrun': round(max(0, projected - amount), 2),
+            'status': 'over' if spent > amount else 'at_risk' if projected > amount else 'ok'
+        })
+    
+    return jsonify(budgets)
+
+@api.route('/api/pool/stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify(pool_stats())
+
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(results.stats())
+
+@api.route('/api/slow-queries', methods=['GET'])
+def get_slow_queries():
+    # Statements over the slow-query threshold, ranked by total time
+    limit = clamp_limit(request.args.get('limit'))
+    with get_connection() as conn:
+        rows = slow_queries.summary(conn, limit)
+    
+    statements = [{
+        'fingerprint': fingerprint,
+        'sql': sql,
+        'calls': calls,
+        'total_ms': round(total_ms, 3),
+        'avg_ms': round(avg_ms, 3),
+        'max_ms': round(max_ms, 3),
+        'rows': row_count,
+        'last_seen': last_seen,
+        'plan': plan
+    } for fingerprint, sql, calls, total_ms, avg_ms, max_ms, row_count, last_seen, plan in rows]
+    
+    return jsonify({'threshold_ms': slow_queries.log.threshold_ms, 'statements': statements})
+
+@api.route('/api/ready', methods=['GET'])
+def ready():
+    # Readiness probe: 503 while draining or until the schema is current
+    if draining.is_set():
+        return jsonify({'status': 'draining'}), 503
+    try:
+        with get_connection() as conn:
+            version = get_version(conn)
+    except sqlite3.Error as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    if version < LATEST_VERSION:
+        return jsonify({'status': 'migrating', 'schema_version': version}), 503
+    return jsonify({'status': 'ready', 'schema_version': version, 'pid': os.getpid()})
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text format
+    body = (request_metrics.render()
+            + metrics.gauges('familyspend_pool', pool_stats(), 'Connection pool counter (see /api/pool/stats).')
+            + metrics.gauges('familyspend_result_cache', results.stats(), 'Result cache counter (see /api/cache/stats).'))
+    response = current_app.response_class(body, mimetype='text/plain')
+    response.headers['Content-Type'] = metrics.CONTENT_TYPE
+    return response
+
+def create_app(database=None):
+    # Application factory. Schema setup is left to the caller (init_db and
+    # seed_data, or serve.py once before forking), so workers don't repeat it.
+    if database:
+        db_pool.configure(database=database)
+    flask_app = Flask(__name__, static_folder=None)
+    CORS(flask_app)
+    metrics.init_app(flask_app, request_metrics)
+    flask_app.register_blueprint(api)
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
-    init_db()
-    seed_data()
-    print("🚀 FamilySpend is running at http://localhost:5000")
-    print("📱 Open in mobile view for best experience")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server. The reloader runs this file twice (a watcher and
+    # the serving child); only the child sets up the schema and serves.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_db()
+        seed_data()
+        print("🚀 FamilySpend is running at http://localhost:5000")
+        print("📱 Open in mobile view for best experience")
+        print("   For production use: python serve.py")
+    # The reloader also restarts (and re-fingerprints) when a frontend file changes
+    app.run(debug=True, host='0.0.0.0', port=5000,
+            extra_files=[os.path.join(ASSET_ROOT, name) for name in static_assets.SOURCES])
@@ -0,0 +1,216 @@
+"""ASGI entry point serving the same Flask routes from an asyncio event loop.
+
+Connections, keep-alives and request bodies are handled on the event loop,
+so an idle phone holding a connection open costs a socket, not a thread.
+Each request is then run through the unchanged Flask app (identical JSON,
+ETags and streaming) on one of two bounded thread lanes:
+
+- readers (GET/HEAD/OPTIONS): FAMILYSPEND_ASGI_READERS threads, default
+  the connection pool size, since each holds one pooled connection
+- writer (everything else): FAMILYSPEND_ASGI_WRITERS threads, default 1.
+  SQLite has a single writer, so extra threads would only wait on the lock.
+
+Requests beyond a lane's capacity wait on the event loop, not in a thread.
+
+    pip install uvicorn
+    python asgi.py [--host 0.0.0.0] [--port 8000]
+    # or: uvicorn asgi:app
+"""
+import argparse
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import db_pool
+from app import app as flask_app, draining, init_db, seed_data
+
+READERS = int(os.environ.get('FAMILYSPEND_ASGI_READERS', str(db_pool.POOL_SIZE)))
+WRITERS = int(os.environ.get('FAMILYSPEND_ASGI_WRITERS', '1'))
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Lane:
+    """A fixed-size thread pool whose backlog queues on the event loop."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix=f'familyspend-{name}')
+        self._slots = None
+        self.waiting = 0
+        self.completed = 0
+
+    async def run(self, fn, *args, context=None):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        self.waiting += 1
+        async with self._slots:
+            self.waiting -= 1
+            if context is not None:
+                fn, args = context.run, (fn, *args)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+            finally:
+                self.completed += 1
+
+    def shutdown(self):
+        # Lets queued and running calls (e.g. in-flight writes) finish
+        self.executor.shutdown(wait=True)
+
+
+def wsgi_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ for the Flask app."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.input_terminated': True,
+    }
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    # The body is already read whole; a chunked request sent no Content-Length
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+def _start(environ):
+    # Runs on a lane thread: dispatch to Flask and read ahead two body
+    # chunks. A JSON response is one chunk, so it is complete (and closed)
+    # after this single hop.
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                               for name, value in headers]
+        return lambda data: None
+
+    body = flask_app(environ, start_response)
+    chunks = iter(body)
+    first = next(chunks, None)
+    second = next(chunks, None) if first is not None else None
+    if second is None:
+        _close(body)
+        body = None
+    return response, body, chunks, first, second
+
+
+def _next_chunk(chunks):
+    return next(chunks, None)
+
+
+def _close(body):
+    close = getattr(body, 'close', None)
+    if close:
+        close()
+
+
+class App:
+    def __init__(self, readers=READERS, writers=WRITERS):
+        self.readers = Lane('reader', readers)
+        self.writer = Lane('writer', writers)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    # Schema and seed data once, before any request is served
+                    await self.writer.run(init_db)
+                    await self.writer.run(seed_data)
+                except Exception as e:
+                    print(f"Startup failed: {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown(self):
+        draining.set()
+        self.writer.shutdown()
+        self.readers.shutdown()
+        db_pool.get_pool().close_all()
+
+    async def http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        lane = self.readers if scope['method'] in READ_METHODS else self.writer
+        # Every hop of one response runs in the same context: a streamed body
+        # may be resumed on another lane thread, and Flask keeps the request
+        # context it pushed in a context variable
+        context = contextvars.copy_context()
+        response, wsgi_body, chunks, chunk, following = await lane.run(
+            _start, wsgi_environ(scope, bytes(body)), context=context)
+        try:
+            await send({'type': 'http.response.start',
+                        'status': response['status'],
+                        'headers': response['headers']})
+            if chunk is None:
+                await send({'type': 'http.response.body', 'body': b''})
+            # Streaming responses (CSV export) keep producing on the lane,
+            # one chunk per hop, so a slow client never pins a thread.
+            while chunk is not None:
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': following is not None})
+                chunk = following
+                if chunk is not None:
+                    following = await lane.run(_next_chunk, chunks, context=context)
+        finally:
+            if wsgi_body is not None:
+                await lane.run(_close, wsgi_body, context=context)
+
+
+app = App()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve FamilySpend over ASGI with uvicorn')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        print("asgi.py needs an ASGI server: pip install uvicorn")
+        sys.exit(1)
+    print(f"🚀 FamilySpend (asyncio) is running at http://localhost:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
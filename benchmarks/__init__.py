@@ -0,0 +1 @@
+"""Benchmarks for the SQLite backend. Run modules with `python -m benchmarks.<name>`."""
@@ -0,0 +1,292 @@
+"""Concurrent write/read load test measuring SQLite lock contention.
+
+--processes worker processes (separate servers sharing one database file)
+each run --threads threads (concurrent requests inside one server) for
+--duration seconds. Every thread issues a random mix of POST /api/expenses,
+DELETE /api/expenses/<id> (of expenses it added) and dashboard reads through
+the Flask test client. Connections are opened with TimedConnection, which
+takes the write lock explicitly when a transaction starts with a write, so
+the time spent waiting for it is measured on its own.
+
+Reports, per operation, throughput, latency percentiles and errors, split
+into busy errors ("database is locked", surfaced by the routes as a 500)
+and anything else; plus write-lock wait and commit latency percentiles.
+Journal mode, synchronous, busy timeout and pool size can be varied to
+compare settings:
+
+    python -m benchmarks.contention [--rows 20000] [--processes 2] [--threads 8] [--duration 10]
+        [--mix post=30,delete=10,read=60] [--journal-mode WAL] [--synchronous NORMAL]
+        [--busy-timeout 5000] [--pool-size 8] [--json report.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from benchmarks.generate import generate
+from benchmarks.harness import percentile
+
+READ_PATHS = [
+    '/api/dashboard/{profile}?period=month',
+    '/api/dashboard/{profile}?period=week',
+    '/api/family-overview?period=month',
+    '/api/budgets/status',
+    '/api/expenses?profile_id={profile}&limit=50',
+]
+
+OPERATIONS = ('post', 'delete', 'read')
+
+WRITE_VERBS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class Recorder:
+    """Per-process lock and commit timings, appended to from every thread."""
+
+    def __init__(self):
+        self.lock_waits = []
+        self.commits = []
+        self.busy = {'begin': 0, 'commit': 0}
+        self._lock = threading.Lock()
+
+    def add(self, samples, value):
+        with self._lock:
+            samples.append(value)
+
+    def count_busy(self, where):
+        with self._lock:
+            self.busy[where] += 1
+
+
+recorder = Recorder()
+
+
+def is_busy(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+class TimedConnection(sqlite3.Connection):
+    def _begin(self):
+        started = time.perf_counter()
+        try:
+            super().execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            if is_busy(e):
+                recorder.count_busy('begin')
+            raise
+        recorder.add(recorder.lock_waits, time.perf_counter() - started)
+
+    def execute(self, sql, parameters=()):
+        if not self.in_transaction:
+            statement = sql.lstrip().upper()
+            if statement.startswith('BEGIN IMMEDIATE'):
+                self._begin()
+                return self.cursor()
+            # sqlite3 would open a deferred transaction here and take the
+            # write lock inside the statement; take it first so the wait is
+            # timed separately from the statement itself
+            if statement.startswith(WRITE_VERBS):
+                self._begin()
+        return super().execute(sql, parameters)
+
+    def commit(self):
+        if not self.in_transaction:
+            return super().commit()
+        started = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.OperationalError as e:
+            # Rollback-journal modes need readers gone before a commit
+            if is_busy(e):
+                recorder.count_busy('commit')
+            raise
+        recorder.add(recorder.commits, time.perf_counter() - started)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def worker_thread(client, mix, deadline, seed, samples):
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = list(mix.values())
+    added = []
+    while time.monotonic() < deadline:
+        operation = rng.choices(names, weights)[0]
+        if operation == 'delete' and not added:
+            operation = 'post'
+        profile = rng.randint(1, 5)
+        if operation == 'post':
+            method, path = 'POST', '/api/expenses'
+            body = {'profile_id': profile, 'category_id': rng.randint(1, 32),
+                    'amount': rng.randint(10, 2000), 'date': time.strftime('%Y-%m-%d'), 'note': 'load'}
+        elif operation == 'delete':
+            method, path, body = 'DELETE', f'/api/expenses/{added.pop(rng.randrange(len(added)))}', None
+        else:
+            method, path, body = 'GET', rng.choice(READ_PATHS).format(profile=profile), None
+
+        started = time.perf_counter()
+        try:
+            response = client.open(path, method=method, json=body)
+            data = response.get_json(silent=True) or {}
+            status = response.status_code
+            error = data.get('error', '') if isinstance(data, dict) else ''
+        except sqlite3.Error as e:
+            # Routes without a try/except (the dashboards) raise straight through
+            status, error = 500, str(e)
+        elapsed = time.perf_counter() - started
+
+        if status < 400:
+            outcome = 'ok'
+            if operation == 'post':
+                added.append(data['id'])
+        else:
+            outcome = 'busy' if is_busy(error) else 'error'
+        samples.append((operation, outcome, elapsed))
+
+
+def worker_process(index, database, settings, threads, mix, start_at, duration, results):
+    import db_pool
+    from app import app
+
+    db_pool.configure(database=database, size=settings['pool_size'],
+                      pragmas={'journal_mode': settings['journal_mode'],
+                               'synchronous': settings['synchronous'],
+                               'busy_timeout': settings['busy_timeout']},
+                      factory=TimedConnection)
+    # Let unhandled errors (the read routes have no try/except) reach
+    # worker_thread, which counts them as the 500s a real server would send
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    client = app.test_client()
+
+    time.sleep(max(0, start_at - time.time()))
+    deadline = time.monotonic() + duration
+    samples = []
+    pool = [threading.Thread(target=worker_thread, args=(client, mix, deadline, index * 1000 + i, samples))
+            for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    db_pool.get_pool().close_all()
+    results.put({'samples': samples, 'lock_waits': recorder.lock_waits,
+                 'commits': recorder.commits, 'busy': recorder.busy})
+
+
+def summarize(samples, elapsed):
+    report = {}
+    for operation in OPERATIONS + ('all',):
+        latencies = [s for op, outcome, s in samples if operation in (op, 'all') and outcome == 'ok']
+        outcomes = [outcome for op, outcome, _ in samples if operation in (op, 'all')]
+        if not outcomes:
+            continue
+        report[operation] = {
+            'requests': len(outcomes),
+            'ok': outcomes.count('ok'),
+            'busy_errors': outcomes.count('busy'),
+            'other_errors': outcomes.count('error'),
+            'throughput': round(outcomes.count('ok') / elapsed, 1),
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+        }
+    return report
+
+
+def timings(samples):
+    return {
+        'count': len(samples),
+        'total_ms': round(sum(samples) * 1000, 1),
+        'p50': round(percentile(samples, 0.50), 3),
+        'p95': round(percentile(samples, 0.95), 3),
+        'p99': round(percentile(samples, 0.99), 3),
+        'max': round(max(samples) * 1000, 3) if samples else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000, help='expenses to generate (ignored with --db)')
+    parser.add_argument('--db', help='existing database from benchmarks.generate (copied, not modified)')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per process')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('post=30,delete=10,read=60'))
+    parser.add_argument('--journal-mode', default='WAL')
+    parser.add_argument('--synchronous', default='NORMAL')
+    parser.add_argument('--busy-timeout', type=int, default=5000, help='ms')
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'bench.db')
+    if args.db:
+        shutil.copy(args.db, path)
+    else:
+        generate(path, args.rows)
+    settings = {'journal_mode': args.journal_mode, 'synchronous': args.synchronous,
+                'busy_timeout': args.busy_timeout, 'pool_size': args.pool_size}
+
+    # Spawned, not forked, so no process inherits another's connections
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start_at = time.time() + 2 + args.processes * 0.5
+    processes = [context.Process(target=worker_process,
+                                 args=(i, path, settings, args.threads, args.mix, start_at, args.duration, results))
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    samples = [s for c in collected for s in c['samples']]
+    report = {
+        'settings': dict(settings, processes=args.processes, threads=args.threads,
+                         duration=args.duration, mix=args.mix),
+        'operations': summarize(samples, args.duration),
+        'lock_wait': timings([w for c in collected for w in c['lock_waits']]),
+        'commit': timings([w for c in collected for w in c['commits']]),
+        'busy_in_sqlite': {where: sum(c['busy'][where] for c in collected) for where in ('begin', 'commit')},
+    }
+
+    settings_line = ', '.join(f'{k}={v}' for k, v in report['settings'].items() if k != 'mix')
+    mix_line = ', '.join(f'{k}={v:g}' for k, v in args.mix.items())
+    print(f"{settings_line}\nmix: {mix_line}\n")
+    print(f"{'operation':10} {'requests':>9} {'ok/s':>8} {'busy':>6} {'errors':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for operation, r in report['operations'].items():
+        print(f"{operation:10} {r['requests']:9} {r['throughput']:8.1f} {r['busy_errors']:6} "
+              f"{r['other_errors']:7} {r['p50']:8.2f} {r['p95']:8.2f} {r['p99']:8.2f}")
+    print()
+    for name in ('lock_wait', 'commit'):
+        t = report[name]
+        print(f"{name:10} n={t['count']:<7} total={t['total_ms']:.0f}ms p50={t['p50']:.2f} "
+              f"p95={t['p95']:.2f} p99={t['p99']:.2f} max={t['max']:.2f} ms")
+    busy = report['busy_in_sqlite']
+    print(f"busy errors in SQLite: {busy['begin']} taking the write lock, {busy['commit']} at commit")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"Saved {args.json}")
+
+
+if __name__ == '__main__':
+    main()
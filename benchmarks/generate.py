@@ -0,0 +1,144 @@
+"""Deterministic synthetic dataset for benchmarks.
+
+Fills a fresh database with the seeded 5 profiles and 32 categories, a few
+credit cards (billing days 1, 5, 15, 28 and 31), a set of budgets, and
+--rows expenses spread over the --years ending on --end. Amounts, category
+mix and card usage follow per-category profiles, so aggregates look like a
+real household's. The same --seed, --rows, --years and --end always
+produce the same database.
+
+    python -m benchmarks.generate --rows 100000 --out bench.db [--years 3] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import migrations
+import repository
+
+# Category -> (relative frequency, min amount, max amount)
+CATEGORY_PROFILES = {
+    'Rice': (6, 200, 1800), 'Dal': (5, 80, 600), 'Oil': (4, 150, 900),
+    'Vegetables': (14, 30, 400), 'Fruits': (8, 40, 500), 'Dairy': (12, 25, 300),
+    'Snacks': (7, 20, 250), 'Cleaning': (3, 50, 500), 'Toiletries': (3, 40, 600),
+    'Electricity': (1, 800, 4500), 'Water': (1, 100, 600), 'Gas': (1, 900, 1200),
+    'Rent/EMI': (1, 12000, 35000), 'Fuel': (6, 200, 3000), 'Auto': (5, 30, 250),
+    'Bus': (4, 10, 80), 'Medical': (3, 100, 5000), 'Education': (1, 1000, 25000),
+    'Movies': (2, 150, 1200), 'Dining Out': (6, 150, 2500), 'Clothing': (2, 300, 6000),
+    'Electronics': (1, 500, 60000), 'Gifts': (1, 200, 5000), 'Maintenance': (1, 200, 4000),
+    'Subscriptions': (2, 99, 1499), 'Office': (2, 50, 2000), 'Travel': (1, 500, 30000),
+    'Pets': (1, 100, 2500), 'Repairs': (1, 200, 8000), 'Savings': (1, 1000, 20000),
+    'Miscellaneous': (3, 20, 1500), 'Personal Care': (2, 100, 2000),
+}
+
+# Profile name -> relative share of expenses
+PROFILE_WEIGHTS = {'dad': 3, 'mom': 4, 'chaithu': 2, 'harshith': 1, 'common': 5}
+
+# (profile name, card name, last four, limit, billing day, colour)
+CARDS = [
+    ('dad', 'HDFC Regalia', '4321', 300000, 5, '#1A237E'),
+    ('dad', 'SBI SimplyClick', '8765', 100000, 31, '#0D47A1'),
+    ('mom', 'ICICI Amazon Pay', '1122', 150000, 15, '#E65100'),
+    ('chaithu', 'Axis Flipkart', '3344', 50000, 28, '#4A148C'),
+    ('common', 'Kotak 811', '5566', 80000, 1, '#B71C1C'),
+]
+
+# Share of each profile's expenses paid by card (when the profile has one)
+CARD_SHARE = 0.35
+
+# (profile name or None, category name or None, amount, period)
+BUDGETS = [
+    (None, None, 150000, 'monthly'),
+    (None, 'Dining Out', 8000, 'monthly'),
+    (None, 'Fuel', 2500, 'weekly'),
+    ('mom', None, 60000, 'monthly'),
+    ('dad', 'Electronics', 50000, 'yearly'),
+    ('chaithu', 'Movies', 2000, 'monthly'),
+]
+
+BATCH_SIZE = 50000
+
+
+def generate(path, rows, years=3, end=None, seed=1):
+    """Create `path` (replacing it) and fill it; returns the number of expenses."""
+    end = end or date.today()
+    start = end - timedelta(days=int(365 * years) - 1)
+    days = (end - start).days + 1
+    rng = random.Random(seed)
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')
+    migrations.migrate(conn)
+    repository.seed(conn)
+
+    profile_ids = dict(conn.execute('SELECT name, id FROM profiles'))
+    category_ids = dict(conn.execute('SELECT name, id FROM categories'))
+    created = f'{start.isoformat()}T00:00:00'
+
+    cards_by_profile = {}
+    for profile, name, last_four, limit, billing_day, colour in CARDS:
+        card_id = conn.execute('''INSERT INTO credit_cards (profile_id, card_name, card_last_four, credit_limit,
+                                                            billing_day, card_color, created_at)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                               (profile_ids[profile], name, last_four, limit, billing_day, colour,
+                                created)).lastrowid
+        cards_by_profile.setdefault(profile_ids[profile], []).append(card_id)
+    for profile, category, amount, period in BUDGETS:
+        conn.execute('INSERT INTO budgets (profile_id, category_id, amount, period) VALUES (?, ?, ?, ?)',
+                     (profile_ids.get(profile), category_ids.get(category), amount, period))
+    conn.commit()
+
+    profiles = [profile_ids[name] for name in PROFILE_WEIGHTS]
+    profile_weights = list(PROFILE_WEIGHTS.values())
+    categories = [(category_ids[name], low, high) for name, (_, low, high) in CATEGORY_PROFILES.items()]
+    category_weights = [weight for weight, _, _ in CATEGORY_PROFILES.values()]
+
+    batch = []
+    for i in range(rows):
+        # Evenly spread over the period, with the time of day random
+        day = start + timedelta(days=i * days // rows)
+        profile_id = rng.choices(profiles, profile_weights)[0]
+        category_id, low, high = rng.choices(categories, category_weights)[0]
+        # Skewed towards the low end, like real receipts
+        amount = round(low + (high - low) * rng.random() ** 2, 2)
+        cards = cards_by_profile.get(profile_id)
+        card_id = rng.choice(cards) if cards and rng.random() < CARD_SHARE else None
+        seconds = rng.randrange(86400)
+        created_at = f'{day.isoformat()}T{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}.{i % 1000000:06d}'
+        batch.append((profile_id, category_id, amount, day.isoformat(), '', card_id, created_at))
+        if len(batch) >= BATCH_SIZE:
+            repository.insert_expenses(conn, batch)
+            batch = []
+    if batch:
+        repository.insert_expenses(conn, batch)
+
+    conn.execute('PRAGMA optimize')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--end', type=date.fromisoformat, default=None, help='last day (default: today)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='bench.db')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(args.out, args.rows, args.years, args.end, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {args.rows} expenses to {args.out} in {elapsed:.1f}s ({args.rows / elapsed:.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""Latency of every /api route and db.* function against a generated dataset.
+
+Each case is run --iterations times in-process (Flask test client, no
+network) on a copy of the database, so the write cases never touch the
+source. The result LRU is cleared before every request unless --warm, so
+by default the numbers are the cost of actually computing the response.
+Reports p50/p95/p99 in ms and rows/s (rows returned, exported or inserted
+per second of request time).
+
+    python -m benchmarks.harness --rows 100000                # generate, then measure
+    python -m benchmarks.harness --db bench.db                # reuse a generated file
+    python -m benchmarks.harness --rows 100000 --save-baseline
+    python -m benchmarks.harness --rows 100000 --compare      # exit 1 on a regression
+
+Baselines are stored as benchmarks/baselines/<rows>.json, with the last day
+of their data: --compare regenerates the same data, so every case (named
+without dates or ids) lines up with its baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.generate import generate
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Cases that scan a large share of the table run this fraction of --iterations
+HEAVY_SHARE = 0.1
+
+# A case fails --compare when both its p50 and p95 exceed the baseline's
+# times REGRESSION plus MIN_REGRESSION_MS: a slowdown has to show in the
+# median too, and be more than scheduler noise on sub-millisecond routes
+REGRESSION = 1.25
+MIN_REGRESSION_MS = 1.0
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000 if samples else 0
+
+
+def json_rows(response):
+    data = response.get_json(silent=True)
+    if isinstance(data, dict):
+        for key in ('expenses', 'category_breakdown', 'categories'):
+            if isinstance(data.get(key), list):
+                return len(data[key])
+        return 1
+    return len(data) if isinstance(data, list) else 0
+
+
+def csv_rows(response):
+    return max(0, response.get_data().count(b'\n') - 1)
+
+
+class Bench:
+    def __init__(self, client, results, iterations, warm):
+        self.client = client
+        self.results = results
+        self.iterations = iterations
+        self.warm = warm
+        self.report = {}
+
+    def runs(self, heavy):
+        return max(1, int(self.iterations * HEAVY_SHARE)) if heavy else self.iterations
+
+    def record(self, name, samples, rows):
+        total = sum(samples)
+        self.report[name] = {
+            'n': len(samples),
+            'p50': round(percentile(samples, 0.50), 3),
+            'p95': round(percentile(samples, 0.95), 3),
+            'p99': round(percentile(samples, 0.99), 3),
+            'rows_per_s': round(rows / total) if total else 0,
+        }
+
+    def request(self, method, path, body=None, status=200):
+        if not self.warm:
+            self.results.clear()
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, json=body)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        if response.status_code != status:
+            raise RuntimeError(f'{method} {path}: {response.status_code} {response.get_data()[:200]!r}')
+        return response, elapsed
+
+    def route(self, method, path, body=None, status=200, count=json_rows, heavy=False, name=None):
+        samples = []
+        rows = 0
+        for _ in range(self.runs(heavy)):
+            response, elapsed = self.request(method, path, body, status)
+            samples.append(elapsed)
+            rows += count(response)
+        self.record(name or f'{method} {path}', samples, rows)
+
+    def pair(self, first, second):
+        # Write cases that undo each other, e.g. add then delete: each call is
+        # (name, method, path-or-callable, body, status, count); a callable
+        # path gets the first response
+        samples = ([], [])
+        rows = [0, 0]
+        for _ in range(self.iterations):
+            response = None
+            for i, (name, method, path, body, status, count) in enumerate((first, second)):
+                if callable(path):
+                    path = path(response)
+                response, elapsed = self.request(method, path, body, status)
+                samples[i].append(elapsed)
+                rows[i] += count
+        self.record(first[0], samples[0], rows[0])
+        self.record(second[0], samples[1], rows[1])
+
+    def call(self, name, fn, *args, heavy=False, count=len):
+        samples = []
+        rows = 0
+        for _ in range(self.runs(heavy)):
+            started = time.perf_counter()
+            result = fn(*args)
+            samples.append(time.perf_counter() - started)
+            rows += count(result)
+        self.record(name, samples, rows)
+
+
+def run(database, iterations, warm=False):
+    import db
+    import db_pool
+    from app import app, results
+
+    db_pool.configure(database=database)
+    client = app.test_client()
+    bench = Bench(client, results, iterations, warm)
+
+    with db_pool.get_connection() as conn:
+        end = conn.execute('SELECT MAX(date) FROM expenses').fetchone()[0] or date.today().isoformat()
+        card_id = conn.execute('SELECT MIN(id) FROM credit_cards').fetchone()[0]
+        profile_id = conn.execute('SELECT MIN(id) FROM profiles').fetchone()[0]
+    month_start = end[:8] + '01'
+    quarter_start = (date.fromisoformat(end) - timedelta(days=90)).isoformat()
+
+    # Reads
+    bench.route('GET', '/')
+    bench.route('GET', '/api/profiles')
+    bench.route('GET', '/api/categories')
+    bench.route('GET', '/api/expenses')
+    bench.route('GET', f'/api/expenses?profile_id={profile_id}&limit=50',
+                name='GET /api/expenses?profile_id=<id>&limit=50')
+    bench.route('GET', f'/api/expenses?start_date={quarter_start}&end_date={end}&limit=200',
+                name='GET /api/expenses (last quarter, limit=200)')
+    cursor = client.get('/api/expenses?limit=50').get_json()['next_cursor']
+    if cursor:
+        bench.route('GET', f'/api/expenses?limit=50&cursor={cursor}', name='GET /api/expenses (page 2)')
+    for period in ('week', 'month', 'year'):
+        bench.route('GET', f'/api/dashboard/{profile_id}?period={period}',
+                    name=f'GET /api/dashboard/<id>?period={period}')
+    for period in ('week', 'month', 'year'):
+        bench.route('GET', f'/api/family-overview?period={period}')
+    bench.route('GET', f'/api/export/csv?profile_id={profile_id}&start_date={month_start}&end_date={end}',
+                count=csv_rows, name='GET /api/export/csv (profile, last month)')
+    bench.route('GET', '/api/export/csv', count=csv_rows, heavy=True)
+    bench.route('GET', '/api/credit-cards')
+    bench.route('GET', '/api/credit-cards/summary')
+    bench.route('GET', f'/api/credit-cards/{profile_id}', name='GET /api/credit-cards/<profile_id>')
+    if card_id:
+        bench.route('GET', f'/api/credit-cards/{card_id}/dashboard', name='GET /api/credit-cards/<id>/dashboard')
+        bench.route('GET', f'/api/credit-cards/{card_id}/statements', name='GET /api/credit-cards/<id>/statements')
+        statements = client.get(f'/api/credit-cards/{card_id}/statements').get_json()
+        if statements:
+            bench.route('GET', f"/api/credit-cards/{card_id}/statements/{statements[0]['cycle_start']}",
+                        name='GET /api/credit-cards/<id>/statements/<cycle>')
+    bench.route('GET', '/api/budgets')
+    bench.route('GET', '/api/budgets/status')
+    bench.route('GET', '/api/pool/stats')
+    bench.route('GET', '/api/cache/stats')
+
+    # Writes
+    expense = {'profile_id': profile_id, 'category_id': 1, 'amount': 120, 'date': end, 'note': 'bench'}
+    bench.pair(('POST /api/expenses', 'POST', '/api/expenses', expense, 201, 1),
+               ('DELETE /api/expenses/<id>', 'DELETE',
+                lambda response: f"/api/expenses/{response.get_json()['id']}", None, 200, 1))
+    bulk = [dict(expense, amount=10 + i) for i in range(100)]
+    bench.route('POST', '/api/expenses/bulk', bulk, status=201,
+                count=lambda response: response.get_json()['inserted'], heavy=True)
+    bench.route('POST', '/api/budgets', {'profile_id': None, 'category_id': None,
+                                         'amount': 150000, 'period': 'monthly'}, status=201)
+    card = {'profile_id': profile_id, 'card_name': 'Bench', 'credit_limit': 50000, 'billing_day': 10}
+    bench.pair(('POST /api/credit-cards', 'POST', '/api/credit-cards', card, 201, 1),
+               ('DELETE /api/credit-cards/<id>', 'DELETE',
+                lambda response: f"/api/credit-cards/{response.get_json()['id']}", None, 200, 1))
+    if card_id:
+        bench.route('PUT', f'/api/credit-cards/{card_id}',
+                    {'card_name': 'HDFC Regalia', 'credit_limit': 300000, 'billing_day': 5},
+                    name='PUT /api/credit-cards/<id>')
+
+    # Streamlit backend
+    bench.call('db.get_profiles', db.get_profiles)
+    bench.call('db.get_categories', db.get_categories)
+    bench.call('db.get_expenses(limit=100)', db.get_expenses, None, None, None, 100)
+    bench.call('db.get_expenses(profile, quarter)', db.get_expenses, profile_id, quarter_start, end,
+               heavy=True)
+    bench.call('db.get_expenses_page', db.get_expenses_page, profile_id, None, None, 50,
+               count=lambda result: len(result[0]))
+    bench.call('db.get_credit_cards', db.get_credit_cards)
+    bench.call('db.get_dashboard_stats(month)', db.get_dashboard_stats, profile_id, 'month',
+               count=lambda result: len(result['category_breakdown']))
+    bench.call('db.get_family_overview(month)', db.get_family_overview, 'month',
+               count=lambda result: len(result['profile_spending']))
+    bench.call('db.add_expense', db.add_expense, profile_id, 1, 120, end, 'bench', count=lambda result: 1)
+
+    db_pool.get_pool().close_all()
+    return bench.report
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"{'case':52} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows/s':>11}"
+          + (f" {'p95 vs base':>12}" if baseline else ''))
+    regressions = []
+    for name, r in report.items():
+        line = f"{name[:52]:52} {r['n']:5} {r['p50']:9.2f} {r['p95']:9.2f} {r['p99']:9.2f} {r['rows_per_s']:11}"
+        if baseline is not None:
+            before = baseline.get(name)
+            if before is None:
+                line += f" {'no baseline':>12} !"
+                regressions.append(name)
+            else:
+                ratio = r['p95'] / before['p95'] if before['p95'] else 1
+                slower = all(r[p] > before[p] * REGRESSION + MIN_REGRESSION_MS for p in ('p50', 'p95'))
+                line += f" {ratio:11.2f}x" + (' !' if slower else '')
+                if slower:
+                    regressions.append(name)
+        print(line)
+    for name in (baseline or {}).keys() - report.keys():
+        print(f"{name[:52]:52} {'not run':>5} !")
+        regressions.append(name)
+    return regressions
+
+
+def load_baseline(rows):
+    path = os.path.join(BASELINES, f'{rows}.json')
+    if not os.path.exists(path):
+        print(f"No baseline for {rows} rows ({path})")
+        sys.exit(1)
+    with open(path) as f:
+        baseline = json.load(f)
+    # Baselines from before 'end' was stored were generated up to the day they were recorded
+    baseline.setdefault('end', baseline['recorded'])
+    return baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='expenses to generate (ignored with --db)')
+    parser.add_argument('--db', help='existing database from benchmarks.generate (copied, not modified)')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warm', action='store_true', help='keep the result cache between requests')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'bench.db')
+    try:
+        baseline = None
+        end = date.today()
+        if args.compare and not args.db:
+            # Regenerate the baseline's data: same rows, same last day
+            baseline = load_baseline(args.rows)
+            end = date.fromisoformat(baseline['end'])
+        if args.db:
+            shutil.copy(args.db, path)
+        else:
+            started = time.perf_counter()
+            generate(path, args.rows, end=end)
+            print(f"Generated {args.rows} expenses in {time.perf_counter() - started:.1f}s")
+        conn = sqlite3.connect(path)
+        rows, last_day = conn.execute('SELECT COUNT(*), MAX(date) FROM expenses').fetchone()
+        conn.close()
+        if not args.db:
+            last_day = end.isoformat()
+        if args.compare and args.db:
+            baseline = load_baseline(rows)
+
+        report = run(path, args.iterations, args.warm)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{rows} expenses, {args.iterations} iterations, {'warm' if args.warm else 'cold'} result cache")
+    regressions = print_report(report, baseline and baseline['results'])
+
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        baseline_path = os.path.join(BASELINES, f'{rows}.json')
+        with open(baseline_path, 'w') as f:
+            json.dump({'rows': rows, 'iterations': args.iterations, 'warm': args.warm,
+                       'recorded': date.today().isoformat(), 'end': last_day, 'environment': environment(),
+                       'results': report}, f, indent=2)
+            f.write('\n')
+        print(f"Saved {baseline_path}")
+    if regressions:
+        print(f"\nRegressions (p50 and p95 > {REGRESSION:.2f}x + {MIN_REGRESSION_MS:g} ms) "
+              f"or cases missing from one side: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Micro-benchmarks for per-row cost in the data-access layer.
+
+Compares the old db.py way of building expense dicts (sqlite3.Row factory,
+then a name lookup per column) against repository.py's plain tuples with
+positional unpacking, and measures what the per-connection statement cache
+saves on the small repeated queries the API issues.
+
+    python -m benchmarks.rows [--rows 50000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import migrations
+import repository
+
+
+def build_database(path, rows):
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    repository.seed(conn)
+    conn.execute("INSERT INTO credit_cards (profile_id, card_name, credit_limit, billing_day, created_at) "
+                 "VALUES (1, 'Bench', 100000, 10, '2020-01-01T00:00:00')")
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    conn.executemany(
+        'INSERT INTO expenses (profile_id, category_id, amount, date, note, card_id, created_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((rng.randint(1, 5), rng.randint(1, 32), round(rng.uniform(10, 5000), 2),
+          (start + timedelta(days=i % 1500)).isoformat(), 'bench',
+          1 if i % 4 == 0 else None, f'2020-01-01T00:00:{i:09d}')
+         for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def rows_as_dicts_by_name(conn):
+    # Old db.get_expenses: sqlite3.Row, then row['column'] per field
+    conn.row_factory = sqlite3.Row
+    rows = repository.expenses(conn)
+    conn.row_factory = None
+    return [{
+        'id': row['id'],
+        'profile_id': row['profile_id'],
+        'profile_name': row['display_name'],
+        'category_id': row['category_id'],
+        'category_name': row['name'],
+        'category_name_te': row['name_te'],
+        'category_icon': row['icon'],
+        'amount': row['amount'],
+        'date': row['date'],
+        'note': row['note'],
+        'card_id': row['card_id'],
+        'card_name': row['card_name'],
+        'created_at': row['created_at']
+    } for row in rows]
+
+
+def rows_as_row_copies(conn):
+    # Old db.get_profiles / get_credit_cards: dict(row)
+    conn.row_factory = sqlite3.Row
+    rows = [dict(row) for row in repository.expenses(conn)]
+    conn.row_factory = None
+    return rows
+
+
+def rows_as_tuples(conn):
+    # repository.py + db._expense_dicts: plain tuples, positional unpacking
+    return [{
+        'id': expense_id,
+        'profile_id': profile_id,
+        'profile_name': profile_name,
+        'category_id': category_id,
+        'category_name': category_name,
+        'category_name_te': category_name_te,
+        'category_icon': category_icon,
+        'amount': amount,
+        'date': day,
+        'note': note,
+        'card_id': card_id,
+        'card_name': card_name,
+        'created_at': created_at
+    } for (expense_id, profile_id, profile_name, category_id, category_name, category_name_te,
+           category_icon, amount, day, note, card_id, card_name, created_at) in repository.expenses(conn)]
+
+
+def time_best(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def statement_workload(conn, iterations):
+    # The mix of small statements one dashboard + history + cards page load issues
+    today = '2024-02-09'
+    for i in range(iterations):
+        repository.dashboard(conn, 1 + i % 5, '2024-01-01', today)
+        repository.family_overview(conn, '2024-01-01')
+        repository.card_cycle(conn, 1, '2024-01-10', '2024-02-09')
+        repository.expenses_page(conn, 1 + i % 5, None, None, 20, None)
+        repository.profiles(conn)
+        repository.categories(conn)
+        repository.credit_cards(conn)
+        repository.table_versions(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    build_database(path, args.rows)
+    conn = sqlite3.connect(path)
+
+    print(f"Row materialization, {args.rows} expenses (best of {args.repeat})")
+    baseline = None
+    for label, fn in (('sqlite3.Row + row[name]', rows_as_dicts_by_name),
+                      ('sqlite3.Row + dict(row)', rows_as_row_copies),
+                      ('tuple + unpacking', rows_as_tuples)):
+        seconds, rows = time_best(lambda: fn(conn), args.repeat)
+        assert len(rows) == args.rows
+        per_row = seconds / args.rows * 1e6
+        baseline = baseline or per_row
+        print(f"  {label:26} {seconds * 1000:8.1f} ms  {per_row:6.2f} us/row  {baseline / per_row:5.2f}x")
+    conn.close()
+
+    print(f"\nStatement cache, {args.iterations} page-load workloads (8 statements each)")
+    baseline = None
+    for size in (0, 256):
+        conn = sqlite3.connect(path, cached_statements=size)
+        seconds, _ = time_best(lambda: statement_workload(conn, args.iterations), args.repeat)
+        per_statement = seconds / (args.iterations * 8) * 1e6
+        baseline = baseline or per_statement
+        print(f"  cached_statements={size:<4}      {seconds * 1000:8.1f} ms  "
+              f"{per_statement:6.2f} us/stmt {baseline / per_statement:5.2f}x")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
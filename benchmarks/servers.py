@@ -0,0 +1,257 @@
+"""Throughput of the debug server, the Flask dev server (threaded), the
+production server (serve.py) and the ASGI entry point.
+
+Each server runs as a subprocess on a copy of one generated database. The
+client holds --idle keep-alive connections open (phones sitting on a page)
+while --concurrency connections issue a mix of API reads and, with
+--write-ratio, expense inserts for --duration seconds. Reports requests/s,
+latency percentiles, errors, time to the first served request and the
+thread count (all processes of the server). Every route's JSON is first
+compared with the first server's.
+
+    pip install uvicorn gunicorn
+    python -m benchmarks.servers [--rows 20000] [--idle 200] [--concurrency 32] [--duration 10]
+        [--servers debug,flask,serve,asgi]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.rows import build_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_PATHS = [
+    '/api/profiles',
+    '/api/categories',
+    '/api/dashboard/1?period=month',
+    '/api/dashboard/2?period=week',
+    '/api/family-overview?period=month',
+    '/api/expenses?profile_id=3&limit=50',
+    '/api/credit-cards/summary',
+    '/api/credit-cards/1/dashboard',
+    '/api/budgets/status',
+]
+
+SERVERS = {
+    # What `python app.py` runs: debugger and reloader on
+    'debug': [sys.executable, '-c',
+              "import sys; from app import app, init_db, seed_data; init_db(); seed_data(); "
+              "app.run(debug=True, host='127.0.0.1', port=int(sys.argv[1]))"],
+    'flask': [sys.executable, '-c',
+              "import sys; from app import app, init_db, seed_data; init_db(); seed_data(); "
+              "app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)"],
+    'serve': [sys.executable, 'serve.py', '--host', '127.0.0.1', '--workers', '2', '--threads', '8', '--port'],
+    'asgi': [sys.executable, 'asgi.py', '--host', '127.0.0.1', '--port'],
+}
+
+
+async def http(reader, writer, method, path, body=None):
+    """One HTTP/1.1 request on an open connection: (status, body, keep_alive)."""
+    head = f'{method} {path} HTTP/1.1\r\nHost: bench\r\n'
+    if body is not None:
+        head += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+    writer.write(head.encode() + b'\r\n' + (body or b''))
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, value = line.decode('latin-1').split(':', 1)
+        headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        data = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        data = b''
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            data += await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        data = await reader.read()
+    keep_alive = status_line.startswith(b'HTTP/1.1') and headers.get('connection', '').lower() != 'close'
+    return int(status_line.split()[1]), data, keep_alive
+
+
+def thread_count(pid):
+    # Threads of pid and its descendants (reloader child, forked workers)
+    try:
+        tasks = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return None
+    total = len(tasks)
+    for task in tasks:
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children = f.read().split()
+        except OSError:
+            continue
+        total += sum(thread_count(int(child)) or 0 for child in children)
+    return total
+
+
+async def wait_ready(port, timeout=30):
+    """Seconds until the server answers its first request."""
+    started = time.monotonic()
+    deadline = started + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            status, _, _ = await http(reader, writer, 'GET', '/api/profiles')
+            writer.close()
+            if status == 200:
+                return time.monotonic() - started
+        except (OSError, ConnectionError, ValueError):
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+async def fetch_json(port, paths):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    bodies = {}
+    for path in paths:
+        status, data, keep_alive = await http(reader, writer, 'GET', path)
+        bodies[path] = (status, json.loads(data))
+        if not keep_alive:
+            writer.close()
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.close()
+    return bodies
+
+
+async def load(port, pid, args):
+    idle = []
+    for _ in range(args.idle):
+        try:
+            idle.append(await asyncio.open_connection('127.0.0.1', port))
+        except OSError:
+            break
+    await asyncio.sleep(0.5)
+    threads_idle = thread_count(pid)
+
+    latencies = []
+    errors = 0
+    peak_threads = threads_idle or 0
+    deadline = time.monotonic() + args.duration
+    rng = random.Random(7)
+
+    async def worker():
+        nonlocal errors
+        reader = writer = None
+        while time.monotonic() < deadline:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            if rng.random() < args.write_ratio:
+                body = json.dumps({'profile_id': rng.randint(1, 5), 'category_id': rng.randint(1, 32),
+                                   'amount': 100, 'date': '2024-02-01', 'note': 'bench'}).encode()
+                method, path = 'POST', '/api/expenses'
+            else:
+                body, method, path = None, 'GET', rng.choice(READ_PATHS)
+            started = time.perf_counter()
+            try:
+                status, _, keep_alive = await http(reader, writer, method, path, body)
+            except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+                errors += 1
+                writer.close()
+                writer = None
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status >= 500:
+                errors += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while time.monotonic() < deadline:
+            peak_threads = max(peak_threads, thread_count(pid) or 0)
+            await asyncio.sleep(0.25)
+
+    started = time.monotonic()
+    await asyncio.gather(sample_threads(), *(worker() for _ in range(args.concurrency)))
+    elapsed = time.monotonic() - started
+    for _, writer in idle:
+        writer.close()
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99),
+        'errors': errors,
+        'idle_open': len(idle),
+        'threads_idle': threads_idle,
+        'threads_peak': peak_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--idle', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    parser.add_argument('--port', type=int, default=18700)
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    args = parser.parse_args()
+    names = args.servers.split(',')
+
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, 'bench.db')
+    build_database(source, args.rows)
+
+    results = {}
+    bodies = {}
+    for offset, name in enumerate(names):
+        command = SERVERS[name]
+        port = args.port + offset
+        # Each server gets its own copy, so one run's writes don't change the other's JSON
+        path = os.path.join(workdir, f'{name}.db')
+        shutil.copy(source, path)
+        env = dict(os.environ, FAMILYSPEND_DB=path)
+        server = subprocess.Popen(command + [str(port)], cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            startup = asyncio.run(wait_ready(port))
+            bodies[name] = asyncio.run(fetch_json(port, READ_PATHS))
+            results[name] = asyncio.run(load(port, server.pid, args))
+            results[name]['startup'] = startup
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    for name in names[1:]:
+        mismatched = [path for path in READ_PATHS if bodies[names[0]][path] != bodies[name][path]]
+        print(f"{name}: JSON identical to {names[0]} on {len(READ_PATHS) - len(mismatched)}/{len(READ_PATHS)} routes"
+              + (f"; differs: {', '.join(mismatched)}" if mismatched else ''))
+    print(f"\n{args.rows} expenses, {args.idle} idle keep-alive connections, "
+          f"{args.concurrency} active, {args.write_ratio:.0%} writes, {args.duration:.0f}s")
+    print(f"{'server':8} {'start s':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} "
+          f"{'idle':>5} {'threads idle/peak':>18}")
+    for name, r in results.items():
+        print(f"{name:8} {r['startup']:8.2f} {r['rps']:8.0f} {r['p50']:8.2f} {r['p95']:8.2f} {r['p99']:8.2f} "
+              f"{r['errors']:7} {r['idle_open']:5} {str(r['threads_idle']) + '/' + str(r['threads_peak']):>18}")
+
+
+if __name__ == '__main__':
+    main()
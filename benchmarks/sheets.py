@@ -0,0 +1,209 @@
+"""Google Sheets backend: columnar expense pipeline vs the old row-by-row one.
+
+Loads a generated dataset into the local fake of GSheetsConnection
+(fake_gsheets.py), so no network is involved and the sheets are already in
+db_sheets' read cache: what's left is the pandas work each page render
+does. The old implementations (iterrows() into dicts, then back into a
+DataFrame for the dashboards) are kept here as the reference, and every
+case checks both return the same data.
+
+"rebuilt" times the new pipeline right after the expenses sheet was
+re-read (dates parsed and names mapped again); "cached" is every other
+render until the next read.
+
+    python -m benchmarks.sheets [--rows 100000] [--repeat 3]
+"""
+import argparse
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.generate import generate
+
+workdir = tempfile.mkdtemp()
+os.environ['FAMILYSPEND_FAKE_SHEETS'] = os.path.join(workdir, 'sheets')
+os.environ['FAMILYSPEND_SHEETS_JOURNAL'] = os.path.join(workdir, 'journal.db')
+os.environ.setdefault('FAMILYSPEND_SHEETS_EXPENSES_TTL', '3600')
+
+import db_sheets  # noqa: E402  (after the environment above)
+from pagination import clamp_limit, decode_cursor, encode_cursor  # noqa: E402
+from repository import period_start  # noqa: E402
+
+
+def load_sheets(rows):
+    path = os.path.join(workdir, 'bench.db')
+    generate(path, rows)
+    conn = sqlite3.connect(path)
+    sheets = {
+        'profiles': 'SELECT id, name, display_name FROM profiles',
+        'categories': 'SELECT id, name, name_te, icon FROM categories',
+        'credit_cards': f"SELECT {', '.join(db_sheets.CARD_COLS)} FROM credit_cards",
+        'expenses': f"SELECT {', '.join(db_sheets.EXPENSE_COLS)} FROM expenses",
+    }
+    fake = db_sheets.get_conn()
+    for worksheet, sql in sheets.items():
+        fake.update(worksheet=worksheet, data=pd.read_sql(sql, conn))
+    conn.close()
+
+
+# --- The row-by-row implementation, as it was ---
+
+def old_get_expenses(profile_id=None, start_date=None, end_date=None):
+    df = db_sheets._read_df('expenses', db_sheets.EXPENSE_COLS)
+    if df.empty:
+        return []
+    if profile_id:
+        df = df[df['profile_id'] == profile_id]
+    if start_date:
+        df = df[pd.to_datetime(df['date']) >= pd.to_datetime(start_date)]
+    if end_date:
+        df = df[pd.to_datetime(df['date']) <= pd.to_datetime(end_date)]
+    cats = {c['id']: c for c in db_sheets.get_categories()}
+    profs = {p['id']: p for p in db_sheets.get_profiles()}
+    cards = {c['id']: c for c in db_sheets.get_credit_cards()}
+    res = []
+    df = df.sort_values(by='date', ascending=False)
+    for _, row in df.iterrows():
+        c = cats.get(row['category_id'], {})
+        p = profs.get(row['profile_id'], {})
+        cc = cards.get(row['card_id'], {}) if pd.notna(row['card_id']) else {}
+        res.append({
+            'id': row['id'],
+            'profile_id': row['profile_id'],
+            'profile_name': p.get('display_name', 'Unknown'),
+            'category_id': row['category_id'],
+            'category_name': c.get('name', 'Unknown'),
+            'category_name_te': c.get('name_te', ''),
+            'category_icon': c.get('icon', '📝'),
+            'amount': row['amount'],
+            'date': row['date'],
+            'note': row['note'],
+            'card_id': row['card_id'],
+            'card_name': cc.get('card_name', None),
+            'created_at': row['created_at']
+        })
+    return res
+
+
+def old_get_expenses_page(profile_id=None, start_date=None, end_date=None, limit=None, cursor=None):
+    limit = clamp_limit(limit)
+
+    def sort_key(e):
+        return (str(e['date']), str(e['created_at']), int(e['id']))
+
+    exps = sorted(old_get_expenses(profile_id, start_date, end_date), key=sort_key, reverse=True)
+    if cursor:
+        after = decode_cursor(cursor)
+        exps = [e for e in exps if sort_key(e) < after]
+    page = exps[:limit]
+    next_cursor = encode_cursor(*sort_key(page[-1])) if len(exps) > limit else None
+    return page, next_cursor
+
+
+def old_get_dashboard_stats(profile_id, period='month'):
+    df = pd.DataFrame(old_get_expenses(profile_id, start_date=period_start(period, datetime.now())))
+    if df.empty:
+        return {'total_spent': 0, 'category_breakdown': [], 'weekly_trend': []}
+    cat_grp = df.groupby(['category_name', 'category_icon']).agg({'amount': 'sum'}).reset_index()
+    cat_breakdown = [{'name': row['category_name'], 'icon': row['category_icon'], 'total': row['amount']}
+                     for _, row in cat_grp.sort_values('amount', ascending=False).iterrows()]
+    trend_grp = df.groupby('date').agg({'amount': 'sum'}).reset_index().sort_values('date')
+    return {'total_spent': df['amount'].sum(), 'category_breakdown': cat_breakdown,
+            'weekly_trend': trend_grp.to_dict('records')}
+
+
+def old_get_family_overview(period='month'):
+    df = pd.DataFrame(old_get_expenses(start_date=period_start(period, datetime.now())))
+    if df.empty:
+        return {'total_family': 0, 'profile_spending': [], 'top_categories': []}
+    prof_grp = df.groupby('profile_name').agg({'amount': 'sum'}).reset_index()
+    cat_grp = df.groupby('category_name').agg({'amount': 'sum'}).reset_index()
+    return {
+        'total_family': df['amount'].sum(),
+        'profile_spending': [{'display_name': row['profile_name'], 'total': row['amount']}
+                             for _, row in prof_grp.sort_values('amount', ascending=False).iterrows()],
+        'top_categories': [{'name': row['category_name'], 'total': row['amount']}
+                           for _, row in cat_grp.sort_values('amount', ascending=False).head(10).iterrows()],
+    }
+
+
+# --- Comparison ---
+
+def same(old, new):
+    """Equal up to row order of get_expenses and float summation order."""
+    if isinstance(old, dict):
+        return old.keys() == new.keys() and all(same(old[k], new[k]) for k in old)
+    if isinstance(old, tuple):
+        return len(old) == len(new) and all(same(a, b) for a, b in zip(old, new))
+    if isinstance(old, list):
+        if len(old) != len(new):
+            return False
+        if not old:
+            return True
+        a, b = pd.DataFrame(old), pd.DataFrame(new)
+        if 'id' in a and 'total' not in a:
+            a = a.sort_values('id').reset_index(drop=True)
+            b = b.sort_values('id').reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(a, b, check_dtype=False, check_exact=False)
+        except AssertionError:
+            return False
+        return True
+    if isinstance(old, float) or isinstance(new, float):
+        return math.isclose(old, new, rel_tol=1e-9)
+    return old == new
+
+
+def time_best(fn, repeat, before=None):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def rebuild():
+    # As if the expenses sheet had just been downloaded again
+    db_sheets._prepared.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    load_sheets(args.rows)
+    db_sheets.get_expenses()  # fill the read cache
+
+    cases = [
+        ('get_expenses()', old_get_expenses, db_sheets.get_expenses, ()),
+        ('get_expenses(1, month)', old_get_expenses, db_sheets.get_expenses,
+         (1, period_start('month', datetime.now()))),
+        ('get_expenses_page(1)', old_get_expenses_page, db_sheets.get_expenses_page, (1,)),
+        ('get_dashboard_stats(1, month)', old_get_dashboard_stats, db_sheets.get_dashboard_stats, (1, 'month')),
+        ('get_dashboard_stats(1, year)', old_get_dashboard_stats, db_sheets.get_dashboard_stats, (1, 'year')),
+        ('get_family_overview(year)', old_get_family_overview, db_sheets.get_family_overview, ('year',)),
+    ]
+    print(f"Sheets backend, {args.rows} expenses in the read cache (best of {args.repeat}, ms)")
+    print(f"  {'case':30} {'row-by-row':>11} {'rebuilt':>9} {'cached':>9}   speedup rebuilt / cached")
+    for label, old, new, call_args in cases:
+        old_seconds, old_result = time_best(lambda: old(*call_args), args.repeat)
+        rebuilt_seconds, new_result = time_best(lambda: new(*call_args), args.repeat, before=rebuild)
+        cached_seconds, _ = time_best(lambda: new(*call_args), args.repeat)
+        assert same(old_result, new_result), f"{label}: results differ"
+        print(f"  {label:30} {old_seconds * 1000:11.1f} {rebuilt_seconds * 1000:9.1f} "
+              f"{cached_seconds * 1000:9.1f}   {old_seconds / rebuilt_seconds:6.1f}x / {old_seconds / cached_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
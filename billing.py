@@ -0,0 +1,301 @@
+"""Billing-cycle calendar and closed statements for credit cards.
+
+billing_cycles holds one row per card per cycle, from the card's first
+activity up to the cycle containing today. When a cycle ends, its total and
+category breakdown are frozen into the row and statement_categories (and
+frozen again if a back-dated expense lands in it later), so
+statement history is a primary-key read and the current cycle is a single
+indexed lookup instead of date arithmetic on every request.
+
+Only writes keep it current (ensure_synced, after every expense and card
+write); reads never write. Until the first write after a cycle ends, reads
+work out the open cycle from the billing day and show the ended one with a
+live total and no closed_at.
+
+A cycle starts on billing_day, clamped to the month's length (billing day 31
+starts on Feb 28/29 and Apr 30), and ends the day before the next one.
+
+    python billing.py sync       # materialize cycles and close finished ones
+    python billing.py reclose    # recompute every closed statement
+"""
+import calendar
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+from db_pool import get_connection, get_pool
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS billing_cycles (
+        card_id INTEGER NOT NULL,
+        cycle_start TEXT NOT NULL,
+        cycle_end TEXT NOT NULL,
+        total REAL,
+        closed_at TEXT,
+        PRIMARY KEY (card_id, cycle_start)
+    ) WITHOUT ROWID''',
+    '''CREATE INDEX IF NOT EXISTS idx_billing_cycles_open
+       ON billing_cycles (closed_at, cycle_end)''',
+    '''CREATE TABLE IF NOT EXISTS statement_categories (
+        card_id INTEGER NOT NULL,
+        cycle_start TEXT NOT NULL,
+        category_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (card_id, cycle_start, category_id)
+    ) WITHOUT ROWID''',
+    # Deleting a card drops its calendar and statements
+    '''CREATE TRIGGER IF NOT EXISTS trg_credit_cards_billing_delete
+       AFTER DELETE ON credit_cards
+       BEGIN
+           DELETE FROM billing_cycles WHERE card_id = OLD.id;
+           DELETE FROM statement_categories WHERE card_id = OLD.id;
+       END''',
+    # A new billing day only affects cycles that haven't closed yet
+    '''CREATE TRIGGER IF NOT EXISTS trg_credit_cards_billing_day
+       AFTER UPDATE OF billing_day ON credit_cards
+       WHEN NEW.billing_day != OLD.billing_day
+       BEGIN
+           DELETE FROM billing_cycles WHERE card_id = NEW.id AND closed_at IS NULL;
+       END''',
+]
+
+
+def _reopen(row):
+    # The closed cycle holding the row's date, if any, goes back to open so
+    # the next sync() freezes it again with the change
+    cycle = f'''card_id = {row}.card_id AND cycle_end >= {row}.date AND cycle_start = (
+        SELECT MAX(cycle_start) FROM billing_cycles
+        WHERE card_id = {row}.card_id AND cycle_start <= {row}.date)'''
+    return f'''
+    DELETE FROM statement_categories WHERE (card_id, cycle_start) IN (
+        SELECT card_id, cycle_start FROM billing_cycles WHERE {cycle} AND closed_at IS NOT NULL);
+    UPDATE billing_cycles SET total = NULL, closed_at = NULL
+    WHERE {cycle} AND closed_at IS NOT NULL;
+'''
+
+
+# Back-dated expense writes reopen the statement they fall in
+REOPEN_TRIGGERS = [
+    f'''CREATE TRIGGER IF NOT EXISTS trg_expenses_billing_insert
+        AFTER INSERT ON expenses
+        WHEN NEW.card_id IS NOT NULL
+        BEGIN {_reopen('NEW')} END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_expenses_billing_delete
+        AFTER DELETE ON expenses
+        WHEN OLD.card_id IS NOT NULL
+        BEGIN {_reopen('OLD')} END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_expenses_billing_update
+        AFTER UPDATE OF date, category_id, card_id, amount ON expenses
+        BEGIN {_reopen('OLD')} {_reopen('NEW')} END''',
+]
+
+
+def _clamped(year, month, day):
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def _shift_month(year, month, delta):
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def cycle_for(billing_day, day):
+    """Return (start, end) dates of the cycle containing `day`."""
+    start = _clamped(day.year, day.month, billing_day)
+    if day < start:
+        start = _clamped(*_shift_month(day.year, day.month, -1), billing_day)
+    end = _clamped(*_shift_month(start.year, start.month, 1), billing_day) - timedelta(days=1)
+    return start, end
+
+
+CLOSE_CATEGORIES_SQL = '''
+INSERT OR REPLACE INTO statement_categories (card_id, cycle_start, category_id, amount)
+SELECT b.card_id, b.cycle_start, d.category_id, SUM(d.amount)
+FROM billing_cycles b
+JOIN daily_totals d
+  ON d.card_id = b.card_id AND d.date >= b.cycle_start AND d.date <= b.cycle_end
+WHERE b.closed_at IS NULL AND b.cycle_end < :today
+GROUP BY b.card_id, b.cycle_start, d.category_id
+'''
+
+CLOSE_TOTALS_SQL = '''
+UPDATE billing_cycles
+SET total = (SELECT COALESCE(SUM(s.amount), 0)
+             FROM statement_categories s
+             WHERE s.card_id = billing_cycles.card_id
+               AND s.cycle_start = billing_cycles.cycle_start),
+    closed_at = :now
+WHERE closed_at IS NULL AND cycle_end < :today
+'''
+
+# Per card: billing day, first day with activity, first and last materialized day
+_CARDS_SQL = '''
+SELECT cc.id, cc.billing_day,
+       MIN(substr(cc.created_at, 1, 10),
+           COALESCE((SELECT MIN(e.date) FROM expenses e WHERE e.card_id = cc.id), '9999-12-31')),
+       (SELECT MIN(b.cycle_start) FROM billing_cycles b WHERE b.card_id = cc.id),
+       (SELECT MAX(b.cycle_end) FROM billing_cycles b WHERE b.card_id = cc.id)
+FROM credit_cards cc
+'''
+
+
+def sync(conn, today):
+    """Materialize cycles up to today and freeze every cycle that has ended.
+
+    Idempotent; returns (cycles added, statements closed).
+    """
+    today_date = date.fromisoformat(today)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        new_cycles = []
+        for card_id, billing_day, first_day, first_start, last_end in conn.execute(_CARDS_SQL).fetchall():
+            # Back-dated expenses from before the first cycle: fill in the
+            # cycles leading up to it
+            if first_start and first_day < first_start:
+                day = date.fromisoformat(first_day)
+                while day.isoformat() < first_start:
+                    start, end = cycle_for(billing_day, day)
+                    end = min(end, date.fromisoformat(first_start) - timedelta(days=1))
+                    new_cycles.append((card_id, start.isoformat(), end.isoformat()))
+                    day = end + timedelta(days=1)
+            if last_end:
+                day = floor = date.fromisoformat(last_end) + timedelta(days=1)
+            else:
+                day, floor = min(date.fromisoformat(first_day), today_date), None
+            while day <= today_date:
+                start, end = cycle_for(billing_day, day)
+                # After a billing-day change the first new cycle may reach
+                # back into the last closed one; it starts after it instead.
+                if floor and start < floor:
+                    start = floor
+                new_cycles.append((card_id, start.isoformat(), end.isoformat()))
+                day = end + timedelta(days=1)
+        conn.executemany('''INSERT OR IGNORE INTO billing_cycles (card_id, cycle_start, cycle_end)
+                            VALUES (?, ?, ?)''', new_cycles)
+
+        params = {'today': today, 'now': datetime.now().isoformat()}
+        conn.execute(CLOSE_CATEGORIES_SQL, params)
+        closed = conn.execute(CLOSE_TOTALS_SQL, params).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(new_cycles), closed
+
+
+_synced = set()
+_synced_lock = threading.Lock()
+
+
+def ensure_synced(conn, today=None):
+    """Run sync() unless nothing changed since it last ran for this database and day.
+
+    Called after every expense and card write. Errors are printed, not
+    raised: the write has already committed, and the next one tries again.
+    """
+    today = today or date.today().isoformat()
+    try:
+        versions = conn.execute('''SELECT name, version FROM table_versions
+                                   WHERE name IN ('credit_cards', 'expenses')''').fetchall()
+        key = (get_pool().database, today, tuple(sorted(versions)))
+        if key in _synced:
+            return
+        sync(conn, today)
+    except Exception as e:
+        print(f"Error syncing billing cycles: {e}")
+        return
+    with _synced_lock:
+        _synced.clear()
+        _synced.add(key)
+
+
+CURRENT_CYCLE_SQL = '''
+SELECT cycle_start, cycle_end FROM billing_cycles
+WHERE card_id = ? AND cycle_start <= ?
+ORDER BY cycle_start DESC LIMIT 1
+'''
+
+# Ended cycles, newest first; one not yet closed by a write shows its live total
+STATEMENTS_SQL = '''
+SELECT b.cycle_start, b.cycle_end,
+       COALESCE(b.total, (SELECT COALESCE(SUM(d.amount), 0) FROM daily_totals d
+                          WHERE d.card_id = b.card_id AND d.date >= b.cycle_start AND d.date <= b.cycle_end)),
+       b.closed_at
+FROM billing_cycles b
+WHERE b.card_id = ? AND (b.closed_at IS NOT NULL OR b.cycle_end < ?)
+ORDER BY b.cycle_start DESC
+'''
+
+
+def current_cycle(conn, card_id, today):
+    """Return (cycle_start, cycle_end) of the cycle containing today, or None for an unknown card."""
+    row = conn.execute(CURRENT_CYCLE_SQL, (card_id, today)).fetchone()
+    if row and row[1] >= today:
+        return row[0], row[1]
+    # The calendar stops before today: nothing was written since the cycle rolled over
+    card = conn.execute('SELECT billing_day FROM credit_cards WHERE id = ?', (card_id,)).fetchone()
+    if not card:
+        return None
+    start, end = cycle_for(card[0], date.fromisoformat(today))
+    # As in sync(): after a billing-day change, start after the last cycle
+    if row and start.isoformat() <= row[1]:
+        start = date.fromisoformat(row[1]) + timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+
+def statements(conn, card_id, today):
+    """Ended cycles for a card, newest first: (cycle_start, cycle_end, total, closed_at)."""
+    return conn.execute(STATEMENTS_SQL, (card_id, today)).fetchall()
+
+
+def statement(conn, card_id, cycle_start, today):
+    """Return ((cycle_start, cycle_end, total, closed_at), [(name, name_te, icon, amount)]) or None."""
+    row = conn.execute('''SELECT cycle_start, cycle_end, total, closed_at FROM billing_cycles
+                          WHERE card_id = ? AND cycle_start = ? AND (closed_at IS NOT NULL OR cycle_end < ?)''',
+                       (card_id, cycle_start, today)).fetchone()
+    if not row:
+        return None
+    if row[3] is None:
+        # Ended but not closed yet: from the rollup, as closing would freeze it
+        categories = conn.execute('''SELECT c.name, c.name_te, c.icon, SUM(d.amount)
+                                     FROM daily_totals d
+                                     JOIN categories c ON c.id = d.category_id
+                                     WHERE d.card_id = ? AND d.date >= ? AND d.date <= ?
+                                     GROUP BY d.category_id
+                                     ORDER BY SUM(d.amount) DESC''', (card_id, row[0], row[1])).fetchall()
+        return (row[0], row[1], sum(amount for *_, amount in categories), None), categories
+    categories = conn.execute('''SELECT c.name, c.name_te, c.icon, s.amount
+                                 FROM statement_categories s
+                                 JOIN categories c ON c.id = s.category_id
+                                 WHERE s.card_id = ? AND s.cycle_start = ?
+                                 ORDER BY s.amount DESC''', (card_id, cycle_start)).fetchall()
+    return row, categories
+
+
+def reclose(conn, today):
+    """Recompute every closed statement, e.g. for expenses written before migration 11."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM statement_categories')
+        conn.execute('UPDATE billing_cycles SET closed_at = NULL, total = NULL')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return sync(conn, today)
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'sync'
+    from migrations import migrate
+    today = date.today().isoformat()
+    with get_connection() as conn:
+        migrate(conn)
+        if command == 'sync':
+            added, closed = sync(conn, today)
+        elif command == 'reclose':
+            added, closed = reclose(conn, today)
+        else:
+            print("usage: python billing.py [sync|reclose]")
+            sys.exit(2)
+        print(f"{added} cycles added, {closed} statements closed")
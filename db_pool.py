@@ -0,0 +1,156 @@
+"""Shared SQLite connection pool used by app.py (Flask) and db.py (Streamlit).
+
+Connections are opened once, tuned with PRAGMAs and handed back to the pool
+after each request instead of being closed.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import slow_queries
+import tracing
+
+DATABASE = os.environ.get('FAMILYSPEND_DB', 'data.db')
+
+# Max number of idle connections kept open. Extra connections are still
+# handed out under load, they are just closed when returned.
+POOL_SIZE = int(os.environ.get('FAMILYSPEND_POOL_SIZE', '8'))
+
+# Prepared statements kept per connection. repository.py issues roughly a
+# hundred distinct statements (constants plus every expense filter / cursor /
+# limit combination); the sqlite3 default of 128 would start evicting them.
+CACHED_STATEMENTS = int(os.environ.get('FAMILYSPEND_STATEMENT_CACHE', '256'))
+
+# Applied to every new connection, in order.
+PRAGMAS = {
+    'journal_mode': 'WAL',          # readers don't block the writer
+    'synchronous': 'NORMAL',        # safe with WAL, one fsync per checkpoint
+    'busy_timeout': 5000,           # ms to wait on a locked database
+    'foreign_keys': 'ON',
+    'cache_size': -16000,           # negative = KiB, so ~16 MB page cache
+    'mmap_size': 64 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class ConnectionPool:
+    def __init__(self, database=DATABASE, size=POOL_SIZE, pragmas=None, factory=tracing.TracedConnection):
+        self.database = database
+        self.size = size
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        # sqlite3.Connection subclass to open; the default counts SQL per request (tracing.py)
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.in_use = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS, factory=self.factory)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            hit = True
+        except queue.Empty:
+            conn = None
+            hit = False
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.in_use += 1
+        return conn if conn is not None else self._connect()
+
+    def release(self, conn):
+        # Never hand a half-finished transaction to the next caller
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+        with self._lock:
+            self.in_use -= 1
+            keep = self._idle.qsize() < self.size
+            if not keep:
+                self.discarded += 1
+        if keep:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'database': self.database,
+                'size': self.size,
+                'idle': self._idle.qsize(),
+                'in_use': self.in_use,
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+_pool = ConnectionPool()
+
+# Statements over FAMILYSPEND_SLOW_QUERY_MS on any pooled connection are logged
+slow_queries.install()
+
+
+def configure(database=None, size=None, pragmas=None, factory=None):
+    """Replace the shared pool, e.g. to point at another database file."""
+    global _pool
+    old = _pool
+    _pool = ConnectionPool(
+        database=old.database if database is None else database,
+        size=old.size if size is None else size,
+        pragmas={**old.pragmas, **(pragmas or {})},
+        factory=old.factory if factory is None else factory,
+    )
+    old.close_all()
+    return _pool
+
+
+def get_pool():
+    return _pool
+
+
+def get_connection():
+    """Context manager yielding a pooled connection.
+
+    The caller commits; anything left uncommitted is rolled back on return.
+    """
+    return _pool.connection()
+
+
+def pool_stats():
+    return _pool.stats()
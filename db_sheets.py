@@ -1,17 +1,81 @@
 import streamlit as st
 from streamlit_gsheets import GSheetsConnection
 import pandas as pd
-from datetime import datetime, timedelta
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from pagination import clamp_limit, decode_cursor, encode_cursor
+from repository import period_start
+import fake_gsheets
+import sheets_journal
 
 # --- CONSTANTS ---
 # Using a single sheet with multiple worksheets
 # Worksheets: profiles, categories, credit_cards, expenses
 # We will use st.connection for caching and management
+EXPENSE_COLS = ['id', 'profile_id', 'category_id', 'amount', 'date', 'note', 'card_id', 'created_at']
+CARD_COLS = ['id', 'profile_id', 'card_name', 'card_last_four', 'credit_limit', 'billing_day', 'card_color', 'created_at']
+
+# --- DELETES ---
+# Deleting a row appends a tombstone (the same id again, with deleted_at set)
+# instead of rewriting the sheet; readers drop both. Once tombstones make up
+# more than COMPACT_AT of a sheet's rows, those rows are deleted from it
+# (rows only, never a rewrite, so rows other devices append meanwhile stay).
+COMPACT_AT = float(os.environ.get('FAMILYSPEND_SHEETS_COMPACT_AT', '0.2'))
+_live_frames = {}  # worksheet -> (fetched frame, frame without deleted rows)
+
+# Set to a directory to use local CSV files instead of Google Sheets (fake_gsheets.py)
+FAKE_SHEETS = os.environ.get('FAMILYSPEND_FAKE_SHEETS', '')
+
+# --- CACHE ---
+# Downloaded worksheets are kept in memory (shared by every session of this
+# Streamlit process) and reused for the TTL below, in seconds. Writes made
+# through this module update the cached copy, so the TTL only bounds how
+# long changes made from another device take to show up.
+REFERENCE_TTL = int(os.environ.get('FAMILYSPEND_SHEETS_REFERENCE_TTL', '3600'))
+SHEET_TTLS = {
+    'profiles': REFERENCE_TTL,
+    'categories': REFERENCE_TTL,
+    'credit_cards': int(os.environ.get('FAMILYSPEND_SHEETS_CARDS_TTL', '300')),
+    'expenses': int(os.environ.get('FAMILYSPEND_SHEETS_EXPENSES_TTL', '30')),
+}
+
+_cache = {}  # worksheet -> (DataFrame, fetched_at)
+_cache_lock = threading.Lock()
+_cache_counts = {'hits': 0, 'misses': 0, 'reads': 0, 'writes': 0, 'appends': 0, 'invalidations': 0}
+
+# Header row of each worksheet as last read or written, so appended rows
+# line up with the sheet's own column order; and the gspread Worksheet
+# handles used to append (opening one costs two API requests)
+_headers = {}
+_worksheets = {}
+
+# --- IDS ---
+# New rows get time-ordered ids: milliseconds since ID_EPOCH * 256 plus 8
+# random bits. Two devices would have to add a row in the same millisecond
+# and draw the same bits to collide, so no read is needed to pick one. They
+# are 13 digits today and stay within 14 until 2038: Sheets keeps only 15
+# significant digits of a number, so longer ids would be rounded. They are
+# still above the 1, 2, 3... ids of existing rows.
+ID_EPOCH_MS = 1767225600000  # 2026-01-01 UTC
+_last_id = 0
+_id_lock = threading.Lock()
+
+# --- JOURNAL ---
+# Adds and deletes of expenses and cards go through the local write-behind
+# journal (sheets_journal.py) and reach Sheets a moment later
+journal = sheets_journal.Journal()
 
 def get_conn():
+    if FAKE_SHEETS:
+        return fake_gsheets.connect(FAKE_SHEETS)
     return st.connection("gsheets", type=GSheetsConnection)
 
 def init_db():
+    # Sends anything left in the journal by a previous run
+    journal.start(_flush_entries)
     conn = get_conn()
     try:
         # We try to read a known worksheet to see if initialization is needed.
@@ -23,25 +87,73 @@ def init_db():
     except Exception:
         pass
 
+def _with_columns(df, expected_cols):
+    # Adds missing columns on a copy; cached frames are shared and never modified
+    missing = [col for col in expected_cols if col not in df.columns]
+    return df.assign(**{col: None for col in missing}) if missing else df
+
+def _is_not_found(e):
+    error_msg = str(e)
+    return "WorksheetNotFound" in error_msg or "worksheet" in error_msg.lower() and "not found" in error_msg.lower()
+
 def _read_df(worksheet, expected_cols):
+    # The sheet as the app should see it: deleted rows dropped, unflushed journal entries applied
+    return _with_pending(worksheet, _live(worksheet, _fetch_df(worksheet, expected_cols)), expected_cols)
+
+def _live(worksheet, df):
+    # Memoized per fetched frame, so it costs nothing between reads
+    cached = _live_frames.get(worksheet)
+    if cached is not None and cached[0] is df:
+        return cached[1]
+    live = _without_deleted(df)
+    _live_frames[worksheet] = (df, live)
+    return live
+
+def _without_deleted(df):
+    # Drops deleted rows, their tombstones and repeated ids: a batch whose
+    # append reached Sheets but whose response didn't is sent again by the
+    # journal, and the first copy of each row is the one kept
+    live = df
+    if 'deleted_at' in df.columns:
+        deleted = df['deleted_at'].notna()
+        if deleted.any():
+            live = live[~live['id'].isin(df.loc[deleted, 'id'])]
+        live = live.drop(columns='deleted_at')
+    repeated = live['id'].duplicated()
+    return live[~repeated] if repeated.any() else live
+
+def _fetch_df(worksheet, expected_cols, fresh=False):
+    # The sheet as Google has it. Callers may get the cached frame itself:
+    # filter or copy it, never modify it in place
+    with _cache_lock:
+        cached = None if fresh else _cache.get(worksheet)
+        if cached is not None and time.monotonic() - cached[1] < SHEET_TTLS.get(worksheet, 0):
+            _cache_counts['hits'] += 1
+            return _with_columns(cached[0], expected_cols)
+        _cache_counts['misses'] += 1
+    
     conn = get_conn()
     try:
-        df = conn.read(worksheet=worksheet, ttl=0) # ttl=0 for fresh data
+        df = conn.read(worksheet=worksheet, ttl=0) # ttl=0: caching is done here
+        header = list(df.columns)
         # Ensure correct columns exist
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = None 
-        return df
+        df = _with_columns(df, expected_cols)
     except Exception as e:
-        error_msg = str(e)
         # Only return empty if it's strictly a "Worksheet not found" or empty sheet issue
-        if "WorksheetNotFound" in error_msg or "worksheet" in error_msg.lower() and "not found" in error_msg.lower():
-            return pd.DataFrame(columns=expected_cols)
-        
-        # For other errors (API timeout, quota, auth), RAISE to prevent data loss!
-        # Resetting to empty on connection error causes complete data wipe on next write.
-        print(f"CRITICAL ERROR reading {worksheet}: {e}")
-        raise e
+        if _is_not_found(e):
+            df = pd.DataFrame(columns=expected_cols)
+            header = []
+        else:
+            # For other errors (API timeout, quota, auth), RAISE to prevent data loss!
+            # Resetting to empty on connection error causes complete data wipe on next write.
+            print(f"CRITICAL ERROR reading {worksheet}: {e}")
+            raise e
+    
+    with _cache_lock:
+        _cache_counts['reads'] += 1
+        _cache[worksheet] = (df, time.monotonic())
+        _headers[worksheet] = header
+    return df
 
 def _write_df(worksheet, df):
     conn = get_conn()
@@ -54,6 +166,175 @@ def _write_df(worksheet, df):
         except Exception as e:
             # Fallback for some library versions or permissions
             print(f"Error creating worksheet {worksheet}: {e}")
+            invalidate(worksheet)
+            return False
+    
+    # The sheet now holds exactly df, so it becomes the cached copy
+    with _cache_lock:
+        _cache_counts['writes'] += 1
+        _cache[worksheet] = (df, time.monotonic())
+        _headers[worksheet] = list(df.columns)
+    return True
+
+def new_id():
+    global _last_id
+    with _id_lock:
+        candidate = (time.time_ns() // 1_000_000 - ID_EPOCH_MS) * 256 + random.getrandbits(8)
+        # Strictly increasing within this process, even within one millisecond
+        _last_id = max(candidate, _last_id + 1)
+        return _last_id
+
+def _cell(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    return value.item() if hasattr(value, 'item') else value
+
+def _open_worksheet(worksheet):
+    ws = _worksheets.get(worksheet)
+    if ws is None:
+        ws = _worksheets[worksheet] = get_conn().client._select_worksheet(worksheet=worksheet)
+    return ws
+
+def _append_rows(worksheet, rows, expected_cols):
+    # Appends rows (dicts) below the last row of the sheet: one request and no
+    # download, however long the sheet is. Sheets applies appends one at a
+    # time, so concurrent adds can't overwrite each other.
+    header = _headers.get(worksheet)
+    try:
+        ws = _open_worksheet(worksheet)
+        if header is None:
+            header = ws.row_values(1)
+    except Exception as e:
+        if not _is_not_found(e):
+            raise
+        header = []
+    
+    # Empty or missing sheet, or one without all the columns yet: write it whole
+    if not header or any(col not in header for col in expected_cols):
+        df = _fetch_df(worksheet, expected_cols, fresh=True)
+        added = pd.DataFrame(rows, columns=expected_cols)
+        if not _write_df(worksheet, pd.concat([df, added], ignore_index=True) if len(df) else added):
+            raise RuntimeError(f"could not write {worksheet}")
+        return
+    
+    try:
+        # RAW: stored as given, so a note starting with '=' or '-' stays text
+        ws.append_rows([[_cell(row.get(col)) for col in header] for row in rows],
+                       value_input_option='RAW', insert_data_option='INSERT_ROWS', table_range='A1')
+    except Exception:
+        # The sheet may have changed shape (or been deleted); look it up afresh next time
+        _headers.pop(worksheet, None)
+        _worksheets.pop(worksheet, None)
+        invalidate(worksheet)
+        raise
+    
+    with _cache_lock:
+        _cache_counts['appends'] += 1
+        _headers[worksheet] = header
+        cached = _cache.get(worksheet)
+        if cached is not None:
+            df, fetched_at = cached
+            added = pd.DataFrame(rows, columns=expected_cols)
+            _cache[worksheet] = (pd.concat([df, added], ignore_index=True) if len(df) else added, fetched_at)
+
+def _with_pending(worksheet, df, expected_cols):
+    appends, deletes = sheets_journal.coalesce(journal.pending(worksheet))
+    if deletes:
+        df = df[~df['id'].isin(deletes)]
+    if appends:
+        # Rows already flushed are in df (and the cache) by now
+        added = pd.DataFrame(appends, columns=expected_cols)
+        added = added[~added['id'].isin(df['id'])]
+        if len(added):
+            df = pd.concat([df, added], ignore_index=True) if len(df) else added
+    return df
+
+def _flush_entries(worksheet, entries):
+    # Runs on the journal's flusher thread; raising keeps the entries for a retry
+    cols = (EXPENSE_COLS if worksheet == 'expenses' else CARD_COLS) + ['deleted_at']
+    appends, deletes = sheets_journal.coalesce(entries)
+    deleted_at = datetime.now().isoformat()
+    rows = appends + [{'id': row_id, 'deleted_at': deleted_at} for row_id in sorted(deletes)]
+    if rows:
+        # Adds and deletes alike: one append request
+        _append_rows(worksheet, rows, cols)
+    try:
+        compact(worksheet)
+    except Exception as e:
+        # The rows are in; compaction is tried again after the next flush
+        print(f"Error compacting {worksheet}: {e}")
+
+def _tombstones(df):
+    return int(df['deleted_at'].notna().sum()) if 'deleted_at' in df.columns else 0
+
+def compact(worksheet, threshold=COMPACT_AT):
+    # Deletes deleted rows, their tombstones and repeated ids from the sheet
+    # once tombstones are more than threshold of its rows. Returns True if it did.
+    cols = (EXPENSE_COLS if worksheet == 'expenses' else CARD_COLS) + ['deleted_at']
+    df = _fetch_df(worksheet, cols)
+    if not len(df) or _tombstones(df) / len(df) <= threshold:
+        return False
+    # Rows are deleted by position, so from a fresh copy
+    df = _fetch_df(worksheet, cols, fresh=True)
+    if not len(df) or _tombstones(df) / len(df) <= threshold:
+        return False
+    ws = _open_worksheet(worksheet)
+    header = ws.row_values(1)
+    
+    # Row i of df is sheet row i + 2. Rows appended since the read are below
+    # those and are left alone; if the rows read have moved (the sheet was
+    # edited or compacted elsewhere), nothing is deleted this time.
+    ids = ws.col_values(header.index('id') + 1, value_render_option='UNFORMATTED_VALUE')[1:len(df) + 1]
+    if len(ids) != len(df) or not (pd.to_numeric(pd.Series(ids), errors='coerce').values == df['id'].values).all():
+        print(f"Not compacting {worksheet}: it changed since it was read")
+        invalidate(worksheet)
+        return False
+    
+    keep = df.index.isin(_without_deleted(df).index)
+    runs = []  # [first, last] sheet rows of each block to delete
+    for row in (df.index[~keep] + 2).tolist():
+        if runs and runs[-1][1] == row - 1:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row])
+    # Bottom block first, so the rows above keep their numbers; one request
+    ws.spreadsheet.batch_update({'requests': [
+        {'deleteDimension': {'range': {'sheetId': ws.id, 'dimension': 'ROWS',
+                                       'startIndex': first - 1, 'endIndex': last}}}
+        for first, last in reversed(runs)]})
+    
+    with _cache_lock:
+        _cache_counts['writes'] += 1
+        _cache[worksheet] = (df[keep].reset_index(drop=True), _cache.get(worksheet, (None, time.monotonic()))[1])
+        _headers[worksheet] = header
+    return True
+
+def _record(worksheet, op, row_id, row=None):
+    journal.record(worksheet, op, row_id, row)
+    journal.start(_flush_entries)
+
+def invalidate(worksheet=None):
+    # Drop one cached worksheet (or all), so the next read downloads it
+    with _cache_lock:
+        _cache_counts['invalidations'] += 1
+        if worksheet is None:
+            _cache.clear()
+        else:
+            _cache.pop(worksheet, None)
+
+def cache_stats():
+    now = time.monotonic()
+    with _cache_lock:
+        total = _cache_counts['hits'] + _cache_counts['misses']
+        return {
+            **_cache_counts,
+            # Every hit is a Sheets API read request not spent
+            'quota_saved': _cache_counts['hits'],
+            'hit_rate': round(_cache_counts['hits'] / total, 4) if total else 0.0,
+            'worksheets': {name: {'rows': len(df), 'tombstones': _tombstones(df),
+                                  'age_seconds': round(now - fetched_at, 1), 'ttl': SHEET_TTLS.get(name, 0)}
+                           for name, (df, fetched_at) in _cache.items()},
+        }
 
 # --- PROFILES ---
 def get_profiles():
@@ -116,12 +397,8 @@ def get_credit_cards(profile_id=None):
     return df.to_dict('records')
 
 def add_credit_card(profile_id, card_name, credit_limit, billing_day, card_last_four='', card_color='#4A90E2'):
-    cols = ['id', 'profile_id', 'card_name', 'card_last_four', 'credit_limit', 'billing_day', 'card_color', 'created_at']
-    df = _read_df('credit_cards', cols)
-    
-    new_id = 1 if df.empty else df['id'].max() + 1
     new_card = {
-        'id': new_id,
+        'id': new_id(),
         'profile_id': profile_id,
         'card_name': card_name,
         'card_last_four': card_last_four,
@@ -131,81 +408,118 @@ def add_credit_card(profile_id, card_name, credit_limit, billing_day, card_last_
         'created_at': datetime.now().isoformat()
     }
     
-    df = pd.concat([df, pd.DataFrame([new_card])], ignore_index=True)
-    _write_df('credit_cards', df)
+    _record('credit_cards', 'append', new_card['id'], new_card)
     return True
 
 def delete_credit_card(card_id):
-    cols = ['id', 'profile_id', 'card_name', 'card_last_four', 'credit_limit', 'billing_day', 'card_color', 'created_at']
-    df = _read_df('credit_cards', cols)
-    
-    if df.empty:
-        return False
-        
-    df = df[df['id'] != card_id]
-    _write_df('credit_cards', df)
+    _record('credit_cards', 'delete', card_id)
     
     # Also unlink expenses? In sheets, maybe just leave them or set to null. 
     # For now, we leave expenses as is to avoid complex multi-sheet updates if not critical.
     return True
 
 # --- EXPENSES ---
-def get_expenses(profile_id=None, start_date=None, end_date=None):
-    cols = ['id', 'profile_id', 'category_id', 'amount', 'date', 'note', 'card_id', 'created_at']
-    df = _read_df('expenses', cols)
+# get_expenses and the dashboards work on one prepared frame: the expenses
+# sheet sorted by date, with profile, category and card names mapped in and
+# the dates parsed. It is rebuilt only when one of the sheets behind it is
+# re-read or changes, so most renders just filter it.
+EXPENSE_VIEW_COLS = ['id', 'profile_id', 'profile_name', 'category_id', 'category_name', 'category_name_te',
+                     'category_icon', 'amount', 'date', 'note', 'card_id', 'card_name', 'created_at']
+
+_lookups = {}  # worksheet -> (source frame, frame indexed by id)
+_prepared = {}  # 'sources' -> source frames, 'frame' -> (frame, parsed dates)
+
+def _lookup(worksheet, cols, getter=None):
+    df = _read_df(worksheet, cols)
+    if df.empty and getter is not None:
+        # Writes (and returns) the defaults
+        df = pd.DataFrame(getter())
+    cached = _lookups.get(worksheet)
+    if cached is None or cached[0] is not df:
+        cached = _lookups[worksheet] = (df, df.drop_duplicates('id', keep='last').set_index('id'))
+    return cached[1]
+
+def _expenses_frame():
+    expenses = _read_df('expenses', EXPENSE_COLS)
+    if expenses.empty:
+        return pd.DataFrame(columns=EXPENSE_VIEW_COLS), pd.Series(dtype='datetime64[ns]')
     
-    if df.empty:
-        return []
-        
-    # Apply Filters
-    if profile_id:
-        df = df[df['profile_id'] == profile_id]
+    cats = _lookup('categories', ['id', 'name', 'name_te', 'icon'], get_categories)
+    profs = _lookup('profiles', ['id', 'name', 'display_name'], get_profiles)
+    cards = _lookup('credit_cards', CARD_COLS)
+    sources = (expenses, cats, profs, cards)
+    cached = _prepared.get('sources')
+    if cached is not None and all(a is b for a, b in zip(cached, sources)):
+        return _prepared['frame']
     
+    df = expenses.sort_values(by='date', ascending=False, kind='stable')
+    card_names = df['card_id'].map(cards['card_name']).astype(object)
+    frame = pd.DataFrame({
+        'id': df['id'],
+        'profile_id': df['profile_id'],
+        'profile_name': df['profile_id'].map(profs['display_name']).fillna('Unknown'),
+        'category_id': df['category_id'],
+        'category_name': df['category_id'].map(cats['name']).fillna('Unknown'),
+        'category_name_te': df['category_id'].map(cats['name_te']).fillna(''),
+        'category_icon': df['category_id'].map(cats['icon']).fillna('📝'),
+        'amount': df['amount'],
+        'date': df['date'],
+        'note': df['note'],
+        'card_id': df['card_id'],
+        'card_name': card_names.where(card_names.notna(), None),
+        'created_at': df['created_at'],
+    })
+    _prepared['frame'] = (frame, pd.to_datetime(frame['date']))
+    _prepared['sources'] = sources
+    return _prepared['frame']
+
+def _filter_expenses(profile_id=None, start_date=None, end_date=None):
+    # May be the prepared frame itself: don't modify it
+    frame, dates = _expenses_frame()
+    if frame.empty or not (profile_id or start_date or end_date):
+        return frame
+    mask = pd.Series(True, index=frame.index)
+    if profile_id:
+        mask &= frame['profile_id'] == profile_id
     if start_date:
-        df = df[pd.to_datetime(df['date']) >= pd.to_datetime(start_date)]
-        
+        mask &= dates >= pd.to_datetime(start_date)
     if end_date:
-        df = df[pd.to_datetime(df['date']) <= pd.to_datetime(end_date)]
-        
-    # Join with Categories and Profiles for UI display
-    # In SQLite we did JOINs. Here we do pandas merge or lookups.
-    cats = {c['id']: c for c in get_categories()}
-    profs = {p['id']: p for p in get_profiles()}
-    cards = {c['id']: c for c in get_credit_cards()} # Helper to get all names
+        mask &= dates <= pd.to_datetime(end_date)
+    return frame[mask]
+
+def _records(df):
+    # df.to_dict('records'), several times faster on a large frame
+    cols = list(df.columns)
+    return [dict(zip(cols, row)) for row in zip(*(df[col].tolist() for col in cols))]
+
+def get_expenses(profile_id=None, start_date=None, end_date=None):
+    return _records(_filter_expenses(profile_id, start_date, end_date))
+
+def get_expenses_page(profile_id=None, start_date=None, end_date=None, limit=None, cursor=None):
+    # Same contract as db.get_expenses_page. The sheet is downloaded whole
+    # either way, but only one page is rendered.
+    limit = clamp_limit(limit)
     
-    res = []
-    # Sort by date desc
-    df = df.sort_values(by='date', ascending=False)
+    def sort_key(e):
+        return (str(e['date']), str(e['created_at']), int(e['id']))
     
-    for _, row in df.iterrows():
-        c = cats.get(row['category_id'], {})
-        p = profs.get(row['profile_id'], {})
-        cc = cards.get(row['card_id'], {}) if pd.notna(row['card_id']) else {}
-        
-        res.append({
-            'id': row['id'],
-            'profile_id': row['profile_id'],
-            'profile_name': p.get('display_name', 'Unknown'),
-            'category_id': row['category_id'],
-            'category_name': c.get('name', 'Unknown'),
-            'category_name_te': c.get('name_te', ''),
-            'category_icon': c.get('icon', '📝'),
-            'amount': row['amount'],
-            'date': row['date'],
-            'note': row['note'],
-            'card_id': row['card_id'],
-            'card_name': cc.get('card_name', None)
-        })
-        
-    return res
+    df = _filter_expenses(profile_id, start_date, end_date)
+    keys = pd.DataFrame({'date': df['date'].astype(str), 'created_at': df['created_at'].astype(str),
+                         'id': df['id'].astype('int64')}, index=df.index)
+    if cursor:
+        after_date, after_created, after_id = decode_cursor(cursor)
+        keys = keys[(keys['date'] < after_date)
+                    | ((keys['date'] == after_date) & ((keys['created_at'] < after_created)
+                       | ((keys['created_at'] == after_created) & (keys['id'] < after_id))))]
+    
+    order = keys.sort_values(['date', 'created_at', 'id'], ascending=False).index[:limit + 1]
+    page = _records(df.loc[order[:limit]])
+    next_cursor = encode_cursor(*sort_key(page[-1])) if len(order) > limit else None
+    return page, next_cursor
 
 def add_expense(profile_id, category_id, amount, date, note='', card_id=None):
-    cols = ['id', 'profile_id', 'category_id', 'amount', 'date', 'note', 'card_id', 'created_at']
-    df = _read_df('expenses', cols)
-    
-    new_id = 1 if df.empty else df['id'].max() + 1
     new_exp = {
-        'id': new_id,
+        'id': new_id(),
         'profile_id': profile_id,
         'category_id': category_id,
         'amount': amount,
@@ -215,36 +529,17 @@ def add_expense(profile_id, category_id, amount, date, note='', card_id=None):
         'created_at': datetime.now().isoformat()
     }
     
-    df = pd.concat([df, pd.DataFrame([new_exp])], ignore_index=True)
-    _write_df('expenses', df)
+    _record('expenses', 'append', new_exp['id'], new_exp)
     return True
 
 def delete_expense(expense_id):
-    cols = ['id', 'profile_id', 'category_id', 'amount', 'date', 'note', 'card_id', 'created_at']
-    df = _read_df('expenses', cols)
-    
-    if df.empty:
-        return False
-        
-    df = df[df['id'] != expense_id]
-    _write_df('expenses', df)
+    _record('expenses', 'delete', expense_id)
     return True
 
 # --- DASHBOARD STATS ---
 def get_dashboard_stats(profile_id, period='month'):
-    # Re-use get_expenses to get filtered list then aggregate
-    today = datetime.now()
-    if period == 'week':
-        start_date = (today - timedelta(days=7)).strftime('%Y-%m-%d')
-    elif period == 'month':
-        start_date = today.replace(day=1).strftime('%Y-%m-%d')
-    elif period == 'year':
-        start_date = today.replace(month=1, day=1).strftime('%Y-%m-%d')
-    else:
-        start_date = None
-        
-    exps = get_expenses(profile_id, start_date=start_date)
-    df = pd.DataFrame(exps)
+    start_date = period_start(period, datetime.now())
+    df = _filter_expenses(profile_id, start_date=start_date)
     
     if df.empty:
         return {'total_spent': 0, 'category_breakdown': [], 'weekly_trend': []}
@@ -252,17 +547,13 @@ def get_dashboard_stats(profile_id, period='month'):
     total_spent = df['amount'].sum()
     
     # Cat breakdown
-    cat_grp = df.groupby(['category_name', 'category_icon']).agg({'amount': 'sum'}).reset_index()
-    cat_breakdown = []
-    for _, row in cat_grp.sort_values('amount', ascending=False).iterrows():
-        cat_breakdown.append({
-            'name': row['category_name'],
-            'icon': row['category_icon'],
-            'total': row['amount']
-        })
+    cat_grp = df.groupby(['category_name', 'category_icon'])['amount'].sum().reset_index()
+    cat_breakdown = (cat_grp.sort_values('amount', ascending=False)
+                     .rename(columns={'category_name': 'name', 'category_icon': 'icon', 'amount': 'total'})
+                     .to_dict('records'))
         
     # Weekly Trend (Daily for the period)
-    trend_grp = df.groupby('date').agg({'amount': 'sum'}).reset_index().sort_values('date')
+    trend_grp = df.groupby('date')['amount'].sum().reset_index().sort_values('date')
     weekly_trend = trend_grp.to_dict('records')
     
     return {
@@ -272,16 +563,8 @@ def get_dashboard_stats(profile_id, period='month'):
     }
 
 def get_family_overview(period='month'):
-    today = datetime.now()
-    if period == 'week':
-        start_date = (today - timedelta(days=7)).strftime('%Y-%m-%d')
-    elif period == 'month':
-        start_date = today.replace(day=1).strftime('%Y-%m-%d')
-    else:
-        start_date = (today - timedelta(days=365)).strftime('%Y-%m-%d')
-        
-    exps = get_expenses(start_date=start_date)
-    df = pd.DataFrame(exps)
+    start_date = period_start(period, datetime.now())
+    df = _filter_expenses(start_date=start_date)
     
     if df.empty:
         return {'total_family': 0, 'profile_spending': [], 'top_categories': []}
@@ -289,16 +572,16 @@ def get_family_overview(period='month'):
     total_family = df['amount'].sum()
     
     # By Profile
-    prof_grp = df.groupby('profile_name').agg({'amount': 'sum'}).reset_index()
-    profile_spending = []
-    for _, row in prof_grp.sort_values('amount', ascending=False).iterrows():
-        profile_spending.append({'display_name': row['profile_name'], 'total': row['amount']})
+    prof_grp = df.groupby('profile_name')['amount'].sum().reset_index()
+    profile_spending = (prof_grp.sort_values('amount', ascending=False)
+                        .rename(columns={'profile_name': 'display_name', 'amount': 'total'})
+                        .to_dict('records'))
         
     # Top Categories
-    cat_grp = df.groupby('category_name').agg({'amount': 'sum'}).reset_index()
-    top_categories = []
-    for _, row in cat_grp.sort_values('amount', ascending=False).head(10).iterrows():
-        top_categories.append({'name': row['category_name'], 'total': row['amount']})
+    cat_grp = df.groupby('category_name')['amount'].sum().reset_index()
+    top_categories = (cat_grp.sort_values('amount', ascending=False).head(10)
+                      .rename(columns={'category_name': 'name', 'amount': 'total'})
+                      .to_dict('records'))
         
     return {
         'total_family': total_family,
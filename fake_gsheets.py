@@ -0,0 +1,143 @@
+"""Local stand-in for GSheetsConnection, for trying db_sheets without Google.
+
+Each worksheet is a CSV file in one directory. It covers what db_sheets uses:
+read / update / create / clear on the connection, row_values / col_values /
+append_rows on the gspread worksheets from client._select_worksheet(), and
+row deletes through their spreadsheet.batch_update(). Every
+call counts as one API request, and can be slowed down (latency, seconds)
+or made to fail (fail_next(n)) to see how the app copes with the network.
+
+    FAMILYSPEND_FAKE_SHEETS=/tmp/sheets streamlit run streamlit_app.py
+"""
+import csv
+import os
+import threading
+import time
+
+import pandas as pd
+
+LATENCY = float(os.environ.get('FAMILYSPEND_FAKE_SHEETS_LATENCY', '0'))
+
+
+class WorksheetNotFound(Exception):
+    pass
+
+
+class FakeSpreadsheet:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def batch_update(self, body):
+        # Only deleteDimension on rows; a worksheet's sheetId is its title here
+        self.connection._request()
+        with self.connection._lock:
+            for request in body['requests']:
+                target = request['deleteDimension']['range']
+                rows = self.connection._rows(target['sheetId'])
+                del rows[target['startIndex']:target['endIndex']]
+                with open(self.connection._path(target['sheetId']), 'w', newline='') as f:
+                    csv.writer(f).writerows(rows)
+
+
+class FakeWorksheet:
+    def __init__(self, connection, title):
+        self.connection = connection
+        self.title = title
+        self.id = title
+        self.spreadsheet = FakeSpreadsheet(connection)
+
+    def row_values(self, row):
+        self.connection._request()
+        with self.connection._lock:
+            rows = self.connection._rows(self.title)
+        return rows[row - 1] if len(rows) >= row else []
+
+    def col_values(self, col, value_render_option=None):
+        self.connection._request()
+        with self.connection._lock:
+            rows = self.connection._rows(self.title)
+        return [row[col - 1] if len(row) >= col else '' for row in rows]
+
+    def append_rows(self, values, value_input_option='RAW', insert_data_option=None, table_range=None):
+        self.connection._request()
+        with self.connection._lock:
+            with open(self.connection._path(self.title), 'a', newline='') as f:
+                csv.writer(f).writerows(values)
+
+
+class FakeClient:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def _select_worksheet(self, spreadsheet=None, worksheet=None, folder_id=None):
+        self.connection._request()
+        if not os.path.exists(self.connection._path(worksheet)):
+            raise WorksheetNotFound(f"Worksheet not found: {worksheet}")
+        return FakeWorksheet(self.connection, worksheet)
+
+
+class FakeGSheetsConnection:
+    def __init__(self, directory, latency=LATENCY):
+        self.directory = directory
+        self.latency = latency
+        self.requests = 0
+        self._failures = 0
+        self._lock = threading.Lock()
+        self.client = FakeClient(self)
+        os.makedirs(directory, exist_ok=True)
+
+    def fail_next(self, count=1):
+        """Make the next count requests raise, as a quota error would."""
+        self._failures = count
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+            failing = self._failures > 0
+            if failing:
+                self._failures -= 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            raise ConnectionError("APIError: [429]: Quota exceeded (fake)")
+
+    def _path(self, worksheet):
+        return os.path.join(self.directory, f'{worksheet}.csv')
+
+    def _rows(self, worksheet):
+        with open(self._path(worksheet), newline='') as f:
+            return [row for row in csv.reader(f)]
+
+    def read(self, worksheet=None, ttl=None, **options):
+        self._request()
+        path = self._path(worksheet)
+        with self._lock:
+            if not os.path.exists(path):
+                raise WorksheetNotFound(f"Worksheet not found: {worksheet}")
+            if os.path.getsize(path) == 0:
+                return pd.DataFrame()
+            return pd.read_csv(path)
+
+    def update(self, worksheet=None, data=None, **options):
+        self._request()
+        with self._lock:
+            data.to_csv(self._path(worksheet), index=False)
+        return data
+
+    def create(self, worksheet=None, data=None, **options):
+        return self.update(worksheet=worksheet, data=data)
+
+    def clear(self, worksheet=None, **options):
+        self._request()
+        with self._lock:
+            open(self._path(worksheet), 'w').close()
+
+
+_connections = {}
+
+
+def connect(directory):
+    """One shared connection per directory, like st.connection."""
+    if directory not in _connections:
+        _connections[directory] = FakeGSheetsConnection(directory)
+    return _connections[directory]
@@ -0,0 +1,140 @@
+"""Per-route request metrics in Prometheus text format.
+
+init_app() adds before/after-request hooks to the Flask app. Every request
+is counted by method, route and status. A sampled share of requests
+(FAMILYSPEND_METRICS_SAMPLE, default 1 = all, 0 = none) also records its
+latency in a histogram and the statements, rows and SQLite time counted by
+tracing.py, so the per-request cost can be kept down under heavy load.
+Streaming responses (CSV export) are timed up to the start of the body.
+"""
+import bisect
+import os
+import random
+import threading
+import time
+
+from flask import g, request
+
+import tracing
+
+SAMPLE_RATE = float(os.environ.get('FAMILYSPEND_METRICS_SAMPLE', '1'))
+
+# Latency histogram upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self.requests = {}      # (method, route, status) -> count
+        self.latency = {}       # (method, route) -> Histogram
+        self.sql = {}           # (method, route) -> [statements, rows, seconds]
+
+    def observe(self, method, route, status, seconds=None, trace=None):
+        with self._lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if seconds is None:
+                return
+            key = (method, route)
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(seconds)
+            if trace is not None:
+                totals = self.sql.setdefault(key, [0, 0, 0.0])
+                totals[0] += trace.statements
+                totals[1] += trace.rows
+                totals[2] += trace.seconds
+
+    def render(self):
+        with self._lock:
+            requests = sorted(self.requests.items())
+            latency = sorted((key, list(h.counts), h.sum, h.count) for key, h in self.latency.items())
+            sql = sorted((key, list(totals)) for key, totals in self.sql.items())
+
+        lines = ['# HELP familyspend_http_requests_total HTTP requests by route and status.',
+                 '# TYPE familyspend_http_requests_total counter']
+        for (method, route, status), count in requests:
+            lines.append(f'familyspend_http_requests_total{{{labels(method, route)},status="{status}"}} {count}')
+
+        lines += ['# HELP familyspend_http_request_duration_seconds Latency of sampled requests.',
+                  '# TYPE familyspend_http_request_duration_seconds histogram']
+        for (method, route), counts, total, count in latency:
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += bucket
+                lines.append(f'familyspend_http_request_duration_seconds_bucket'
+                             f'{{{labels(method, route)},le="{bound}"}} {cumulative}')
+            lines.append(f'familyspend_http_request_duration_seconds_sum{{{labels(method, route)}}} {total:.6f}')
+            lines.append(f'familyspend_http_request_duration_seconds_count{{{labels(method, route)}}} {count}')
+
+        for index, (name, help_text) in enumerate((
+                ('familyspend_sql_statements_total', 'SQL statements run by sampled requests.'),
+                ('familyspend_sql_rows_total', 'Rows fetched by sampled requests.'),
+                ('familyspend_sql_seconds_total', 'Time spent in SQLite by sampled requests.'))):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (method, route), totals in sql:
+                value = f'{totals[index]:.6f}' if index == 2 else totals[index]
+                lines.append(f'{name}{{{labels(method, route)}}} {value}')
+
+        lines += ['# HELP familyspend_metrics_sample_rate Share of requests timed and traced.',
+                  '# TYPE familyspend_metrics_sample_rate gauge',
+                  f'familyspend_metrics_sample_rate {self.sample_rate}']
+        return '\n'.join(lines) + '\n'
+
+
+def labels(method, route):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+def gauges(prefix, values, help_text):
+    """Render the numeric entries of a stats dict (pool_stats() etc.) as gauges."""
+    lines = []
+    for name, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines += [f'# HELP {prefix}_{name} {help_text}', f'# TYPE {prefix}_{name} gauge',
+                      f'{prefix}_{name} {value}']
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def init_app(app, registry):
+    def before():
+        if registry.sample_rate >= 1 or random.random() < registry.sample_rate:
+            g.metrics_started = time.perf_counter()
+            tracing.start()
+
+    def after(response):
+        # The rule, not the path, so /api/expenses/1 and /2 share one series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        started = g.pop('metrics_started', None)
+        if started is None:
+            registry.observe(request.method, route, response.status_code)
+        else:
+            registry.observe(request.method, route, response.status_code,
+                             time.perf_counter() - started, tracing.stop())
+        return response
+
+    def teardown(exc):
+        # Never leave a trace running on a pooled thread
+        tracing.stop()
+
+    app.before_request(before)
+    app.after_request(after)
+    app.teardown_request(teardown)
@@ -0,0 +1,261 @@
+"""Versioned schema migrations keyed on PRAGMA user_version.
+
+Each migration runs once, inside its own transaction, and bumps
+user_version. Once the database is current, migrate() is a single PRAGMA
+read and no DDL is executed.
+
+Run `python migrations.py` to migrate the configured database, or
+`python migrations.py --check-plans` to verify that the hot endpoint
+queries are served by the indexes below.
+"""
+import sys
+
+from db_pool import get_connection
+import billing
+import pagination
+import repository
+import rollup
+import slow_queries
+
+# Tables whose writes bump table_versions (see repository.table_versions)
+VERSIONED_TABLES = ('profiles', 'categories', 'credit_cards', 'expenses', 'budgets')
+
+# Budget periods the API accepted before it checked them, by what they meant
+_LEGACY_PERIODS = {
+    'weekly': ('week', 'weekly'),
+    'monthly': ('month', 'monthly'),
+    'yearly': ('year', 'yearly', 'annual', 'annually'),
+}
+_PERIOD = ('CASE lower(trim(period)) '
+           + ' '.join(f"WHEN '{alias}' THEN '{period}'"
+                      for period, aliases in _LEGACY_PERIODS.items() for alias in aliases)
+           + ' ELSE period END')
+
+MIGRATIONS = [
+    (1, 'base schema', [
+        '''CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            display_name TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            name_te TEXT NOT NULL,
+            icon TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS credit_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER NOT NULL,
+            card_name TEXT NOT NULL,
+            card_last_four TEXT,
+            credit_limit REAL NOT NULL,
+            billing_day INTEGER NOT NULL,
+            card_color TEXT DEFAULT '#4A90E2',
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (profile_id) REFERENCES profiles (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            note TEXT,
+            card_id INTEGER,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (profile_id) REFERENCES profiles (id),
+            FOREIGN KEY (category_id) REFERENCES categories (id),
+            FOREIGN KEY (card_id) REFERENCES credit_cards (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS budgets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER,
+            category_id INTEGER,
+            amount REAL NOT NULL,
+            period TEXT NOT NULL,
+            FOREIGN KEY (profile_id) REFERENCES profiles (id),
+            FOREIGN KEY (category_id) REFERENCES categories (id)
+        )''',
+    ]),
+    (2, 'covering indexes for dashboard, card and family queries', [
+        # Profile dashboard: profile_id = ? AND date >= ?, grouped by category
+        '''CREATE INDEX IF NOT EXISTS idx_expenses_profile_date
+           ON expenses (profile_id, date, category_id, amount)''',
+        # Card dashboard (card_id = ? AND date BETWEEN) and card unlinking
+        '''CREATE INDEX IF NOT EXISTS idx_expenses_card_date
+           ON expenses (card_id, date, category_id, amount)''',
+        # Family totals: date >= ? across all profiles
+        '''CREATE INDEX IF NOT EXISTS idx_expenses_date_category
+           ON expenses (date, category_id, amount)''',
+        # Category breakdowns driven from the categories table
+        '''CREATE INDEX IF NOT EXISTS idx_expenses_category_date
+           ON expenses (category_id, date, amount)''',
+    ]),
+    (3, 'daily_totals rollup with maintenance triggers',
+     rollup.SCHEMA + rollup.TRIGGERS + [rollup.BACKFILL_SQL]),
+    (4, 'history indexes matching the keyset pagination order', [
+        # ORDER BY date DESC, created_at DESC, id DESC straight off the index
+        # (the rowid is the implicit last index column)
+        '''CREATE INDEX IF NOT EXISTS idx_expenses_history
+           ON expenses (date, created_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_expenses_profile_history
+           ON expenses (profile_id, date, created_at)''',
+    ]),
+    (5, 'per-table change counters for conditional GETs',
+     ['''CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID''']
+     + [f"INSERT OR IGNORE INTO table_versions (name) VALUES ('{table}')"
+        for table in VERSIONED_TABLES]
+     + [f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+            END'''
+        for table in VERSIONED_TABLES for event in ('INSERT', 'UPDATE', 'DELETE')]),
+    (6, 'billing-cycle calendar and closed statements', billing.SCHEMA),
+    (7, 'one budget per profile, category and period', [
+        # The old SELECT-then-INSERT never matched NULL profile/category, so
+        # family-wide budgets piled up; keep the most recently set one.
+        '''DELETE FROM budgets WHERE id NOT IN (
+               SELECT MAX(id) FROM budgets
+               GROUP BY COALESCE(profile_id, 0), COALESCE(category_id, 0), period)''',
+        # NULLs never collide in a plain UNIQUE index, hence the COALESCEs
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_budgets_key
+           ON budgets (COALESCE(profile_id, 0), COALESCE(category_id, 0), period)''',
+    ]),
+    (8, 'slow-query log', slow_queries.SCHEMA),
+    (9, 'drop expense indexes replaced by the daily_totals rollup', [
+        # Dashboards, family totals and budgets read daily_totals since
+        # migration 3, so these only slowed down every expense write.
+        # idx_expenses_card_date still serves card transactions and unlinking.
+        'DROP INDEX IF EXISTS idx_expenses_profile_date',
+        'DROP INDEX IF EXISTS idx_expenses_date_category',
+        'DROP INDEX IF EXISTS idx_expenses_category_date',
+    ]),
+    (10, 'card history index matching the card transactions order', [
+        # A card's latest charges (date DESC, created_at DESC) straight off
+        # the index, without a sort; card_id = ? alone still serves unlinking
+        'DROP INDEX IF EXISTS idx_expenses_card_date',
+        '''CREATE INDEX IF NOT EXISTS idx_expenses_card_history
+           ON expenses (card_id, date, created_at)''',
+    ]),
+    (11, 'reopen a closed statement when a back-dated expense changes it',
+     billing.REOPEN_TRIGGERS),
+    (12, 'budget periods limited to weekly, monthly and yearly', [
+        # Spellings of a supported period become it; where that makes two
+        # budgets collide, keep the most recently set one (as in migration 7)
+        f'''DELETE FROM budgets WHERE id NOT IN (
+                SELECT MAX(id) FROM budgets
+                GROUP BY COALESCE(profile_id, 0), COALESCE(category_id, 0), {_PERIOD})''',
+        f'UPDATE budgets SET period = {_PERIOD} WHERE period != {_PERIOD}',
+        # Anything else was never evaluated and can't be set again
+        '''DELETE FROM budgets WHERE period NOT IN ('weekly', 'monthly', 'yearly')''',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations and return the resulting schema version."""
+    if get_version(conn) >= LATEST_VERSION:
+        return LATEST_VERSION
+
+    for version, name, statements in MIGRATIONS:
+        # BEGIN IMMEDIATE takes the write lock up front, so a second process
+        # starting at the same time waits here and then sees the new version.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied migration {version}: {name}")
+
+    conn.execute('PRAGMA optimize')
+    return get_version(conn)
+
+
+# Hot endpoint queries and the index each one must use, as the repository
+# builds them. (endpoint, expected index, sql, sample params)
+SAMPLE_CURSOR = pagination.encode_cursor('2026-01-31', '2026-01-31T10:00:00', 100)
+
+HOT_QUERIES = [
+    ('dashboard', 'USING PRIMARY KEY (profile_id=? AND date>?)',
+     repository.DASHBOARD_SQL,
+     {'profile_id': 1, 'start_date': '2026-01-01', 'today': '2026-01-31'}),
+    ('family by profile', 'USING PRIMARY KEY (profile_id=? AND date>?)',
+     repository.FAMILY_PROFILES_SQL,
+     {'start_date': '2026-01-01'}),
+    ('family top categories', 'idx_daily_totals_date',
+     repository.FAMILY_CATEGORIES_SQL,
+     {'start_date': '2026-01-01'}),
+    ('card cycle', 'idx_daily_totals_card_date',
+     repository.CARD_CYCLE_SQL,
+     {'card_id': 1, 'start_date': '2026-01-01', 'end_date': '2026-01-31'}),
+    ('card summary', 'idx_daily_totals_card_date',
+     repository.CARD_SUMMARY_SQL,
+     {'today': '2026-01-31', 'profile_id': None}),
+    ('budget status', 'idx_daily_totals_date',
+     repository.BUDGET_STATUS_SQL,
+     {'today': '2026-01-31'}),
+    ('current billing cycle', 'USING PRIMARY KEY (card_id=? AND cycle_start<?)',
+     billing.CURRENT_CYCLE_SQL,
+     (1, '2026-01-31')),
+    ('card statements', 'USING PRIMARY KEY (card_id=?)',
+     billing.STATEMENTS_SQL,
+     (1, '2026-01-31')),
+    ('card recent transactions', 'idx_expenses_card_history',
+     repository.CARD_TRANSACTIONS_SQL,
+     (1, 10)),
+    ('delete card unlink', 'idx_expenses_card_history',
+     repository.UNLINK_CARD_SQL,
+     (1,)),
+    ('expense history page', 'idx_expenses_profile_history',
+     *repository.expenses_page_query(1, cursor=SAMPLE_CURSOR)),
+    ('profile export', 'idx_expenses_profile_history',
+     *repository.export_query(1, '2026-01-01', '2026-01-31')),
+    ('family history page', 'idx_expenses_history',
+     *repository.expenses_page_query(cursor=SAMPLE_CURSOR)),
+]
+
+
+def check_query_plans(conn):
+    """Return (endpoint, expected index, plan text, ok) for every hot query."""
+    results = []
+    for endpoint, index, sql, params in HOT_QUERIES:
+        plan = '\n'.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+        # A SEARCH is an index range lookup; a SCAN of expenses reads every row
+        ok = any(line.startswith('SEARCH') and index in line for line in plan.splitlines())
+        # The expense indexes are ordered for their queries: a sort on top
+        # means the ORDER BY and the index have drifted apart
+        if index.startswith('idx_expenses_') and 'B-TREE FOR' in plan and 'ORDER BY' in plan:
+            ok = False
+        results.append((endpoint, index, plan, ok))
+    return results
+
+
+if __name__ == '__main__':
+    with get_connection() as conn:
+        print(f"Schema version: {migrate(conn)}")
+        if '--check-plans' in sys.argv:
+            failures = 0
+            for endpoint, index, plan, ok in check_query_plans(conn):
+                print(f"{'OK  ' if ok else 'FAIL'} {endpoint} (expects {index})")
+                if not ok:
+                    failures += 1
+                    print('     ' + plan.replace('\n', '\n     '))
+            sys.exit(1 if failures else 0)
@@ -0,0 +1,40 @@
+"""Keyset pagination helpers for expense history.
+
+History is ordered by (date DESC, created_at DESC, id DESC). A cursor is the
+sort key of the last row on a page, encoded as an opaque URL-safe token, so
+fetching the next page is an index seek rather than an OFFSET scan.
+"""
+import base64
+import json
+import os
+
+PAGE_SIZE = int(os.environ.get('FAMILYSPEND_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.environ.get('FAMILYSPEND_MAX_PAGE_SIZE', '500'))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_limit(limit):
+    """Parse a requested page size, falling back to PAGE_SIZE and capping at MAX_PAGE_SIZE."""
+    try:
+        limit = int(limit) if limit not in (None, '') else PAGE_SIZE
+    except (TypeError, ValueError):
+        limit = PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(date, created_at, expense_id):
+    raw = json.dumps([date, created_at, int(expense_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (date, created_at, id) or raise InvalidCursor."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date, created_at, expense_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(date), str(created_at), int(expense_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(f"Invalid cursor: {token!r}")
@@ -0,0 +1,653 @@
+"""SQL shared by the Flask API (app.py) and the SQLite Streamlit backend (db.py).
+
+Functions here take an open connection and return plain tuples; callers
+shape them into the JSON / dict layout they need by unpacking positionally.
+Every statement is a module constant or built from a small fixed set of
+filter combinations, so the connection's statement cache (see
+db_pool.CACHED_STATEMENTS) reuses prepared statements across requests.
+"""
+import datetime
+import math
+
+import pandas as pd
+
+import pagination
+import tracing
+
+SEED_PROFILES = [
+    ('dad', 'Dad'),
+    ('mom', 'Mom'),
+    ('chaithu', 'Chaithu'),
+    ('harshith', 'Harshith'),
+    ('common', 'Common')
+]
+
+# Categories with Telugu translations
+SEED_CATEGORIES = [
+    ('Rice', 'బియ్యం', '🍚'),
+    ('Dal', 'పప్పు', '🫘'),
+    ('Oil', 'నూనె', '🛢️'),
+    ('Vegetables', 'కూరగాయలు', '🥬'),
+    ('Fruits', 'పండ్లు', '🍎'),
+    ('Dairy', 'పాల ఉత్పత్తులు', '🥛'),
+    ('Snacks', 'స్నాక్స్', '🍿'),
+    ('Cleaning', 'శుభ్రపరచడం', '🧹'),
+    ('Toiletries', 'సౌందర్య వస్తువులు', '🧴'),
+    ('Electricity', 'విద్యుత్', '⚡'),
+    ('Water', 'నీరు', '💧'),
+    ('Gas', 'గ్యాస్', '🔥'),
+    ('Rent/EMI', 'అద్దె/EMI', '🏠'),
+    ('Fuel', 'ఇంధనం', '⛽'),
+    ('Auto', 'ఆటో', '🛺'),
+    ('Bus', 'బస్సు', '🚌'),
+    ('Medical', 'వైద్యం', '💊'),
+    ('Education', 'విద్య', '📚'),
+    ('Movies', 'సినిమాలు', '🎬'),
+    ('Dining Out', 'బయట భోజనం', '🍽️'),
+    ('Clothing', 'బట్టలు', '👕'),
+    ('Electronics', 'ఎలక్ట్రానిక్స్', '📱'),
+    ('Gifts', 'బహుమతులు', '🎁'),
+    ('Maintenance', 'నిర్వహణ', '🔧'),
+    ('Subscriptions', 'చందాలు', '📺'),
+    ('Office', 'కార్యాలయం', '💼'),
+    ('Travel', 'ప్రయాణం', '✈️'),
+    ('Pets', 'పెంపుడు జంతువులు', '🐕'),
+    ('Repairs', 'మరమ్మతులు', '🔨'),
+    ('Savings', 'పొదుపు', '💰'),
+    ('Miscellaneous', 'ఇతరములు', '📦'),
+    ('Personal Care', 'వ్యక్తిగత సంరక్షణ', '💅')
+]
+
+
+def seed(conn):
+    """Insert the default profiles and categories if the database has none."""
+    if conn.execute('SELECT COUNT(*) FROM profiles').fetchone()[0] > 0:
+        return False
+    conn.executemany('INSERT INTO profiles (name, display_name) VALUES (?, ?)', SEED_PROFILES)
+    conn.executemany('INSERT INTO categories (name, name_te, icon) VALUES (?, ?, ?)', SEED_CATEGORIES)
+    conn.commit()
+    return True
+
+
+def period_start(period, today):
+    """First day (YYYY-MM-DD) of a dashboard/overview period ending on `today`.
+
+    week is the last 7 days, month and year are calendar month / year to
+    date, and anything else falls back to the last 30 days. This is the only
+    definition; app.py, db.py and db_sheets.py all use it.
+    """
+    if period == 'week':
+        start = today - datetime.timedelta(days=7)
+    elif period == 'month':
+        start = today.replace(day=1)
+    elif period == 'year':
+        start = today.replace(month=1, day=1)
+    else:
+        start = today - datetime.timedelta(days=30)
+    return start.strftime('%Y-%m-%d')
+
+
+def profiles(conn):
+    """Return [(id, name, display_name)]."""
+    return conn.execute('SELECT id, name, display_name FROM profiles').fetchall()
+
+
+def categories(conn):
+    """Return [(id, name, name_te, icon)]."""
+    return conn.execute('SELECT id, name, name_te, icon FROM categories').fetchall()
+
+# All aggregates read the daily_totals rollup (see rollup.py), never raw
+# expenses.
+
+# One range scan over the rollup's (profile_id, date) key covers both the
+# period total and the 7-day trend window; the per-(category, day) partial
+# sums are then rolled up three ways. Rows come back tagged by kind:
+#   ('total', None, None, None, amount)
+#   ('category', name, name_te, icon, amount)
+#   ('day', 'YYYY-MM-DD', None, None, amount)    -- zero-filled, 7 rows
+DASHBOARD_SQL = '''
+WITH spent AS (
+    SELECT category_id, date, SUM(amount) AS amount
+    FROM daily_totals
+    WHERE profile_id = :profile_id
+      AND date >= MIN(:start_date, date(:today, '-6 days'))
+    GROUP BY category_id, date
+),
+days(day) AS (
+    SELECT date(:today, '-6 days')
+    UNION ALL
+    SELECT date(day, '+1 day') FROM days WHERE day < :today
+)
+SELECT 'total', NULL, NULL, NULL, COALESCE(SUM(amount), 0)
+FROM spent
+WHERE date >= :start_date
+UNION ALL
+SELECT 'category', c.name, c.name_te, c.icon, t.total
+FROM (SELECT category_id, SUM(amount) AS total
+      FROM spent
+      WHERE date >= :start_date
+      GROUP BY category_id) t
+JOIN categories c ON c.id = t.category_id
+WHERE t.total > 0
+UNION ALL
+SELECT 'day', d.day, NULL, NULL, COALESCE(SUM(s.amount), 0)
+FROM days d
+LEFT JOIN spent s ON s.date = d.day
+GROUP BY d.day
+'''
+
+
+def dashboard(conn, profile_id, start_date, today):
+    """Return (total, categories, trend) for one profile in a single statement.
+
+    categories is [(name, name_te, icon, amount)] sorted by amount desc and
+    trend is [(date, amount)] for the 7 days ending on `today`.
+    """
+    rows = conn.execute(DASHBOARD_SQL, {
+        'profile_id': profile_id,
+        'start_date': start_date,
+        'today': today,
+    }).fetchall()
+
+    total = 0
+    categories = []
+    trend = []
+    for kind, key, name_te, icon, amount in rows:
+        if kind == 'total':
+            total = amount
+        elif kind == 'category':
+            categories.append((key, name_te, icon, amount))
+        else:
+            trend.append((key, amount))
+
+    categories.sort(key=lambda row: row[3], reverse=True)
+    trend.sort()
+    return total, categories, trend
+
+
+# One (profile_id, date) range lookup per profile
+FAMILY_PROFILES_SQL = '''
+SELECT p.display_name,
+       (SELECT COALESCE(SUM(d.amount), 0)
+        FROM daily_totals d
+        WHERE d.profile_id = p.id AND d.date >= :start_date) AS total
+FROM profiles p
+ORDER BY total DESC
+'''
+
+FAMILY_CATEGORIES_SQL = '''
+SELECT c.name, c.name_te, t.total
+FROM (SELECT category_id, SUM(amount) AS total
+      FROM daily_totals
+      WHERE date >= :start_date
+      GROUP BY category_id) t
+JOIN categories c ON c.id = t.category_id
+WHERE t.total > 0
+ORDER BY t.total DESC
+LIMIT 10
+'''
+
+
+def family_overview(conn, start_date):
+    """Return (total, [(display_name, amount)], [(name, name_te, amount)])."""
+    params = {'start_date': start_date}
+    by_profile = conn.execute(FAMILY_PROFILES_SQL, params).fetchall()
+    top_categories = conn.execute(FAMILY_CATEGORIES_SQL, params).fetchall()
+    # Every expense belongs to exactly one profile, so the family total is
+    # the sum of the per-profile totals.
+    total = sum(amount for _, amount in by_profile)
+    return total, by_profile, top_categories
+
+
+# First row is the cycle total, followed by up to 5 categories
+CARD_CYCLE_SQL = '''
+WITH spent AS (
+    SELECT category_id, SUM(amount) AS amount
+    FROM daily_totals
+    WHERE card_id = :card_id AND date >= :start_date AND date <= :end_date
+    GROUP BY category_id
+)
+SELECT NULL, NULL, NULL, COALESCE(SUM(amount), 0) FROM spent
+UNION ALL
+SELECT * FROM (
+    SELECT c.name, c.name_te, c.icon, s.amount
+    FROM spent s
+    JOIN categories c ON c.id = s.category_id
+    WHERE s.amount > 0
+    ORDER BY s.amount DESC
+    LIMIT 5
+)
+'''
+
+
+def card_cycle(conn, card_id, start_date, end_date):
+    """Return (total, [(name, name_te, icon, amount)]) for one billing cycle."""
+    rows = conn.execute(CARD_CYCLE_SQL, {
+        'card_id': card_id,
+        'start_date': start_date,
+        'end_date': end_date,
+    }).fetchall()
+    return rows[0][3], rows[1:]
+
+
+def _expense_filters(profile_id, start_date, end_date):
+    where = '1=1'
+    params = []
+    if profile_id:
+        where += ' AND e.profile_id = ?'
+        params.append(profile_id)
+    if start_date:
+        where += ' AND e.date >= ?'
+        params.append(start_date)
+    if end_date:
+        where += ' AND e.date <= ?'
+        params.append(end_date)
+    return where, params
+
+
+EXPENSE_COLUMNS = '''e.id, e.profile_id, p.display_name, e.category_id, c.name, c.name_te, c.icon,
+       e.amount, e.date, e.note, e.card_id, cc.card_name, e.created_at'''
+
+
+def expenses_page_query(profile_id=None, start_date=None, end_date=None,
+                        limit=pagination.PAGE_SIZE, cursor=None):
+    """Return (sql, params) fetching one page of history plus one row.
+
+    Raises pagination.InvalidCursor.
+    """
+    where, params = _expense_filters(profile_id, start_date, end_date)
+    query = f'''SELECT {EXPENSE_COLUMNS}
+               FROM expenses e
+               JOIN profiles p ON e.profile_id = p.id
+               JOIN categories c ON e.category_id = c.id
+               LEFT JOIN credit_cards cc ON e.card_id = cc.id
+               WHERE {where}'''
+    if cursor:
+        after_date, after_created, after_id = pagination.decode_cursor(cursor)
+        # The plain date bound gives the planner a range to seek on; the row
+        # value comparison breaks ties within the same day.
+        query += ' AND e.date <= ? AND (e.date, e.created_at, e.id) < (?, ?, ?)'
+        params.extend([after_date, after_date, after_created, after_id])
+
+    query += ' ORDER BY e.date DESC, e.created_at DESC, e.id DESC LIMIT ?'
+    params.append(limit + 1)
+    return query, params
+
+
+def expenses_page(conn, profile_id=None, start_date=None, end_date=None,
+                  limit=pagination.PAGE_SIZE, cursor=None):
+    """Return (rows, next_cursor) for one page of expense history.
+
+    Rows are EXPENSE_COLUMNS tuples ordered by (date, created_at, id) DESC.
+    next_cursor is None on the last page. Raises pagination.InvalidCursor.
+    """
+    rows = conn.execute(*expenses_page_query(profile_id, start_date, end_date, limit, cursor)).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = pagination.encode_cursor(last[8], last[12], last[0])
+    return rows, next_cursor
+
+
+EXPORT_HEADER = ['Date', 'Profile', 'Category', 'Amount', 'Note', 'Card', 'Category (Telugu)']
+
+
+def export_query(profile_id=None, start_date=None, end_date=None):
+    """Return (sql, params) selecting EXPORT_HEADER rows, newest first."""
+    where, params = _expense_filters(profile_id, start_date, end_date)
+    return f'''SELECT e.date, p.display_name, c.name, e.amount, e.note,
+                      cc.card_name, c.name_te
+               FROM expenses e
+               JOIN profiles p ON e.profile_id = p.id
+               JOIN categories c ON e.category_id = c.id
+               LEFT JOIN credit_cards cc ON e.card_id = cc.id
+               WHERE {where}
+               ORDER BY e.date DESC, e.created_at DESC, e.id DESC''', params
+
+
+def export_rows(conn, profile_id=None, start_date=None, end_date=None, batch_size=1000):
+    """Yield lists of EXPORT_HEADER rows, batch_size at a time.
+
+    Ordered by the history index, so rows stream out without a sort step
+    and memory stays flat whatever the number of expenses.
+    """
+    cursor = conn.execute(*export_query(profile_id, start_date, end_date))
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def expenses(conn, profile_id=None, start_date=None, end_date=None, limit=None):
+    """Return EXPENSE_COLUMNS tuples, newest first, optionally capped at limit."""
+    where, params = _expense_filters(profile_id, start_date, end_date)
+    query = f'''SELECT {EXPENSE_COLUMNS}
+               FROM expenses e
+               JOIN profiles p ON e.profile_id = p.id
+               JOIN categories c ON e.category_id = c.id
+               LEFT JOIN credit_cards cc ON e.card_id = cc.id
+               WHERE {where}
+               ORDER BY e.date DESC, e.created_at DESC, e.id DESC'''
+    if limit:
+        query += ' LIMIT ?'
+        params.append(int(limit))
+    return conn.execute(query, params).fetchall()
+
+
+def add_expense(conn, profile_id, category_id, amount, date, note='', card_id=None):
+    """Insert one expense, commit and return its id."""
+    expense_id = conn.execute('''INSERT INTO expenses (profile_id, category_id, amount, date, note, card_id, created_at)
+                                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                              (profile_id, category_id, amount, date, note, card_id,
+                               datetime.datetime.now().isoformat())).lastrowid
+    conn.commit()
+    return expense_id
+
+
+def delete_expense(conn, expense_id):
+    conn.execute('DELETE FROM expenses WHERE id = ?', (expense_id,))
+    conn.commit()
+
+
+def table_versions(conn):
+    """Return {table: change counter}; triggers bump a counter on every write."""
+    return dict(conn.execute('SELECT name, version FROM table_versions').fetchall())
+
+
+EXPENSE_FIELDS = ('profile_id', 'category_id', 'amount', 'date', 'note', 'card_id')
+
+
+# Rechecked on every call; the id sets are reread only when one of them changed
+REFERENCE_VERSIONS_SQL = '''SELECT name, version FROM table_versions
+                            WHERE name IN ('profiles', 'categories', 'credit_cards') ORDER BY name'''
+
+_reference_ids = {}  # database file -> (table_versions counters, id sets)
+
+
+def reference_ids(conn):
+    """Return the sets of valid (profile, category, card) ids.
+
+    Kept per database until a write to one of the three tables bumps its
+    table_versions counter, so a call is usually one small SELECT.
+    """
+    versions = tuple(conn.execute(REFERENCE_VERSIONS_SQL).fetchall())
+    path = tracing.database_path(conn)
+    cached = _reference_ids.get(path)
+    if cached is not None and cached[0] == versions:
+        return cached[1]
+    ids = tuple(
+        {row[0] for row in conn.execute(f'SELECT id FROM {table}')}
+        for table in ('profiles', 'categories', 'credit_cards')
+    )
+    if path:
+        _reference_ids[path] = (versions, ids)
+    return ids
+
+
+def unknown_reference(conn, profile_id, category_id, card_id=None):
+    """Return an error naming the first id with no profile, category or card, or None."""
+    _, errors = prepare_expenses([{'profile_id': profile_id, 'category_id': category_id, 'card_id': card_id,
+                                   'amount': 0, 'date': '2000-01-01'}], *reference_ids(conn), None)
+    return errors[0]['error'] if errors else None
+
+
+def _ids(values):
+    # (ids as floats, NaN where blank; mask of values that aren't integers)
+    blank = values.isna() | (values == '')
+    numbers = pd.to_numeric(values.where(~blank), errors='coerce')
+    return numbers, ~blank & (numbers.isna() | (numbers % 1 != 0))
+
+
+def _id_text(number):
+    return None if number != number else int(number)
+
+
+def prepare_expenses(records, profile_ids, category_ids, card_ids, created_at):
+    """Validate dict-like records for a bulk insert, a column at a time.
+
+    Returns (rows, errors): rows are INSERT parameter tuples, errors are
+    {'row': index, 'error': message} for every record that was rejected.
+    """
+    if not records:
+        return [], []
+    is_object = pd.Series([isinstance(record, dict) for record in records])
+    df = pd.DataFrame.from_records([record if isinstance(record, dict) else {} for record in records],
+                                   columns=EXPENSE_FIELDS).astype(object)
+    profile, bad_profile = _ids(df['profile_id'])
+    category, bad_category = _ids(df['category_id'])
+    card, bad_card = _ids(df['card_id'])
+    amount = pd.to_numeric(df['amount'], errors='coerce')
+    dates = df['date'].fillna('').astype(str)
+    # The format alone would also take 2026-1-5; the index and the rollup
+    # rely on plain YYYY-MM-DD
+    bad_date = (dates.str.len() != 10) | pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce').isna()
+    
+    # Only the first failing check of a row is reported
+    checks = [
+        (~is_object, lambda rows: 'Expected an object'),
+        (bad_profile, lambda rows: 'expected an integer id, got ' + df['profile_id'][rows].map(repr)),
+        (bad_category, lambda rows: 'expected an integer id, got ' + df['category_id'][rows].map(repr)),
+        (bad_card, lambda rows: 'expected an integer id, got ' + df['card_id'][rows].map(repr)),
+        (amount.isna() | amount.isin([math.inf, -math.inf]),
+         lambda rows: 'amount must be a finite number, got ' + df['amount'][rows].map(repr)),
+        (bad_date, lambda rows: 'date must be YYYY-MM-DD, got ' + dates[rows].map(repr)),
+        (~profile.isin(profile_ids), lambda rows: 'Unknown profile_id ' + profile[rows].map(_id_text).astype(str)),
+        (~category.isin(category_ids), lambda rows: 'Unknown category_id ' + category[rows].map(_id_text).astype(str)),
+        (card.notna() & ~card.isin(card_ids), lambda rows: 'Unknown card_id ' + card[rows].map(_id_text).astype(str)),
+    ]
+    messages = pd.Series(None, index=df.index, dtype=object)
+    for failed, message in checks:
+        rows = failed & messages.isna()
+        if rows.any():
+            messages[rows] = message(rows)
+    rejected = messages.notna()
+    errors = [{'row': i, 'error': error} for i, error in zip(df.index[rejected].tolist(), messages[rejected].tolist())]
+    
+    ok = ~rejected
+    notes = df['note'][ok]
+    rows = list(zip(profile[ok].astype('int64').tolist(), category[ok].astype('int64').tolist(),
+                    amount[ok].astype(float).tolist(), dates[ok].tolist(),
+                    notes.where(notes.notna() & notes.astype(bool), '').tolist(),
+                    [_id_text(number) for number in card[ok].tolist()],
+                    [created_at] * int(ok.sum())))
+    return rows, errors
+
+
+def insert_expenses(conn, rows):
+    """Insert prepared rows with executemany in a single transaction."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('''INSERT INTO expenses (profile_id, category_id, amount, date, note, card_id, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''', rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def add_expenses_bulk(conn, records, partial=False):
+    """Validate and insert many expenses at once.
+
+    With partial=False nothing is written if any record is invalid.
+    Returns {'inserted': n, 'errors': [...]}.
+    """
+    profile_ids, category_ids, card_ids = reference_ids(conn)
+    rows, errors = prepare_expenses(records, profile_ids, category_ids, card_ids,
+                                    datetime.datetime.now().isoformat())
+    inserted = 0
+    if rows and (partial or not errors):
+        inserted = insert_expenses(conn, rows)
+    return {'inserted': inserted, 'errors': errors}
+
+
+# Current billing cycle (from the billing_cycles calendar) and spend for
+# every card in one statement
+CARD_SUMMARY_SQL = '''
+SELECT cc.id, cc.profile_id, p.display_name, cc.card_name, cc.card_last_four,
+       cc.credit_limit, cc.billing_day, cc.card_color, cc.created_at,
+       b.cycle_start, b.cycle_end,
+       COALESCE((SELECT SUM(d.amount) FROM daily_totals d
+                 WHERE d.card_id = cc.id AND d.date >= b.cycle_start AND d.date <= b.cycle_end), 0)
+FROM credit_cards cc
+JOIN profiles p ON cc.profile_id = p.id
+LEFT JOIN billing_cycles b
+  ON b.card_id = cc.id AND b.cycle_start <= :today AND b.cycle_end >= :today
+WHERE :profile_id IS NULL OR cc.profile_id = :profile_id
+ORDER BY cc.created_at DESC
+'''
+
+
+def card_summary(conn, today, profile_id=None):
+    """Return one CARD_SUMMARY_SQL row per card, optionally for one profile.
+
+    Cycle boundaries come from billing_cycles; a card whose calendar doesn't
+    reach today yet has None there (see billing.current_cycle()).
+    """
+    return conn.execute(CARD_SUMMARY_SQL, {
+        'today': today,
+        'profile_id': profile_id,
+    }).fetchall()
+
+
+CARD_COLUMNS = '''cc.id, cc.profile_id, p.display_name, cc.card_name, cc.card_last_four,
+       cc.credit_limit, cc.billing_day, cc.card_color, cc.created_at'''
+
+
+def credit_cards(conn, profile_id=None):
+    """Return CARD_COLUMNS tuples, newest card first."""
+    if profile_id:
+        return conn.execute(f'''SELECT {CARD_COLUMNS}
+                               FROM credit_cards cc
+                               JOIN profiles p ON cc.profile_id = p.id
+                               WHERE cc.profile_id = ?
+                               ORDER BY cc.created_at DESC''', (profile_id,)).fetchall()
+    return conn.execute(f'''SELECT {CARD_COLUMNS}
+                           FROM credit_cards cc
+                           JOIN profiles p ON cc.profile_id = p.id
+                           ORDER BY cc.created_at DESC''').fetchall()
+
+
+def credit_card(conn, card_id):
+    """Return (card_name, card_last_four, credit_limit, billing_day, card_color) or None."""
+    return conn.execute('''SELECT card_name, card_last_four, credit_limit, billing_day, card_color
+                           FROM credit_cards WHERE id = ?''', (card_id,)).fetchone()
+
+
+def add_credit_card(conn, profile_id, card_name, credit_limit, billing_day,
+                    card_last_four='', card_color='#4A90E2'):
+    """Insert a card, commit and return its id."""
+    card_id = conn.execute('''INSERT INTO credit_cards (profile_id, card_name, card_last_four, credit_limit,
+                                                         billing_day, card_color, created_at)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                           (profile_id, card_name, card_last_four, credit_limit, billing_day,
+                            card_color, datetime.datetime.now().isoformat())).lastrowid
+    conn.commit()
+    return card_id
+
+
+def update_credit_card(conn, card_id, card_name, credit_limit, billing_day,
+                       card_last_four='', card_color='#4A90E2'):
+    conn.execute('''UPDATE credit_cards
+                    SET card_name = ?, card_last_four = ?, credit_limit = ?,
+                        billing_day = ?, card_color = ?
+                    WHERE id = ?''',
+                 (card_name, card_last_four, credit_limit, billing_day, card_color, card_id))
+    conn.commit()
+
+
+UNLINK_CARD_SQL = 'UPDATE expenses SET card_id = NULL WHERE card_id = ?'
+
+
+def delete_credit_card(conn, card_id):
+    """Unlink the card's expenses (card_id -> NULL) and delete it in one transaction."""
+    conn.execute(UNLINK_CARD_SQL, (card_id,))
+    conn.execute('DELETE FROM credit_cards WHERE id = ?', (card_id,))
+    conn.commit()
+
+
+CARD_TRANSACTIONS_SQL = '''
+SELECT e.id, e.amount, e.date, e.note, c.name, c.icon
+FROM expenses e
+JOIN categories c ON e.category_id = c.id
+WHERE e.card_id = ?
+ORDER BY e.date DESC, e.created_at DESC
+LIMIT ?
+'''
+
+
+def card_transactions(conn, card_id, limit=10):
+    """Return the latest [(id, amount, date, note, category name, icon)] charged to a card."""
+    return conn.execute(CARD_TRANSACTIONS_SQL, (card_id, limit)).fetchall()
+
+
+BUDGET_PERIODS = ('weekly', 'monthly', 'yearly')
+
+# Every budget against actual spend in one statement. The rollup is read once
+# from the earliest window start (weeks begin on Monday and may reach into
+# last year), split into per-period sums by profile and category, and each
+# budget then adds up the matching rows; a NULL profile or category matches
+# all of them.
+BUDGET_STATUS_SQL = '''
+WITH windows (period, start_date, end_date) AS (
+    VALUES ('weekly', date(:today, '-6 days', 'weekday 1'),
+                      date(:today, '-6 days', 'weekday 1', '+6 days')),
+           ('monthly', date(:today, 'start of month'),
+                       date(:today, 'start of month', '+1 month', '-1 day')),
+           ('yearly', date(:today, 'start of year'),
+                      date(:today, 'start of year', '+1 year', '-1 day'))
+),
+spend AS (
+    SELECT d.profile_id, d.category_id,
+           SUM(CASE WHEN d.date >= (SELECT start_date FROM windows WHERE period = 'weekly')
+                    THEN d.amount ELSE 0 END) AS weekly,
+           SUM(CASE WHEN d.date >= (SELECT start_date FROM windows WHERE period = 'monthly')
+                    THEN d.amount ELSE 0 END) AS monthly,
+           SUM(CASE WHEN d.date >= (SELECT start_date FROM windows WHERE period = 'yearly')
+                    THEN d.amount ELSE 0 END) AS yearly
+    FROM daily_totals d
+    WHERE d.date >= (SELECT MIN(start_date) FROM windows) AND d.date <= :today
+    GROUP BY d.profile_id, d.category_id
+)
+SELECT b.id, b.profile_id, p.display_name, b.category_id, c.name, c.name_te, c.icon,
+       b.amount, b.period, w.start_date, w.end_date,
+       COALESCE(SUM(CASE b.period WHEN 'weekly' THEN s.weekly
+                                  WHEN 'monthly' THEN s.monthly
+                                  ELSE s.yearly END), 0) AS spent,
+       CAST(julianday(:today) - julianday(w.start_date) + 1 AS INTEGER) AS days_elapsed,
+       CAST(julianday(w.end_date) - julianday(w.start_date) + 1 AS INTEGER) AS period_days
+FROM budgets b
+JOIN windows w ON w.period = b.period
+LEFT JOIN profiles p ON p.id = b.profile_id
+LEFT JOIN categories c ON c.id = b.category_id
+LEFT JOIN spend s
+  ON (b.profile_id IS NULL OR s.profile_id = b.profile_id)
+ AND (b.category_id IS NULL OR s.category_id = b.category_id)
+GROUP BY b.id
+ORDER BY b.period, b.profile_id, b.category_id
+'''
+
+
+def budget_status(conn, today):
+    """Return one BUDGET_STATUS_SQL row per budget (all weekly, monthly or yearly since migration 12)."""
+    return conn.execute(BUDGET_STATUS_SQL, {'today': today}).fetchall()
+
+
+def budgets(conn):
+    """Return [(id, profile_id, display_name, category_id, category name, amount, period)]."""
+    return conn.execute('''SELECT b.id, b.profile_id, p.display_name, b.category_id, c.name, b.amount, b.period
+                           FROM budgets b
+                           LEFT JOIN profiles p ON b.profile_id = p.id
+                           LEFT JOIN categories c ON b.category_id = c.id''').fetchall()
+
+
+def set_budget(conn, profile_id, category_id, amount, period):
+    """Insert or update the budget for (profile, category, period) and commit."""
+    conn.execute('''INSERT INTO budgets (profile_id, category_id, amount, period)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (COALESCE(profile_id, 0), COALESCE(category_id, 0), period)
+                    DO UPDATE SET amount = excluded.amount''',
+                 (profile_id, category_id, amount, period))
+    conn.commit()
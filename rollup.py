@@ -0,0 +1,140 @@
+"""Daily rollup of expenses used by every aggregate endpoint.
+
+daily_totals holds SUM(amount) and COUNT(*) per (profile, date, category,
+card). Triggers on expenses keep it exact on insert, update and delete, so
+dashboards, family overview and card cycles read a few hundred rollup rows
+instead of every expense in the period. card_id 0 means "no card" (cash/UPI)
+because a NULL can't take part in the primary key.
+
+    python rollup.py check      # compare rollup against raw expenses
+    python rollup.py rebuild    # recompute rollup from scratch
+"""
+import sys
+
+from db_pool import get_connection
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS daily_totals (
+        profile_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        category_id INTEGER NOT NULL,
+        card_id INTEGER NOT NULL DEFAULT 0,
+        amount REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (profile_id, date, category_id, card_id)
+    ) WITHOUT ROWID''',
+    '''CREATE INDEX IF NOT EXISTS idx_daily_totals_date
+       ON daily_totals (date, amount)''',
+    '''CREATE INDEX IF NOT EXISTS idx_daily_totals_card_date
+       ON daily_totals (card_id, date, amount)''',
+]
+
+# Add NEW to the rollup / remove OLD from it. Rows that drop to zero
+# expenses are deleted so the table never accumulates float residue.
+_ADD = '''
+    INSERT INTO daily_totals (profile_id, date, category_id, card_id, amount, count)
+    VALUES (NEW.profile_id, NEW.date, NEW.category_id, COALESCE(NEW.card_id, 0), NEW.amount, 1)
+    ON CONFLICT (profile_id, date, category_id, card_id)
+    DO UPDATE SET amount = amount + excluded.amount, count = count + 1;
+'''
+_REMOVE = '''
+    UPDATE daily_totals SET amount = amount - OLD.amount, count = count - 1
+    WHERE profile_id = OLD.profile_id AND date = OLD.date
+      AND category_id = OLD.category_id AND card_id = COALESCE(OLD.card_id, 0);
+    DELETE FROM daily_totals
+    WHERE profile_id = OLD.profile_id AND date = OLD.date
+      AND category_id = OLD.category_id AND card_id = COALESCE(OLD.card_id, 0)
+      AND count <= 0;
+'''
+
+TRIGGERS = [
+    f'''CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_insert
+        AFTER INSERT ON expenses
+        BEGIN {_ADD} END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_delete
+        AFTER DELETE ON expenses
+        BEGIN {_REMOVE} END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_update
+        AFTER UPDATE OF profile_id, date, category_id, card_id, amount ON expenses
+        BEGIN {_REMOVE} {_ADD} END''',
+]
+
+BACKFILL_SQL = '''
+    INSERT INTO daily_totals (profile_id, date, category_id, card_id, amount, count)
+    SELECT profile_id, date, category_id, COALESCE(card_id, 0), SUM(amount), COUNT(*)
+    FROM expenses
+    GROUP BY profile_id, date, category_id, COALESCE(card_id, 0)
+'''
+
+# Every key where the rollup and raw expenses disagree, from either side
+CHECK_SQL = '''
+WITH raw AS (
+    SELECT profile_id, date, category_id, COALESCE(card_id, 0) AS card_id,
+           SUM(amount) AS amount, COUNT(*) AS count
+    FROM expenses
+    GROUP BY profile_id, date, category_id, COALESCE(card_id, 0)
+)
+SELECT r.profile_id, r.date, r.category_id, r.card_id,
+       r.amount, r.count, d.amount, d.count
+FROM raw r
+LEFT JOIN daily_totals d
+  ON d.profile_id = r.profile_id AND d.date = r.date
+ AND d.category_id = r.category_id AND d.card_id = r.card_id
+WHERE d.count IS NULL OR d.count != r.count OR ABS(d.amount - r.amount) > :tolerance
+UNION ALL
+SELECT d.profile_id, d.date, d.category_id, d.card_id,
+       NULL, NULL, d.amount, d.count
+FROM daily_totals d
+WHERE NOT EXISTS (
+    SELECT 1 FROM expenses e
+    WHERE e.profile_id = d.profile_id AND e.date = d.date
+      AND e.category_id = d.category_id AND COALESCE(e.card_id, 0) = d.card_id
+)
+'''
+
+
+def rebuild(conn):
+    """Recompute daily_totals from expenses in one transaction."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM daily_totals')
+        conn.execute(BACKFILL_SQL)
+        count = conn.execute('SELECT COUNT(*) FROM daily_totals').fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def check(conn, tolerance=0.005):
+    """Return a dict per mismatched key; an empty list means the rollup is exact."""
+    rows = conn.execute(CHECK_SQL, {'tolerance': tolerance}).fetchall()
+    return [{
+        'profile_id': row[0],
+        'date': row[1],
+        'category_id': row[2],
+        'card_id': row[3],
+        'expected_amount': row[4],
+        'expected_count': row[5],
+        'rollup_amount': row[6],
+        'rollup_count': row[7],
+    } for row in rows]
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    from migrations import migrate
+    with get_connection() as conn:
+        migrate(conn)
+        if command == 'rebuild':
+            print(f"Rebuilt daily_totals: {rebuild(conn)} rows")
+        elif command == 'check':
+            mismatches = check(conn)
+            for m in mismatches:
+                print(m)
+            print(f"{len(mismatches)} mismatched rollup rows")
+            sys.exit(1 if mismatches else 0)
+        else:
+            print("usage: python rollup.py [check|rebuild]")
+            sys.exit(2)
@@ -10,6 +10,8 @@ const state = {
     profiles: [],
     categories: [],
     expenses: [],
+    expenseFilters: {},
+    expensesCursor: null,
     creditCards: [],
     currentCard: null,
     charts: {}
@@ -60,6 +62,7 @@ const translations = {
         expense_deleted: 'Expense deleted',
         error_occurred: 'An error occurred',
         no_expenses: 'No expenses found',
+        load_more: 'Load more',
         loading: 'Loading...',
         credit_cards: 'Credit Cards',
         cards: 'Cards',
@@ -125,6 +128,7 @@ const translations = {
         expense_deleted: 'ఖర్చు తొలగించబడింది',
         error_occurred: 'లోపం సంభవించింది',
         no_expenses: 'ఖర్చులు కనుగొనబడలేదు',
+        load_more: 'మరిన్ని చూపించు',
         loading: 'లోడ్ అవుతోంది...',
         credit_cards: 'క్రెడిట్ కార్డులు',
         cards: 'కార్డులు',
@@ -208,8 +212,21 @@ async function loadDashboard(profileId, period = 'month') {
 }
 
 async function loadExpenses(filters = {}) {
+    // First page only; further pages are fetched with loadMoreExpenses()
+    state.expenseFilters = filters;
     const params = new URLSearchParams(filters);
-    state.expenses = await fetchAPI(`/expenses?${params}`);
+    const page = await fetchAPI(`/expenses?${params}`);
+    state.expenses = page.expenses;
+    state.expensesCursor = page.next_cursor;
+    updateExpenseList();
+}
+
+async function loadMoreExpenses() {
+    if (!state.expensesCursor) return;
+    const params = new URLSearchParams({ ...state.expenseFilters, cursor: state.expensesCursor });
+    const page = await fetchAPI(`/expenses?${params}`);
+    state.expenses = state.expenses.concat(page.expenses);
+    state.expensesCursor = page.next_cursor;
     updateExpenseList();
 }
 
@@ -237,7 +254,8 @@ async function exportCSV(filters = {}) {
 
 // Credit Card API Functions
 async function loadCreditCards() {
-    state.creditCards = await fetchAPI('/credit-cards');
+    // Summary includes the current cycle's spend and utilization per card
+    state.creditCards = await fetchAPI('/credit-cards/summary');
     updateCreditCardsUI();
     populateCardSelects();
 }
@@ -507,6 +525,14 @@ function updateExpenseList() {
 
         container.appendChild(div);
     });
+
+    if (state.expensesCursor) {
+        const more = document.createElement('button');
+        more.className = 'btn-secondary full-width';
+        more.textContent = translate('load_more');
+        more.addEventListener('click', loadMoreExpenses);
+        container.appendChild(more);
+    }
 }
 
 function updateFamilyOverviewUI(data) {
@@ -647,8 +673,9 @@ function updateCreditCardsUI() {
                 <div style="font-size: 1.5rem;">💳</div>
             </div>
             <div class="card-balance-section">
-                <div class="card-balance-label">${translate('credit_limit')}</div>
-                <div class="card-balance-amount">₹${card.credit_limit.toLocaleString('en-IN')}</div>
+                <div class="card-balance-label">${translate('available')}</div>
+                <div class="card-balance-amount">₹${card.available_balance.toLocaleString('en-IN')}</div>
+                <div class="card-limit">${translate('credit_limit')}: ₹${card.credit_limit.toLocaleString('en-IN')} • ${translate('utilization')}: ${card.utilization}%</div>
                 <div class="card-limit">Billing: ${card.billing_day}${getOrdinalSuffix(card.billing_day)} of month</div>
             </div>
         `;
@@ -0,0 +1,100 @@
+"""Production server: --workers processes x --threads threads each.
+
+Runs on gunicorn's threaded workers. The schema migrations and seed data
+run once in the master process before any worker is forked (the master's
+connections are closed first, so none is shared across the fork). On
+SIGTERM or SIGINT the workers stop accepting connections, /api/ready
+answers 503 on connections still open, and in-flight requests, writes
+included, get up to --graceful-timeout seconds to finish before the
+connection pool is closed.
+
+    pip install gunicorn
+    python serve.py [--host 0.0.0.0] [--port 5000] [--workers 2] [--threads 8] [--graceful-timeout 30]
+"""
+import argparse
+import os
+import signal
+import sys
+
+import db_pool
+
+WORKERS = int(os.environ.get('FAMILYSPEND_WORKERS', '2'))
+THREADS = int(os.environ.get('FAMILYSPEND_THREADS', str(db_pool.POOL_SIZE)))
+
+
+def on_starting(server):
+    # Master process, before the first fork
+    from app import init_db, seed_data
+    init_db()
+    seed_data()
+    db_pool.get_pool().close_all()
+
+
+def post_worker_init(worker):
+    import app
+    handle_exit = worker.handle_exit
+
+    def drain(sig, frame):
+        app.draining.set()
+        handle_exit(sig, frame)
+
+    # gunicorn installed its own handlers before this hook; wrap them
+    signal.signal(signal.SIGTERM, drain)
+    signal.signal(signal.SIGINT, drain)
+
+
+def worker_exit(server, worker):
+    # In-flight requests have finished (or timed out) by now
+    import slow_queries
+    slow_queries.log.flush()
+    db_pool.get_pool().close_all()
+
+
+def options(args):
+    return {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5,
+        'accesslog': '-' if args.access_log else None,
+        'on_starting': on_starting,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve FamilySpend with multiple worker processes')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--threads', type=int, default=THREADS, help='threads per worker')
+    parser.add_argument('--graceful-timeout', type=int, default=30, help='seconds to drain on shutdown')
+    parser.add_argument('--access-log', action='store_true')
+    args = parser.parse_args()
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("serve.py needs gunicorn: pip install gunicorn")
+        sys.exit(1)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for name, value in options(args).items():
+                if value is not None:
+                    self.cfg.set(name, value)
+
+        def load(self):
+            # Imported in each worker after the fork
+            from app import create_app
+            return create_app()
+
+    print(f"🚀 FamilySpend is running at http://localhost:{args.port} "
+          f"({args.workers} workers x {args.threads} threads)")
+    Server().run()
+
+
+if __name__ == '__main__':
+    main()
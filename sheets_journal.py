@@ -0,0 +1,161 @@
+"""Write-behind journal for the Google Sheets backend (db_sheets.py).
+
+Adding or deleting an expense or card is committed to a local SQLite file
+(FAMILYSPEND_SHEETS_JOURNAL, default sheets_journal.db) and the form returns
+straight away. A background thread sends the entries on to Sheets, gathering
+whatever arrives within FAMILYSPEND_SHEETS_FLUSH_SECONDS (default 2) into one
+batch per worksheet; an add deleted again before it was sent never reaches
+Sheets at all. A failed batch stays in the journal (across restarts too) and
+is retried with backoff, up to a minute apart. db_sheets merges the pending
+entries into everything it reads, so the app sees its own changes at once.
+
+The journal belongs to one Streamlit process; don't point two at one file.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+JOURNAL_PATH = os.environ.get('FAMILYSPEND_SHEETS_JOURNAL', 'sheets_journal.db')
+FLUSH_SECONDS = float(os.environ.get('FAMILYSPEND_SHEETS_FLUSH_SECONDS', '2'))
+MAX_BACKOFF = 60
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    worksheet TEXT NOT NULL,
+    op TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    payload TEXT,
+    created_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+)'''
+
+
+def coalesce(entries):
+    """Net effect of journal entries, oldest first: (rows to append, ids to delete)."""
+    appends = {}
+    deletes = set()
+    for _, _, op, row_id, payload in entries:
+        if op == 'append':
+            appends[row_id] = payload
+        elif row_id in appends:
+            # Added and deleted before either was sent
+            del appends[row_id]
+        else:
+            deletes.add(row_id)
+    return list(appends.values()), deletes
+
+
+class Journal:
+    def __init__(self, path=JOURNAL_PATH, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.flushed = 0
+        self.failures = 0
+        self.last_error = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._apply = None
+
+    def _connect(self):
+        if self._conn is None:
+            # Autocommit: every entry is its own transaction, synced to disk
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def record(self, worksheet, op, row_id, payload=None):
+        """Durably record op ('append' with the row as payload, or 'delete') and wake the flusher."""
+        with self._lock:
+            self._connect().execute(
+                'INSERT INTO journal (worksheet, op, row_id, payload, created_at) VALUES (?, ?, ?, ?, ?)',
+                (worksheet, op, int(row_id), None if payload is None else json.dumps(payload, default=str),
+                 datetime.now().isoformat()))
+        self._wake.set()
+
+    def pending(self, worksheet=None):
+        """Unflushed entries, oldest first: (seq, worksheet, op, row_id, payload)."""
+        sql = 'SELECT seq, worksheet, op, row_id, payload FROM journal'
+        with self._lock:
+            if worksheet is None:
+                rows = self._connect().execute(sql + ' ORDER BY seq').fetchall()
+            else:
+                rows = self._connect().execute(sql + ' WHERE worksheet = ? ORDER BY seq', (worksheet,)).fetchall()
+        return [(seq, ws, op, row_id, json.loads(payload) if payload else None)
+                for seq, ws, op, row_id, payload in rows]
+
+    def start(self, apply):
+        """Flush in the background from now on, calling apply(worksheet, entries)
+        for each worksheet's pending entries; apply raises if Sheets didn't take them."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._apply = apply
+            self._thread = threading.Thread(target=self._run, name='familyspend-sheets-journal', daemon=True)
+        try:
+            # Lets the thread use st.connection like the script that started it
+            from streamlit.runtime.scriptrunner import add_script_run_ctx
+            add_script_run_ctx(self._thread)
+        except ImportError:
+            pass
+        # Entries left over from a previous run go out first
+        if self.pending():
+            self._wake.set()
+        self._thread.start()
+
+    def _run(self):
+        backoff = 0
+        while True:
+            if backoff:
+                time.sleep(backoff)
+            else:
+                self._wake.wait()
+                # Let a burst of edits gather into one batch
+                time.sleep(self.flush_seconds)
+            self._wake.clear()
+            backoff = 0 if self.flush() else min(max(backoff * 2, 1), MAX_BACKOFF)
+
+    def flush(self):
+        """Send every pending entry now; True if Sheets took all of them."""
+        with self._flush_lock:
+            by_worksheet = {}
+            for entry in self.pending():
+                by_worksheet.setdefault(entry[1], []).append(entry)
+            ok = True
+            for worksheet, entries in by_worksheet.items():
+                last_seq = entries[-1][0]
+                try:
+                    self._apply(worksheet, entries)
+                except Exception as e:
+                    print(f"Error flushing {len(entries)} change(s) to {worksheet}, will retry: {e}")
+                    ok = False
+                    self.failures += 1
+                    self.last_error = str(e)
+                    with self._lock:
+                        self._connect().execute('''UPDATE journal SET attempts = attempts + 1, last_error = ?
+                                                   WHERE worksheet = ? AND seq <= ?''',
+                                                (str(e), worksheet, last_seq))
+                    continue
+                with self._lock:
+                    self._connect().execute('DELETE FROM journal WHERE worksheet = ? AND seq <= ?',
+                                            (worksheet, last_seq))
+                self.flushed += len(entries)
+            if ok:
+                self.last_error = None
+            return ok
+
+    def stats(self):
+        with self._lock:
+            count, oldest, attempts = self._connect().execute(
+                'SELECT COUNT(*), MIN(created_at), MAX(attempts) FROM journal').fetchone()
+        return {'pending': count, 'oldest': oldest, 'attempts': attempts or 0,
+                'flushed': self.flushed, 'failures': self.failures, 'last_error': self.last_error}
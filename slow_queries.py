@@ -0,0 +1,188 @@
+"""Slow-query log for every pooled connection (app.py and db.py alike).
+
+Statements taking at least FAMILYSPEND_SLOW_QUERY_MS (default 100, 0 turns
+the log off) are recorded with their normalized SQL, parameters, duration,
+row count and EXPLAIN QUERY PLAN. The plan is captured on the connection
+that ran the statement; the entry is then written to the slow_queries table
+by a background thread, so the request never waits on that write. Set
+FAMILYSPEND_SLOW_QUERY_FILE to also append entries as JSON lines to a
+rotating file.
+
+GET /api/slow-queries ranks the logged statements by total time.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from hashlib import sha1
+
+import tracing
+
+THRESHOLD_MS = float(os.environ.get('FAMILYSPEND_SLOW_QUERY_MS', '100'))
+LOG_FILE = os.environ.get('FAMILYSPEND_SLOW_QUERY_FILE', '')
+
+# Older entries are pruned past this many rows
+MAX_ROWS = 10000
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS slow_queries (
+        id INTEGER PRIMARY KEY,
+        logged_at TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        sql TEXT NOT NULL,
+        params TEXT,
+        duration_ms REAL NOT NULL,
+        rows INTEGER NOT NULL,
+        plan TEXT
+    )''',
+    '''CREATE INDEX IF NOT EXISTS idx_slow_queries_fingerprint
+       ON slow_queries (fingerprint, duration_ms)''',
+]
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,)+\s*\?\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL with literals replaced by ? and whitespace collapsed, for grouping."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return sha1(normalized.encode()).hexdigest()[:16]
+
+
+def explain(conn, sql, params):
+    # Straight through sqlite3.Connection, so the EXPLAIN itself isn't traced
+    if isinstance(params, dict) and 'executemany' in params:
+        return None
+    try:
+        rows = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    except sqlite3.Error:
+        return None
+    return '\n'.join(row[3] for row in rows)
+
+
+def _jsonable(params):
+    try:
+        return json.dumps(params, default=str)
+    except (TypeError, ValueError):
+        return json.dumps(repr(params))
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=THRESHOLD_MS, log_file=LOG_FILE):
+        self.threshold_ms = threshold_ms
+        self.logged = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file = None
+        if log_file:
+            self._file = logging.getLogger('familyspend.slow_queries')
+            self._file.propagate = False
+            handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=3)
+            self._file.addHandler(handler)
+            self._file.setLevel(logging.INFO)
+        # A forked worker (serve.py) gets its own queue and writer thread
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record(self, conn, sql, params, seconds, rows):
+        """tracing.py handler: runs on the thread that ran the statement."""
+        path = tracing.database_path(conn)
+        if not path:
+            return
+        normalized = normalize(sql)
+        entry = (path, datetime.now().isoformat(timespec='seconds'), fingerprint(normalized), normalized,
+                 _jsonable(params), round(seconds * 1000, 3), rows, explain(conn, sql, params))
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='familyspend-slow-queries', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"Error writing slow queries: {e}")
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        by_database = {}
+        for path, *entry in batch:
+            by_database.setdefault(path, []).append(entry)
+        for path, entries in by_database.items():
+            conn = sqlite3.connect(path, timeout=5)
+            try:
+                with conn:
+                    conn.executemany('''INSERT INTO slow_queries (logged_at, fingerprint, sql, params,
+                                                                  duration_ms, rows, plan)
+                                        VALUES (?, ?, ?, ?, ?, ?, ?)''', entries)
+                    conn.execute('DELETE FROM slow_queries WHERE id <= (SELECT MAX(id) FROM slow_queries) - ?',
+                                 (MAX_ROWS,))
+            finally:
+                conn.close()
+            self.logged += len(entries)
+            if self._file:
+                for logged_at, _, sql, params, duration_ms, rows, plan in entries:
+                    self._file.info(json.dumps({'logged_at': logged_at, 'database': path, 'sql': sql,
+                                                'params': json.loads(params), 'duration_ms': duration_ms,
+                                                'rows': rows, 'plan': plan}))
+
+    def flush(self):
+        """Wait until every queued entry has been written."""
+        self._queue.join()
+
+
+SUMMARY_SQL = '''
+    SELECT s.fingerprint, MIN(s.sql), COUNT(*), SUM(s.duration_ms), AVG(s.duration_ms),
+           MAX(s.duration_ms), SUM(s.rows), MAX(s.logged_at),
+           (SELECT plan FROM slow_queries p
+            WHERE p.fingerprint = s.fingerprint
+            ORDER BY p.duration_ms DESC LIMIT 1)
+    FROM slow_queries s
+    GROUP BY s.fingerprint
+    ORDER BY SUM(s.duration_ms) DESC
+    LIMIT ?
+'''
+
+
+def summary(conn, limit=20):
+    """Logged statements ranked by total time."""
+    return conn.execute(SUMMARY_SQL, (limit,)).fetchall()
+
+
+log = SlowQueryLog()
+
+
+def install(slow_log=log):
+    tracing.set_slow_query_handler(slow_log.threshold_ms, slow_log.record)
@@ -0,0 +1,88 @@
+"""Frontend assets, fingerprinted and precompressed once at startup.
+
+script.js and style.css are served as script.<hash>.js / style.<hash>.css
+with a one-year immutable Cache-Control, and index.html is rewritten to
+point at those names. index.html itself is revalidated on every load
+(no-cache + ETag), so a repeat visit costs one 304 and zero asset bytes,
+and a deploy changes the hashes so browsers pick up new files at once.
+
+Everything is held in memory (plain and gzip bodies) and only the files
+below are served; data.db, the Python sources etc. are never reachable.
+"""
+import gzip
+import hashlib
+import os
+
+# Served under a content-hashed name
+FINGERPRINTED = ('script.js', 'style.css')
+# Served under its own name and revalidated on every request
+PAGES = ('index.html',)
+SOURCES = FINGERPRINTED + PAGES
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+}
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+class Asset:
+    def __init__(self, name, body, cache_control):
+        self.name = name
+        self.body = body
+        self.content_type = CONTENT_TYPES[os.path.splitext(name)[1]]
+        self.cache_control = cache_control
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        # Tiny files can come out larger; serve those uncompressed
+        self.gzip_body = compressed if len(compressed) < len(body) else None
+
+
+def fingerprinted_name(name, body):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}'
+
+
+def build(root='.'):
+    """Return {url path: Asset} for everything the frontend may request."""
+    assets = {}
+    renames = {}
+    for name in FINGERPRINTED:
+        with open(os.path.join(root, name), 'rb') as f:
+            body = f.read()
+        hashed = fingerprinted_name(name, body)
+        renames[name] = hashed
+        assets[hashed] = Asset(hashed, body, IMMUTABLE)
+        # The plain name still works for pages cached before a deploy
+        assets[name] = Asset(name, body, REVALIDATE)
+
+    for name in PAGES:
+        with open(os.path.join(root, name), encoding='utf-8') as f:
+            html = f.read()
+        for original, hashed in renames.items():
+            html = html.replace(f'src="{original}"', f'src="{hashed}"')
+            html = html.replace(f'href="{original}"', f'href="{hashed}"')
+        assets[name] = Asset(name, html.encode('utf-8'), REVALIDATE)
+    return assets
+
+
+def respond(response_class, asset, request):
+    """Build the response for `asset`: 304 on a matching ETag, gzip when accepted."""
+    use_gzip = asset.gzip_body is not None and 'gzip' in request.headers.get('Accept-Encoding', '')
+    # Each encoding is its own representation, so it gets its own strong ETag
+    etag = f'{asset.etag}-gz' if use_gzip else asset.etag
+    if request.if_none_match.contains(etag):
+        response = response_class(status=304)
+    else:
+        response = response_class(asset.gzip_body if use_gzip else asset.body,
+                                  mimetype=asset.content_type.split(';')[0])
+        response.headers['Content-Type'] = asset.content_type
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = asset.cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
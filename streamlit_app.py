@@ -50,6 +50,17 @@ page = st.selectbox("Go to", page_options, label_visibility="collapsed")
 st.sidebar.markdown("---")
 st.sidebar.radio("Navigate", page_options, key="sidebar_nav")
 
+# Google Sheets read cache (db_sheets only)
+if hasattr(db, 'cache_stats'):
+    cache = db.cache_stats()
+    st.sidebar.caption(f"☁️ Sheets reads: {cache['reads']} · cached: {cache['hits']} "
+                       f"({cache['hit_rate']:.0%}) · API calls saved: {cache['quota_saved']}")
+    sync = db.journal.stats()
+    if sync['pending']:
+        st.sidebar.caption(f"⏳ {sync['pending']} change(s) waiting to sync to Google Sheets")
+    if sync['last_error']:
+        st.sidebar.caption(f"⚠️ Last sync failed, retrying: {sync['last_error']}")
+
 # --- HELPERS ---
 def card_metric(label, value):
     st.markdown(f"""
@@ -160,7 +171,16 @@ elif page == "📝 History":
     start = fc1.date_input("From", datetime.now().replace(day=1))
     end = fc2.date_input("To", datetime.now())
     
-    exps = db.get_expenses(selected_profile_id, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+    # Keyset pagination: keep the cursor of every page visited so far so
+    # "Previous" can step back. Changing a filter starts again at page 1.
+    history_filters = (selected_profile_id, start, end)
+    if st.session_state.get('history_filters') != history_filters:
+        st.session_state['history_filters'] = history_filters
+        st.session_state['history_cursors'] = [None]
+    cursors = st.session_state['history_cursors']
+    
+    exps, next_cursor = db.get_expenses_page(selected_profile_id, start.strftime("%Y-%m-%d"),
+                                             end.strftime("%Y-%m-%d"), cursor=cursors[-1])
     
     if not exps:
         st.info("No transaction history found.")
@@ -195,6 +215,17 @@ elif page == "📝 History":
                         st.toast("Expense deleted")
                         st.rerun()
 
+    # Page navigation
+    nav_prev, nav_page, nav_next = st.columns([1, 2, 1])
+    if len(cursors) > 1 and nav_prev.button("⬅️ Previous"):
+        cursors.pop()
+        st.rerun()
+    nav_page.markdown(f"<div style='text-align:center; color:#718096'>Page {len(cursors)}</div>",
+                      unsafe_allow_html=True)
+    if next_cursor and nav_next.button("Next ➡️"):
+        cursors.append(next_cursor)
+        st.rerun()
+
 elif page == "💳 Cards":
     st.markdown("## 💳 Credit Cards")
     
@@ -0,0 +1,103 @@
+import pytest
+
+import app as familyspend
+import db_pool
+import repository
+
+
+@pytest.fixture
+def client(tmp_path):
+    database = db_pool.get_pool().database
+    db_pool.configure(database=str(tmp_path / 'api.db'))
+    familyspend.init_db()
+    familyspend.seed_data()
+    yield familyspend.app.test_client()
+    db_pool.configure(database=database)
+
+
+def expense(**fields):
+    return {'profile_id': 1, 'category_id': 1, 'amount': 120, 'date': '2026-10-01', **fields}
+
+
+def test_add_expense(client):
+    response = client.post('/api/expenses', json=expense(note='rice'))
+    assert response.status_code == 201
+    assert response.get_json()['id']
+
+
+@pytest.mark.parametrize('fields, error', [
+    ({'profile_id': 999}, 'Unknown profile_id 999'),
+    ({'category_id': 999}, 'Unknown category_id 999'),
+    ({'card_id': 999}, 'Unknown card_id 999'),
+])
+def test_add_expense_with_unknown_reference_is_a_client_error(client, fields, error):
+    response = client.post('/api/expenses', json=expense(**fields))
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+    # Nothing was written, and the pooled connection is still usable
+    assert client.get('/api/expenses').get_json()['expenses'] == []
+    assert client.post('/api/expenses', json=expense()).status_code == 201
+
+
+def test_bulk_reports_the_first_error_of_each_row(client):
+    records = [
+        expense(),
+        expense(profile_id=999),
+        expense(category_id='2.5'),
+        expense(amount='x'),
+        expense(amount=float('inf')),
+        expense(date='2026-1-5'),
+        expense(date='2026-02-30'),
+        expense(card_id=999, amount=None),
+        'not an object',
+        expense(category_id='3', card_id='', note=None),
+    ]
+    response = client.post('/api/expenses/bulk?partial=1', json=records)
+    assert response.status_code == 201
+    assert response.get_json()['inserted'] == 2
+    assert response.get_json()['errors'] == [
+        {'row': 1, 'error': 'Unknown profile_id 999'},
+        {'row': 2, 'error': "expected an integer id, got '2.5'"},
+        {'row': 3, 'error': "amount must be a finite number, got 'x'"},
+        {'row': 4, 'error': 'amount must be a finite number, got inf'},
+        {'row': 5, 'error': "date must be YYYY-MM-DD, got '2026-1-5'"},
+        {'row': 6, 'error': "date must be YYYY-MM-DD, got '2026-02-30'"},
+        {'row': 7, 'error': 'amount must be a finite number, got None'},
+        {'row': 8, 'error': 'Expected an object'},
+    ]
+    stored = client.get('/api/expenses').get_json()['expenses']
+    assert sorted((e['category_id'], e['note'], e['card_id']) for e in stored) == [(1, '', None), (3, '', None)]
+
+
+def test_reference_ids_are_reread_only_after_a_change(client):
+    with db_pool.get_connection() as conn:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        profiles, categories, cards = repository.reference_ids(conn)
+        assert repository.reference_ids(conn) == (profiles, categories, cards)
+        assert sum('SELECT id FROM' in sql for sql in statements) <= 3
+
+        statements.clear()
+        card_id = repository.add_credit_card(conn, 1, 'Visa', 50000, 5)
+        assert repository.reference_ids(conn)[2] == cards | {card_id}
+        assert sum('SELECT id FROM' in sql for sql in statements) == 3
+        conn.set_trace_callback(None)
+
+
+def test_legacy_budget_periods_are_normalized(client):
+    with db_pool.get_connection() as conn:
+        conn.execute('PRAGMA user_version = 11')
+        conn.executemany('INSERT INTO budgets (profile_id, category_id, amount, period) VALUES (?, ?, ?, ?)', [
+            (1, 1, 100, 'month'),
+            (1, 1, 150, ' Monthly'),  # same budget once normalized; the later one wins
+            (1, 2, 500, 'Year'),
+            (None, None, 50, 'week'),
+            (2, 1, 10, 'daily'),
+        ])
+        conn.commit()
+    familyspend.init_db()
+
+    status = client.get('/api/budgets/status').get_json()
+    assert sorted((b['period'], b['category_id'] or 0, b['amount']) for b in status) == [
+        ('monthly', 1, 150), ('weekly', 0, 50), ('yearly', 2, 500)]
+    assert len(client.get('/api/budgets').get_json()) == 3
@@ -0,0 +1,132 @@
+from datetime import date, timedelta
+
+import pytest
+
+import app as familyspend
+import billing
+import db_pool
+import repository
+
+
+@pytest.fixture
+def conn(tmp_path):
+    database = db_pool.get_pool().database
+    db_pool.configure(database=str(tmp_path / 'billing.db'))
+    familyspend.init_db()
+    familyspend.seed_data()
+    with db_pool.get_connection() as conn:
+        yield conn
+    db_pool.configure(database=database)
+
+
+@pytest.mark.parametrize('billing_day, day, cycle', [
+    # Billing days past the end of a month start on its last day
+    (31, date(2026, 2, 15), (date(2026, 1, 31), date(2026, 2, 27))),
+    (31, date(2026, 2, 28), (date(2026, 2, 28), date(2026, 3, 30))),
+    (30, date(2026, 3, 1), (date(2026, 2, 28), date(2026, 3, 29))),
+    (29, date(2026, 2, 28), (date(2026, 2, 28), date(2026, 3, 28))),
+    (31, date(2026, 4, 30), (date(2026, 4, 30), date(2026, 5, 30))),
+    (31, date(2028, 2, 29), (date(2028, 2, 29), date(2028, 3, 30))),
+    (29, date(2028, 2, 28), (date(2028, 1, 29), date(2028, 2, 28))),
+    (31, date(2026, 12, 31), (date(2026, 12, 31), date(2027, 1, 30))),
+    (5, date(2026, 1, 4), (date(2025, 12, 5), date(2026, 1, 4))),
+])
+def test_cycle_for_clamps_to_the_month(billing_day, day, cycle):
+    assert billing.cycle_for(billing_day, day) == cycle
+
+
+@pytest.mark.parametrize('billing_day', [1, 15, 28, 29, 30, 31])
+def test_cycles_tile_the_calendar(billing_day):
+    day = date(2027, 11, 1)
+    start, end = billing.cycle_for(billing_day, day)
+    for _ in range(30):
+        assert start <= day <= end
+        next_start, next_end = billing.cycle_for(billing_day, end + timedelta(days=1))
+        assert next_start == end + timedelta(days=1)
+        start, end = next_start, next_end
+        day = start
+
+
+def test_sync_closes_clamped_cycles(conn):
+    card_id = repository.add_credit_card(conn, 1, 'Visa', 50000, 31)
+    repository.add_expense(conn, 1, 1, 100, '2026-01-05', card_id=card_id)
+    repository.add_expense(conn, 1, 2, 40, '2026-02-28', card_id=card_id)
+
+    billing.sync(conn, '2026-03-15')
+    cycles = conn.execute('''SELECT cycle_start, cycle_end, total FROM billing_cycles
+                             WHERE card_id = ? ORDER BY cycle_start''', (card_id,)).fetchall()
+    assert cycles == [('2025-12-31', '2026-01-30', 100),
+                      ('2026-01-31', '2026-02-27', 0),
+                      ('2026-02-28', '2026-03-30', None)]
+
+
+def test_sync_fills_in_cycles_before_a_back_dated_expense(conn):
+    card_id = repository.add_credit_card(conn, 1, 'Visa', 50000, 31)
+    billing.sync(conn, '2026-03-15')
+    repository.add_expense(conn, 1, 1, 100, '2025-12-20', card_id=card_id)
+
+    billing.sync(conn, '2026-03-15')
+    starts = [start for start, in conn.execute('''SELECT cycle_start FROM billing_cycles
+                                                 WHERE card_id = ? ORDER BY cycle_start''', (card_id,))]
+    assert starts[:3] == ['2025-11-30', '2025-12-31', '2026-01-31']
+    assert billing.statements(conn, card_id, '2026-03-15')[-1][:2] == ('2025-11-30', '2025-12-30')
+    assert billing.statements(conn, card_id, '2026-03-15')[-1][2] == 100
+
+
+def test_reads_never_write_a_stale_calendar(conn):
+    card_id = repository.add_credit_card(conn, 1, 'Visa', 50000, 31)
+    repository.add_expense(conn, 1, 1, 100, '2026-01-05', card_id=card_id)
+    billing.sync(conn, '2026-01-20')
+    repository.add_expense(conn, 1, 2, 25, '2026-01-25', card_id=card_id)
+    before = conn.total_changes
+
+    # No write since the cycle ended on Jan 30
+    assert billing.current_cycle(conn, card_id, '2026-02-20') == ('2026-01-31', '2026-02-27')
+    assert billing.statements(conn, card_id, '2026-02-20') == [('2025-12-31', '2026-01-30', 125, None)]
+    (_, _, total, closed_at), categories = billing.statement(conn, card_id, '2025-12-31', '2026-02-20')
+    assert (total, closed_at) == (125, None)
+    assert [amount for *_, amount in categories] == [100, 25]
+    assert conn.total_changes == before
+    assert conn.execute('SELECT COUNT(*) FROM billing_cycles').fetchone()[0] == 1
+
+    # The next write freezes it
+    billing.ensure_synced(conn, '2026-02-20')
+    [(total, closed_at)] = conn.execute('''SELECT total, closed_at FROM billing_cycles
+                                           WHERE cycle_start = '2025-12-31' ''').fetchall()
+    assert total == 125 and closed_at
+    assert billing.current_cycle(conn, card_id, '2026-02-20') == ('2026-01-31', '2026-02-27')
+
+
+def test_card_endpoints_do_not_write(conn):
+    card_id = repository.add_credit_card(conn, 1, 'Visa', 50000, 31)
+    client = familyspend.app.test_client()
+
+    assert client.get(f'/api/credit-cards/{card_id}/dashboard').status_code == 200
+    assert client.get('/api/credit-cards/summary').status_code == 200
+    assert client.get(f'/api/credit-cards/{card_id}/statements').get_json() == []
+    assert conn.execute('SELECT COUNT(*) FROM billing_cycles').fetchone()[0] == 0
+
+    # Writing an expense brings the calendar up to today
+    expense = {'profile_id': 1, 'category_id': 1, 'amount': 10,
+               'date': date.today().isoformat(), 'card_id': card_id}
+    assert client.post('/api/expenses', json=expense).status_code == 201
+    assert conn.execute('SELECT COUNT(*) FROM billing_cycles').fetchone()[0] == 1
+
+
+def test_back_dated_expenses_reopen_their_statement(conn):
+    card_id = repository.add_credit_card(conn, 1, 'Visa', 50000, 31)
+    repository.add_expense(conn, 1, 1, 100, '2026-01-05', card_id=card_id)
+    billing.sync(conn, '2026-02-10')
+    assert billing.statements(conn, card_id, '2026-02-10')[0][2] == 100
+
+    late = repository.add_expense(conn, 1, 2, 30, '2026-01-10', card_id=card_id)
+    assert billing.statements(conn, card_id, '2026-02-10')[0][2:] == (130, None)
+    billing.sync(conn, '2026-02-10')
+    (_, _, total, closed_at), categories = billing.statement(conn, card_id, '2025-12-31', '2026-02-10')
+    assert total == 130 and closed_at
+    assert [amount for *_, amount in categories] == [100, 30]
+
+    repository.delete_expense(conn, late)
+    billing.sync(conn, '2026-02-10')
+    (_, _, total, _), categories = billing.statement(conn, card_id, '2025-12-31', '2026-02-10')
+    assert total == 100 and len(categories) == 1
@@ -0,0 +1,35 @@
+import re
+import sqlite3
+
+import pytest
+
+import migrations
+
+
+# A full pass over expenses, under its name or the usual alias
+FULL_SCAN = re.compile(r'^SCAN (expenses|e)\b', re.MULTILINE)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'plans.db')
+    migrations.migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('endpoint, index, sql, params', migrations.HOT_QUERIES,
+                         ids=[query[0] for query in migrations.HOT_QUERIES])
+def test_hot_query_uses_index(conn, endpoint, index, sql, params):
+    plan = '\n'.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+    assert not FULL_SCAN.search(plan), plan
+    assert any(line.startswith('SEARCH') and index in line for line in plan.splitlines()), plan
+    if index.startswith('idx_expenses_'):
+        # Rows come out in ORDER BY order straight off the index
+        assert 'USE TEMP B-TREE FOR' not in plan, plan
+
+
+def test_check_query_plans_reports_every_query_ok(conn):
+    results = migrations.check_query_plans(conn)
+    assert len(results) == len(migrations.HOT_QUERIES)
+    assert [endpoint for endpoint, _, _, ok in results if not ok] == []
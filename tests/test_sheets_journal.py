@@ -0,0 +1,241 @@
+"""db_sheets against the local fake of Google Sheets (fake_gsheets.py).
+
+The journal is flushed by hand here; its background thread never wakes
+during a test (flush_seconds is an hour).
+"""
+import os
+
+import pandas as pd
+import pytest
+
+import db_sheets
+import fake_gsheets
+import sheets_journal
+
+
+def reset_state():
+    for state in (db_sheets._cache, db_sheets._headers, db_sheets._worksheets,
+                  db_sheets._live_frames, db_sheets._lookups, db_sheets._prepared):
+        state.clear()
+
+
+@pytest.fixture
+def sheets(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_sheets, 'FAKE_SHEETS', str(tmp_path / 'sheets'))
+    monkeypatch.setattr(db_sheets, 'journal', sheets_journal.Journal(str(tmp_path / 'journal.db'), flush_seconds=3600))
+    reset_state()
+    db_sheets.seed_data()
+    yield db_sheets.get_conn()
+    reset_state()
+
+
+def sheet_ids(conn, worksheet='expenses'):
+    return conn.read(worksheet=worksheet)['id'].tolist()
+
+
+def visible_ids():
+    return sorted(e['id'] for e in db_sheets.get_expenses())
+
+
+def test_pending_writes_are_merged_into_reads(sheets):
+    db_sheets.add_expense(1, 1, 100, '2026-10-01', 'rice')
+    db_sheets.add_expense(2, 2, 50, '2026-10-02')
+    db_sheets.add_credit_card(1, 'Visa', 50000, 5, '1111')
+
+    assert not os.path.exists(sheets._path('expenses'))
+    assert len(db_sheets.get_expenses()) == 2
+    assert db_sheets.get_expenses(profile_id=1)[0]['note'] == 'rice'
+    assert db_sheets.get_credit_cards(1)[0]['card_name'] == 'Visa'
+    assert db_sheets.get_dashboard_stats(1, 'year')['total_spent'] == 100
+
+    # Deleted before it was sent: never reaches Sheets
+    first = db_sheets.get_expenses(profile_id=1)[0]['id']
+    db_sheets.delete_expense(first)
+    assert len(db_sheets.get_expenses()) == 1
+
+    assert db_sheets.journal.flush()
+    assert db_sheets.journal.stats()['pending'] == 0
+    assert first not in sheet_ids(sheets)
+    assert len(sheet_ids(sheets)) == 1
+    assert len(db_sheets.get_expenses()) == 1
+
+
+def test_journal_is_replayed_after_a_crash(sheets, tmp_path):
+    db_sheets.add_expense(1, 1, 100, '2026-10-01')
+    db_sheets.add_expense(1, 2, 200, '2026-10-02')
+    expected = visible_ids()
+
+    # The process dies before the flusher ran; a new one opens the same file
+    replayed = sheets_journal.Journal(str(tmp_path / 'journal.db'), flush_seconds=3600)
+    db_sheets.journal = replayed
+    reset_state()
+    db_sheets.init_db()
+    assert replayed.stats()['pending'] == 2
+    assert visible_ids() == expected
+
+    assert replayed.flush()
+    assert sorted(sheet_ids(sheets)) == expected
+    assert replayed.stats()['pending'] == 0
+
+
+def test_failed_flush_keeps_entries_for_a_retry(sheets):
+    db_sheets.add_expense(1, 1, 100, '2026-10-01')
+    sheets.fail_next(1)
+
+    assert not db_sheets.journal.flush()
+    stats = db_sheets.journal.stats()
+    assert stats['pending'] == 1 and stats['attempts'] == 1
+    assert 'Quota exceeded' in stats['last_error']
+    assert len(db_sheets.get_expenses()) == 1
+
+    assert db_sheets.journal.flush()
+    stats = db_sheets.journal.stats()
+    assert stats['pending'] == 0 and stats['last_error'] is None
+    assert len(sheet_ids(sheets)) == 1
+
+
+def test_retried_batch_does_not_duplicate_rows(sheets, monkeypatch):
+    db_sheets.add_expense(1, 1, 100, '2026-10-01')
+    db_sheets.journal.flush()  # the sheet now has a header to append below
+    db_sheets.add_expense(1, 2, 200, '2026-10-02')
+    db_sheets.add_expense(2, 3, 300, '2026-10-03')
+    expected = visible_ids()
+
+    # Sheets takes the append but the response is lost
+    append_rows = fake_gsheets.FakeWorksheet.append_rows
+    lost = []
+
+    def lose_response(self, values, **options):
+        append_rows(self, values, **options)
+        if not lost:
+            lost.append(values)
+            raise ConnectionError("Read timed out (fake)")
+
+    monkeypatch.setattr(fake_gsheets.FakeWorksheet, 'append_rows', lose_response)
+    assert not db_sheets.journal.flush()
+    assert db_sheets.journal.flush()
+
+    assert len(sheet_ids(sheets)) == 5
+    assert visible_ids() == expected
+    assert db_sheets.get_dashboard_stats(1, 'year')['total_spent'] == 300
+    assert db_sheets.get_family_overview('year')['total_family'] == 600
+
+
+def test_flusher_backs_off_while_flushes_fail(monkeypatch):
+    journal = sheets_journal.Journal(':memory:', flush_seconds=2)
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 9:
+            raise SystemExit
+
+    monkeypatch.setattr(sheets_journal.time, 'sleep', sleep)
+    monkeypatch.setattr(journal, 'flush', lambda: False)
+    journal._wake.set()
+    with pytest.raises(SystemExit):
+        journal._run()
+    assert sleeps == [2, 1, 2, 4, 8, 16, 32, 60, 60]
+
+
+def test_deletes_append_tombstones_until_compaction(sheets):
+    for day in range(1, 11):
+        db_sheets.add_expense(1, 1, day, f'2026-10-{day:02d}')
+    db_sheets.journal.flush()
+    ids = visible_ids()
+
+    # 1 tombstone in 11 rows: below COMPACT_AT, so only appended
+    db_sheets.delete_expense(ids[0])
+    db_sheets.journal.flush()
+    raw = sheets.read(worksheet='expenses')
+    assert len(raw) == 11 and raw['deleted_at'].notna().sum() == 1
+    assert visible_ids() == ids[1:]
+    assert db_sheets.cache_stats()['worksheets']['expenses']['tombstones'] == 1
+
+    # 3 in 13: rewritten without the deleted rows and their tombstones
+    db_sheets.delete_expense(ids[1])
+    db_sheets.delete_expense(ids[2])
+    db_sheets.journal.flush()
+    raw = sheets.read(worksheet='expenses')
+    assert sorted(raw['id']) == ids[3:]
+    assert 'deleted_at' in raw.columns and raw['deleted_at'].isna().all()
+    assert visible_ids() == ids[3:]
+    assert db_sheets.cache_stats()['worksheets']['expenses']['tombstones'] == 0
+
+
+def test_compaction_keeps_rows_added_from_another_device(sheets):
+    for day in range(1, 5):
+        db_sheets.add_expense(1, 1, day, f'2026-10-{day:02d}')
+    db_sheets.journal.flush()
+    ids = visible_ids()
+    db_sheets.delete_expense(ids[0])
+    db_sheets.journal.flush()
+
+    # Another device appends while this process still has the old copy cached
+    other = {'id': 99, 'profile_id': 2, 'category_id': 2, 'amount': 7, 'date': '2026-10-09',
+             'note': '', 'card_id': '', 'created_at': '2026-10-09T10:00:00', 'deleted_at': ''}
+    header = sheets.client._select_worksheet(worksheet='expenses').row_values(1)
+    sheets.client._select_worksheet(worksheet='expenses').append_rows([[other[col] for col in header]])
+
+    assert db_sheets.compact('expenses', threshold=0.1)
+    raw = sheets.read(worksheet='expenses')
+    assert sorted(raw['id']) == sorted(ids[1:] + [99])
+    assert pd.isna(raw['deleted_at']).all()
+
+
+def other_device_appends(conn, row_id):
+    ws = conn.client._select_worksheet(worksheet='expenses')
+    row = {'id': row_id, 'profile_id': 2, 'category_id': 2, 'amount': 7, 'date': '2026-10-09',
+           'created_at': '2026-10-09T10:00:00'}
+    ws.append_rows([[row.get(col, '') for col in ws.row_values(1)]])
+
+
+def test_compaction_keeps_rows_appended_between_read_and_delete(sheets, monkeypatch):
+    for day in range(1, 5):
+        db_sheets.add_expense(1, 1, day, f'2026-10-{day:02d}')
+    db_sheets.journal.flush()
+    ids = visible_ids()
+    db_sheets.delete_expense(ids[0])
+    db_sheets.journal.flush()
+
+    fetch_df = db_sheets._fetch_df
+
+    def append_after_fresh_read(worksheet, expected_cols, fresh=False):
+        df = fetch_df(worksheet, expected_cols, fresh)
+        if fresh:
+            other_device_appends(sheets, 99)
+        return df
+
+    monkeypatch.setattr(db_sheets, '_fetch_df', append_after_fresh_read)
+    assert db_sheets.compact('expenses', threshold=0.1)
+    raw = sheets.read(worksheet='expenses')
+    assert sorted(raw['id']) == sorted(ids[1:] + [99])
+    assert raw['deleted_at'].isna().all()
+
+    monkeypatch.setattr(db_sheets, '_fetch_df', fetch_df)
+    db_sheets.invalidate('expenses')
+    assert visible_ids() == sorted(ids[1:] + [99])
+
+
+def test_compaction_skips_a_sheet_whose_rows_moved(sheets, monkeypatch):
+    for day in range(1, 5):
+        db_sheets.add_expense(1, 1, day, f'2026-10-{day:02d}')
+    db_sheets.journal.flush()
+    ids = visible_ids()
+    db_sheets.delete_expense(ids[0])
+    db_sheets.journal.flush()
+
+    fetch_df = db_sheets._fetch_df
+
+    def delete_first_row_after_fresh_read(worksheet, expected_cols, fresh=False):
+        df = fetch_df(worksheet, expected_cols, fresh)
+        if fresh:
+            # e.g. someone deleted a row by hand in the browser
+            ws = sheets.client._select_worksheet(worksheet='expenses')
+            ws.spreadsheet.batch_update({'requests': [{'deleteDimension': {'range': {
+                'sheetId': ws.id, 'dimension': 'ROWS', 'startIndex': 1, 'endIndex': 2}}}]})
+        return df
+
+    monkeypatch.setattr(db_sheets, '_fetch_df', delete_first_row_after_fresh_read)
+    assert not db_sheets.compact('expenses', threshold=0.1)
+    assert len(sheets.read(worksheet='expenses')) == 4
@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def slow(tmp_path):
+    # Every statement counts as slow
+    logged = []
+    tracing.set_slow_query_handler(1e-9, lambda conn, sql, params, seconds, rows: logged.append((sql, rows)))
+    conn = sqlite3.connect(str(tmp_path / 'trace.db'), factory=tracing.TracedConnection)
+    conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+    conn.executemany('INSERT INTO t (id) VALUES (?)', [(i,) for i in range(5)])
+    logged.clear()
+    yield conn, logged
+    tracing.set_slow_query_handler(None, None)
+    conn.close()
+
+
+def test_iterating_a_cursor_finishes_the_statement(slow):
+    conn, logged = slow
+    trace = tracing.start()
+    ids = [row[0] for row in conn.execute('SELECT id FROM t')]
+    tracing.stop()
+
+    assert ids == [0, 1, 2, 3, 4]
+    assert logged == [('SELECT id FROM t', 5)]
+    assert trace.statements == 1 and trace.rows == 5
+
+
+def test_fetch_and_iterate_count_rows_once(slow):
+    conn, logged = slow
+    cursor = conn.execute('SELECT id FROM t')
+    assert cursor.fetchone() == (0,)
+    assert logged == [('SELECT id FROM t', 1)]
+
+    cursor = conn.execute('SELECT id FROM t ORDER BY id DESC')
+    assert len(cursor.fetchmany(2)) == 2
+    assert list(cursor) == [(2,), (1,), (0,)]
+    assert logged[1:] == [('SELECT id FROM t ORDER BY id DESC', 5)]
+
+
+def test_database_path_is_looked_up_once(slow, tmp_path):
+    conn, _ = slow
+    pragmas = []
+    conn.set_trace_callback(lambda sql: pragmas.append(sql) if 'database_list' in sql else None)
+
+    assert tracing.database_path(conn) == str(tmp_path / 'trace.db')
+    assert tracing.database_path(conn) == str(tmp_path / 'trace.db')
+    assert len(pragmas) == 1
@@ -0,0 +1,179 @@
+"""Statement tracing for pooled SQLite connections.
+
+db_pool opens every connection as a TracedConnection. Its cursors time each
+statement (executing plus stepping through the results) and count the rows
+fetched (through fetch*() or by iterating the cursor), and:
+
+- add the numbers to the Trace started on the current thread, if any
+  (metrics.py starts one per sampled request)
+- pass statements slower than the slow-query threshold to the slow-query
+  handler (slow_queries.py installs one)
+
+With neither active, a statement only pays for a Python-level method call.
+"""
+import sqlite3
+import threading
+import time
+
+_local = threading.local()
+
+# Set by set_slow_query_handler()
+_slow_seconds = None
+_slow_handler = None
+
+
+class Trace:
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+
+def start():
+    """Start counting on this thread; returns the new Trace."""
+    _local.trace = Trace()
+    return _local.trace
+
+
+def stop():
+    """Stop counting on this thread; returns the Trace, or None if none was started."""
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    return trace
+
+
+def set_slow_query_handler(threshold_ms, handler):
+    """Call handler(conn, sql, params, seconds, rows) for statements taking
+    at least threshold_ms; None or a threshold <= 0 turns it off."""
+    global _slow_seconds, _slow_handler
+    if handler is None or threshold_ms is None or threshold_ms <= 0:
+        _slow_seconds = _slow_handler = None
+    else:
+        _slow_seconds = threshold_ms / 1000
+        _slow_handler = handler
+
+
+class TracedCursor(sqlite3.Cursor):
+    # The statement being read: [sql, params, seconds, rows], or None
+    _statement = None
+
+    def _finish(self):
+        sql, params, seconds, rows = self._statement
+        self._statement = None
+        if _slow_seconds is not None and seconds >= _slow_seconds:
+            try:
+                _slow_handler(self.connection, sql, params, seconds, rows)
+            except Exception as e:
+                print(f"Error logging slow query: {e}")
+
+    def _run(self, run, sql, params, logged_params):
+        if self._statement is not None:
+            self._finish()
+        trace = getattr(_local, 'trace', None)
+        if trace is None and _slow_seconds is None:
+            return run(sql, params)
+        started = time.perf_counter()
+        try:
+            return run(sql, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            if trace is not None:
+                trace.statements += 1
+                trace.seconds += elapsed
+            self._statement = [sql, logged_params, elapsed, 0]
+            # Writes and DDL return no rows, so they are complete now
+            if self.description is None:
+                self._finish()
+
+    def _fetched(self, started, rows, exhausted):
+        elapsed = time.perf_counter() - started
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.seconds += elapsed
+            trace.rows += rows
+        statement = self._statement
+        if statement is not None:
+            statement[2] += elapsed
+            statement[3] += rows
+            if exhausted:
+                self._finish()
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Only the batch size is kept; the rows may be a one-shot iterator
+        batch = len(seq_of_parameters) if hasattr(seq_of_parameters, '__len__') else None
+        return self._run(super().executemany, sql, seq_of_parameters, {'executemany': batch})
+
+    def fetchone(self):
+        if self._statement is None and getattr(_local, 'trace', None) is None:
+            return super().fetchone()
+        started = time.perf_counter()
+        row = super().fetchone()
+        # fetchone() is used for single-row lookups, so the statement ends here
+        self._fetched(started, row is not None, True)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if self._statement is None and getattr(_local, 'trace', None) is None:
+            return super().fetchmany(size)
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def __next__(self):
+        # for row in conn.execute(...): the statement ends when the rows run out
+        if self._statement is None and getattr(_local, 'trace', None) is None:
+            return super().__next__()
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def fetchall(self):
+        if self._statement is None and getattr(_local, 'trace', None) is None:
+            return super().fetchall()
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def close(self):
+        if self._statement is not None:
+            self._finish()
+        super().close()
+
+
+class TracedConnection(sqlite3.Connection):
+    # File of the main database, looked up once by database_path()
+    main_path = None
+
+    # Connection.execute() doesn't go through cursor(), so both are overridden
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def database_path(conn):
+    """File of conn's main database ('' in memory), asked once per TracedConnection."""
+    path = getattr(conn, 'main_path', None)
+    if path is None:
+        path = ''
+        for _, name, file in sqlite3.Connection.execute(conn, 'PRAGMA database_list').fetchall():
+            if name == 'main':
+                path = file
+        if isinstance(conn, TracedConnection):
+            conn.main_path = path
+    return path